@@ -0,0 +1,131 @@
+import filecmp
+import os
+import random
+import tempfile
+import time
+
+
+import pandas as pd
+
+
+from validated.unnest_csv_step import unnest_csv, UNNEST_ENGINES
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import (
+    save_node_records_to_jsonl, load_node_records_from_jsonl
+)
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+def _make_synthetic_tree(node_count: int, seed: int = 420) -> list[dict]:
+    """
+    Make a Municode-like ToC of node_count nodes, as nested dictionaries with the same keys as NodeData.
+    Titles have the runs of whitespace the walkers leave behind.
+    """
+    rng = random.Random(seed)
+    made = 0
+
+    def _make_node(depth: int) -> dict:
+        nonlocal made
+        made += 1
+        node = {
+            'text': f"Sec.  {made}.   {rng.choice(['Definitions', 'Zoning  districts', 'Permits'])}\n   ",
+            'children': [],
+            'metadata': {'path': '', 'timestamp': '2024-11-26T12:00:00.000000', 'expanded': depth < 5},
+            'url': f"https://library.municode.com/ex/codes/code_of_ordinances?nodeId=N{made}",
+            'node_id': f"genToc_N{made}",
+            'depth': depth,
+        }
+        if depth < 5:
+            for _ in range(rng.randint(0, 8)):
+                if made >= node_count:
+                    break
+                node['children'].append(_make_node(depth + 1))
+        return node
+
+    roots = []
+    while made < node_count:
+        roots.append(_make_node(0))
+    return roots
+
+
+def _save_synthetic_tree(roots: list[dict], folder: str) -> tuple[str, str]:
+    """
+    Save a synthetic tree as a nested traversal results CSV and as JSON Lines node records.
+    """
+    csv_path = os.path.join(folder, "synthetic_menu_traversal_results.csv")
+    pd.DataFrame(
+        [{**root, 'children': repr(root['children'])} for root in roots],
+        columns=['text', 'children', 'metadata', 'url', 'node_id', 'depth']
+    ).to_csv(csv_path, index=False)
+
+    def _iter_records():
+        stack = [(root, None) for root in reversed(roots)]
+        while stack:
+            node, parent_id = stack.pop()
+            yield {key: node[key] for key in ('text', 'metadata', 'url', 'node_id', 'depth')} | {'parent_id': parent_id}
+            stack.extend((child, node['node_id']) for child in reversed(node['children']))
+
+    jsonl_path = os.path.join(folder, "synthetic_menu_traversal_results.jsonl")
+    save_node_records_to_jsonl(_iter_records(), jsonl_path)
+    return csv_path, jsonl_path
+
+
+def _best_time(func, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_unnest_engines(node_counts: tuple[int, ...] = (10_000, 30_000, 100_000), repeats: int = 3) -> pd.DataFrame:
+    """
+    Time each of unnest_csv's engines on synthetic trees of different sizes, from nested CSVs and from JSON Lines,
+    and check that every engine writes a byte-for-byte identical unnested CSV.
+    Each engine is timed on its own, on an already loaded input, and end to end, including reading and writing files.
+
+    Args:
+        node_counts (tuple[int, ...]): Number of nodes in each tree. Defaults to 10k, 30k, and 100k.
+        repeats (int): Number of runs per engine. The best run is reported. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: One row per tree size, input format, and engine, with the best engine and end-to-end times in seconds.
+
+    Example:
+        >>> results_df = benchmark_unnest_engines()
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for node_count in node_counts:
+            csv_path, jsonl_path = _save_synthetic_tree(_make_synthetic_tree(node_count), temp_dir)
+            for input_format, input_path in (("csv", csv_path), ("jsonl", jsonl_path)):
+                input_df = load_node_records_from_jsonl(input_path) if input_format == "jsonl" else pd.read_csv(input_path)
+                output_paths = []
+                for engine, unnest in UNNEST_ENGINES.items():
+                    output_path = os.path.join(temp_dir, f"{input_format}_{engine}_unnested.csv")
+                    results.append({
+                        'nodes': node_count,
+                        'format': input_format,
+                        'engine': engine,
+                        'engine_seconds': _best_time(lambda: unnest(input_df), repeats),
+                        'end_to_end_seconds': _best_time(lambda: unnest_csv(input_path, output_path, engine=engine), repeats),
+                    })
+                    output_paths.append(output_path)
+                identical = all(filecmp.cmp(output_paths[0], path, shallow=False) for path in output_paths[1:])
+                if not identical:
+                    logger.error(f"Engines wrote different unnested CSVs for {node_count:,} nodes from {input_format}.")
+
+    results_df = pd.DataFrame(results)
+    summary_df = results_df.pivot_table(
+        index=['nodes', 'format'], columns='engine', values=['engine_seconds', 'end_to_end_seconds']
+    )
+    for timing in ('engine_seconds', 'end_to_end_seconds'):
+        summary_df[(timing, 'speedup')] = summary_df[(timing, 'python')] / summary_df[(timing, 'vectorized')]
+    summary_df = summary_df.sort_index(axis=1, level=0, sort_remaining=False)
+    logger.info(f"Unnest engine benchmark (best of {repeats}, in seconds):\n{summary_df.to_string(float_format='{:.3f}'.format)}", f=True)
+    return results_df
+
+
+if __name__ == "__main__":
+    benchmark_unnest_engines()
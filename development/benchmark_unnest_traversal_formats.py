@@ -0,0 +1,104 @@
+import ast
+import os
+import tempfile
+import time
+
+
+import pandas as pd
+
+
+from validated.unnest_csv_step import unnest_csv
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import save_node_records_to_jsonl
+from config.config import OUTPUT_FOLDER
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+def _get_largest_traversal_results_csv(folder: str) -> str:
+    """
+    Get the path of the largest nested '*_menu_traversal_results.csv' file in a folder.
+    """
+    paths = [
+        os.path.join(folder, file) for file in os.listdir(folder) if file.endswith("traversal_results.csv")
+    ]
+    if not paths:
+        raise FileNotFoundError(f"No '*traversal_results.csv' files in {folder}")
+    return max(paths, key=os.path.getsize)
+
+
+def _convert_nested_csv_to_jsonl(csv_path: str, jsonl_path: str) -> int:
+    """
+    Convert a nested traversal results CSV to a JSON Lines file of node records with parent ids.
+    """
+    def _iter_records():
+        for row in pd.read_csv(csv_path).itertuples():
+            metadata = row.metadata
+            if isinstance(metadata, str):
+                metadata = ast.literal_eval(metadata)
+            yield {'text': row.text, 'parent_id': None, 'metadata': metadata,
+                   'url': row.url, 'node_id': row.node_id, 'depth': 0}
+            stack = [(child, row.node_id) for child in reversed(ast.literal_eval(row.children))]
+            while stack:
+                item, parent_id = stack.pop()
+                yield {'text': item['text'], 'parent_id': parent_id, 'metadata': item.get('metadata', {}),
+                       'url': item.get('url', ''), 'node_id': item.get('node_id', ''), 'depth': item.get('depth', '')}
+                stack.extend((child, item.get('node_id', '')) for child in reversed(item.get('children', [])))
+    return save_node_records_to_jsonl(_iter_records(), jsonl_path)
+
+
+def _time_unnest(input_path: str, output_path: str, repeats: int) -> tuple[float, int]:
+    """
+    Get the best time in seconds of unnest_csv on a file, and the number of rows it output.
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = unnest_csv(input_path, output_path)
+        best = min(best, time.perf_counter() - start)
+    return best, len(df)
+
+
+def benchmark_unnest_traversal_formats(csv_path: str = None, repeats: int = 3) -> dict:
+    """
+    Time unnest_csv on a nested traversal results CSV against the same traversal saved as JSON Lines node records.
+    Defaults to the largest traversal results CSV in the output folder, i.e. our largest library.
+
+    Args:
+        csv_path (str, optional): Path to a nested '*_menu_traversal_results.csv' file.
+        repeats (int): Number of runs per format. The best run is reported. Defaults to 3.
+
+    Returns:
+        dict: File sizes, best times, and row counts for each format.
+
+    Example:
+        >>> results = benchmark_unnest_traversal_formats()
+    """
+    csv_path = csv_path or _get_largest_traversal_results_csv(OUTPUT_FOLDER)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_path = os.path.join(temp_dir, os.path.basename(csv_path).replace(".csv", ".jsonl"))
+        node_count = _convert_nested_csv_to_jsonl(csv_path, jsonl_path)
+
+        csv_seconds, csv_rows = _time_unnest(csv_path, os.path.join(temp_dir, "csv_unnested.csv"), repeats)
+        jsonl_seconds, jsonl_rows = _time_unnest(jsonl_path, os.path.join(temp_dir, "jsonl_unnested.csv"), repeats)
+
+        results = {
+            'file': os.path.basename(csv_path),
+            'nodes': node_count,
+            'csv_bytes': os.path.getsize(csv_path),
+            'jsonl_bytes': os.path.getsize(jsonl_path),
+            'csv_seconds': csv_seconds,
+            'jsonl_seconds': jsonl_seconds,
+            'csv_rows': csv_rows,
+            'jsonl_rows': jsonl_rows,
+        }
+    logger.info(f"""
+    Unnest benchmark for {results['file']} ({node_count:,} nodes, best of {repeats}):
+    - Nested CSV (ast.literal_eval): {csv_seconds:.3f} s, {results['csv_bytes']:,} bytes, {csv_rows:,} rows
+    - JSON Lines node records: {jsonl_seconds:.3f} s, {results['jsonl_bytes']:,} bytes, {jsonl_rows:,} rows
+    - Speedup: {csv_seconds / jsonl_seconds if jsonl_seconds else float('inf'):.1f}x
+    """, f=True)
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_unnest_traversal_formats()
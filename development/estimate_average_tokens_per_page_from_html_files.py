@@ -1,3 +1,4 @@
+import json
 import os
 
 
@@ -77,16 +78,36 @@ def _get_total_number_of_tokens_for_html_files_in(
         total_tokens.append(total_tokens_in_file)
     return total_tokens
 
+def _get_total_number_of_tokens_for_jsonl_files_in(dir_path: str, jsonl_files: list[str]) -> list[int]:
+    """
+    Calculate the total number of tokens for chunk JSONL files in a directory,
+    e.g. those written by ScrapeMunicodeLibraryPage.extract_chunks_to_disk.
+    The chunks' text is already extracted, so no HTML needs to be parsed.
+
+    Returns:
+        list[int]: A list of total token counts, one for each JSONL file.
+    """
+    encoding = tk.encoding_for_model("gpt-4o")
+    total_tokens = []
+
+    for file in tqdm.tqdm(jsonl_files, desc="Processing JSONL files", unit="file"):
+        with open(os.path.join(dir_path, file), "r", encoding="utf-8") as f:
+            total_tokens.append(sum(len(encoding.encode(json.loads(line)['text'])) for line in f))
+    return total_tokens
+
+
 def estimate_average_tokens_per_page_from_html_files(class_: str = "chunk-content-wrapper") -> float:
     """
     Estimate the average number of tokens per page from HTML files in a specific directory.
 
     Returns:
-        float: The average number of tokens per HTML file. Returns 100 if no HTML files are found.
+        float: The average number of tokens per HTML file. Returns 100 if no HTML or chunk JSONL files are found.
 
     Note:
         - The function looks for HTML files in the directory specified by OUTPUT_FOLDER/scrape_municode_library_page.
         - It searches for elements with the class 'chunk-content-wrapper' within each HTML file.
+        - Chunk JSONL files ('.chunks.jsonl') are counted too, from their already extracted text.
+          An HTML file with a chunk JSONL file of the same page is skipped, so the page isn't counted twice.
         - The token count is based on the GPT-4 tokenizer.
         - Logging is used to provide information about the process and results.
     """
@@ -94,18 +115,25 @@ def estimate_average_tokens_per_page_from_html_files(class_: str = "chunk-conten
     dir_path = os.path.join(OUTPUT_FOLDER, "scrape_municode_library_page")
 
     # Get the html files in the directory and how many of them there are.
-    html_files = [file for file in os.listdir(dir_path) if file.endswith(".html")]
-    if html_files == 0:
-        logger.error(f"No HTML files found in directory '{dir_path}'. Returning 1000 as default...")
+    jsonl_files = [file for file in os.listdir(dir_path) if file.endswith(".chunks.jsonl")]
+    html_files = [
+        file for file in os.listdir(dir_path)
+        if file.endswith(".html") and file.removesuffix(".html") + ".chunks.jsonl" not in jsonl_files
+    ]
+    if not html_files and not jsonl_files:
+        logger.error(f"No HTML or chunk JSONL files found in directory '{dir_path}'. Returning 100 as default...")
         return 100
 
     # Get the total tokens for the HTML files in the directory.
     total_tokens= _get_total_number_of_tokens_for_html_files_in(dir_path, class_, html_files)
+    total_tokens += _get_total_number_of_tokens_for_jsonl_files_in(dir_path, jsonl_files)
 
-    average_per_file = sum(total_tokens) / len(html_files) if html_files else 0
+    num_files = len(html_files) + len(jsonl_files)
+    average_per_file = sum(total_tokens) / num_files if num_files else 0
 
     logger.info(f"""
     Total HTML Files: {len(html_files):,}
+    Total JSONL Files: {len(jsonl_files):,}
     Total tokens: {sum(total_tokens):,}
     Average tokens within
     Average tokens per file: {average_per_file:,}
@@ -143,6 +143,7 @@ class Logger:
         error(message, f=False, q=True, t=None, off=False): Log a message with severity 'ERROR'.
         critical(message, f=False, q=True, t=None, off=False): Log a message with severity 'CRITICAL'.
         exception(message, f=False, q=True, t=None, off=False): Log a message with severity 'ERROR', including exception information.
+        register_shutdown_callback(callback): Register a function to call during cleanup, e.g. to flush buffered output.
         _setup_signal_handlers(): Register signal handlers for graceful shutdown.
         _handle_shutdown_signal(signum, frame): Handle shutdown signals.
         _cleanup(): Clean up logging resources on exit.
@@ -164,6 +165,7 @@ class Logger:
           between regular and formatted strings at runtime.
         - The class includes signal handling for graceful shutdown on SIGINT and SIGTERM signals.
     """
+    _shutdown_callbacks: list[Callable] = [] # Shared by every logger, since only the last one's signal handler is active.
 
     def __init__(self,
                  logger_name: str=PROGRAM_NAME,
@@ -241,6 +243,14 @@ class Logger:
             self.logger.addHandler(file_handler)
             self.logger.addHandler(console_handler)
 
+    @classmethod
+    def register_shutdown_callback(cls, callback: Callable) -> None:
+        """
+        Register a function to call on a graceful shutdown, before the log handlers are flushed.
+        """
+        if callback not in cls._shutdown_callbacks:
+            cls._shutdown_callbacks.append(callback)
+
     def _setup_signal_handlers(self):
         """
         Register the signal handlers.
@@ -276,6 +286,11 @@ class Logger:
         """
         Cleanup logging resources on exit.
         """
+        for callback in self._shutdown_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Error in shutdown callback {getattr(callback, '__qualname__', callback)}: {e}")
         for handler in self.logger.handlers:
             handler.flush()
         logging.shutdown()
@@ -16,6 +16,7 @@ from utils.shared.randomly_select_value_from_pandas_dataframe_column import (
 )
 
 from web_scraper.sites.municode.library.scrape_municode_library_page import ScrapeMunicodeLibraryPage
+from web_scraper.playwright.async_.utils.browser_memory_watchdog import BrowserMemoryWatchdog
 
 from config.config import OUTPUT_FOLDER, RANDOM_SEED, INPUT_FOLDER, INPUT_FILENAME
 from logger.logger import Logger
@@ -24,13 +25,13 @@ logger = Logger(logger_name=__name__)
 
 from validated.unnest_csv_step import unnest_csv_step
 UNNEST_CSV_ROUTE = False
+NUM_WORKERS = 1 # Scrape with this many worker processes if more than 1.
 
-from development.pandas_dataframe_row import MuniRow
-
-
-from development.row_is_in_this_dataframe import row_is_in_this_dataframe
+from scrape_municode_libraries import (
+    MUNICODE_DOMAIN, open_state_store, scrape_municode_libraries_pipelined, scrape_municode_libraries_with_workers
+)
 
-from validated.append_pandas_row_to_csv import append_pandas_row_to_csv
+from development.pandas_dataframe_row import MuniRow
 
 
 from development.estimate_average_tokens_per_page_from_html_files import (
@@ -78,61 +79,40 @@ async def main():
     header_line = 0
     count_list = []
     input_urls_df: pd.DataFrame = pd.read_csv(os.path.join(INPUT_FOLDER, ("input_urls.csv")))
-    output_urls_df: pd.DataFrame = pd.read_csv(os.path.join(INPUT_FOLDER, ("output_urls.csv")))
-    malformed_urls_df: pd.DataFrame = pd.read_csv(os.path.join(INPUT_FOLDER, ("malformed_urls.csv")))
-    walk_failed_urls_df: pd.DataFrame = pd.read_csv(os.path.join(INPUT_FOLDER, ("walk_failed_urls.csv")))
+
+    if UNNEST_CSV_ROUTE:
+        next_step("Step 2. Unnest every traversal results file in the output folder.")
+        unnest_csv_step(logger=logger, UNNEST_CSV_ROUTE=UNNEST_CSV_ROUTE)
+        logger.info(f"End __main__")
+        sys.exit(0)
+
+    if NUM_WORKERS > 1:
+        next_step(f"Step 2. Scrape each URL across {NUM_WORKERS} worker processes.")
+        await asyncio.to_thread(scrape_municode_libraries_with_workers, input_urls_df, NUM_WORKERS)
+        logger.info(f"End __main__")
+        sys.exit(0)
+
+    state_store = open_state_store(input_urls_df)
+    input_urls_df = state_store.pending_rows(input_urls_df)
 
     next_step("Step 2. Scrape each URL.")
     async with async_playwright() as pw_instance:
         scraper: ScrapeMunicodeLibraryPage = await ScrapeMunicodeLibraryPage.start(
-            domain="https://municode.com/", 
+            domain=MUNICODE_DOMAIN, 
             pw_instance=pw_instance, 
-            headless=False
+            headless=False,
+            memory_watchdog=BrowserMemoryWatchdog()
         )
 
-        len_input_urls_df = len(input_urls_df)
-        for idx, row in enumerate(input_urls_df.itertuples(), start=1): 
-            # -> NamedTuple(Index=0, gnis=12345, place_name='City of Example', url='https://example.com'):
-            logger.info(f"Processing URL {idx} of {len_input_urls_df}: {row.url}")
-
-            if row_is_in_this_dataframe(row.gnis, 'gnis', output_urls_df):
-                logger.info(f"Skipping URL: {row.url} because the GNIS {row.gnis} is already in the output_urls.csv file")
-                continue
-
-            if row_is_in_this_dataframe(row.gnis, 'gnis', walk_failed_urls_df):
-                logger.info(f"Skipping URL: {row.url} with GNIS {row.gnis} because the previous attempt to walk it failed.")
-                continue
-
-            if "%2C" in row.url or "," in row.url or row_is_in_this_dataframe(row.gnis, 'gnis', malformed_urls_df):
-                logger.info(f"Skipping URL: {row.url} because it contains '%2c' or ','. This will produce a 404 if loaded.")
-                append_pandas_row_to_csv(row, "malformed_urls.csv")
-                continue
-
-            next_step("Step 2.1 Go to each URL.")
-            await scraper.navigate_to(url=row.url, idx=idx)
-
-            next_step("Step 2.2 Count number of top-level menu elements.")
-            count_list = await scraper.count_top_level_menu_elements(count_list)
-
-            next_step("Step 2.3 Scrape Municode's Table of Contents nested menu, save it to CSV, and return a pandas DataFrame.")
-            df = await scraper.scrape_municode_toc_menu(row)
-            if df is None:
-                append_pandas_row_to_csv(row, "walk_failed_urls.csv")
-                continue
-
-            next_step("Step 2.4 Flatten the nested dataframe.")
-            df = unnest_csv_step(df, row, logger=logger, UNNEST_CSV_ROUTE=UNNEST_CSV_ROUTE)
-
-            next_step("Step 2.5 Randomly select a URL from the DataFrame to get to the final URL.")
-            url = randomly_select_value_from_pandas_dataframe_column('url', df, seed=RANDOM_SEED)
-
-            next_step("Step 2.6 Download the HTML of the final URL to disk.")
-            await scraper.download_html_to_disk(url)
-
-            next_step(f"Step 2.7 Append the rows DataFrame to output_urls.csv in the output folder.")
-            append_pandas_row_to_csv(row, "output_urls.csv")
+        # Rows -> NamedTuple(Index=0, gnis=12345, place_name='City of Example', url='https://example.com')
+        # Walk, unnest, download, and record each row in pipelined stages.
+        await scrape_municode_libraries_pipelined(
+            scraper, input_urls_df, count_list, state_store
+        )
 
         await scraper.exit()
+    logger.info(f"Library statuses: {state_store.status_counts()}")
+    state_store.close()
 
     # next_step("Step 3. Get the total size of the HTML documents in the HTML directory.")
 
@@ -0,0 +1,420 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+import multiprocessing.sharedctypes
+import queue
+import time
+from typing import Optional
+
+
+import pandas as pd
+from playwright.async_api import async_playwright
+
+
+from utils.shared.next_step import next_step
+from utils.shared.limiters.PolitenessLimiter import PolitenessLimiter
+from utils.shared.limiters.SharedPolitenessLimiter import SharedPolitenessLimiter
+from utils.shared.randomly_select_value_from_pandas_dataframe_column import (
+    randomly_select_value_from_pandas_dataframe_column
+)
+from web_scraper.playwright.async_.utils.route_blocking_profile import get_domain
+from web_scraper.playwright.async_.utils.browser_memory_watchdog import BrowserMemoryWatchdog
+from web_scraper.sites.municode.library.scrape_municode_library_page import ScrapeMunicodeLibraryPage
+from validated.gnis_state_store import GnisStateStore
+from validated.unnest_csv_step import unnest_csv_step
+
+from config.config import RANDOM_SEED
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+MUNICODE_DOMAIN = "https://municode.com/"
+WORKER_FINISHED = "worker_finished" # Status a worker sends once it has no rows left.
+
+
+def open_state_store(input_urls_df: pd.DataFrame = None) -> GnisStateStore:
+    """
+    Open the GNIS state store, carrying over the bookkeeping CSVs of earlier runs and adding any new input rows.
+    """
+    state_store = GnisStateStore()
+    state_store.import_csvs()
+    if input_urls_df is not None:
+        added = state_store.add_rows(input_urls_df)
+        logger.info(f"Added {added:,} new libraries to the state store. Statuses: {state_store.status_counts()}")
+    return state_store
+
+
+def _get_skip_status(row, state_store: GnisStateStore) -> Optional[str]:
+    """
+    Check whether a row should be skipped, recording malformed URLs.
+
+    Returns:
+        str: "skipped" or "malformed" if the row should be skipped, otherwise None.
+    """
+    status = state_store.get_status(row.gnis)
+    if status == "done":
+        logger.info(f"Skipping URL: {row.url} because the GNIS {row.gnis} has already been scraped.")
+        return "skipped"
+
+    if status == "walk_failed":
+        logger.info(f"Skipping URL: {row.url} with GNIS {row.gnis} because the previous attempt to walk it failed.")
+        return "skipped"
+
+    if "%2C" in row.url or "," in row.url or status == "malformed":
+        logger.info(f"Skipping URL: {row.url} because it contains '%2c' or ','. This will produce a 404 if loaded.")
+        if status != "malformed":
+            state_store.set_status(row.gnis, "malformed", row=row)
+        return "malformed"
+    return None
+
+
+async def scrape_library_row(scraper: ScrapeMunicodeLibraryPage,
+                             row,
+                             idx: int,
+                             count_list: list[int],
+                             state_store: GnisStateStore,
+                             unnest_csv_route: bool = False
+                            ) -> str:
+    """
+    Scrape one Municode library: walk its Table of Contents, flatten it, and download one of its pages.
+    The outcome is recorded in the state store.
+
+    Returns:
+        str: What happened to the row: "skipped", "malformed", "failed", "download_failed", or "done".
+    """
+    skip_status = _get_skip_status(row, state_store)
+    if skip_status:
+        return skip_status
+
+    try:
+        return await _walk_and_download_library(scraper, row, idx, count_list, state_store, unnest_csv_route)
+    finally:
+        await scraper.check_memory(f"GNIS {row.gnis}")
+
+
+async def _walk_and_download_library(scraper: ScrapeMunicodeLibraryPage,
+                                     row,
+                                     idx: int,
+                                     count_list: list[int],
+                                     state_store: GnisStateStore,
+                                     unnest_csv_route: bool
+                                    ) -> str:
+    next_step("Step 2.1 Go to each URL.")
+    await scraper.navigate_to(url=row.url, idx=idx, page_type="library")
+
+    next_step("Step 2.2 Count number of top-level menu elements.")
+    count_list = await scraper.count_top_level_menu_elements(count_list)
+
+    next_step("Step 2.3 Scrape Municode's Table of Contents nested menu, save it to CSV, and return a pandas DataFrame.")
+    df = await scraper.scrape_municode_toc_menu(row)
+    if df is None:
+        state_store.set_status(row.gnis, "walk_failed", row=row)
+        return "failed"
+
+    next_step("Step 2.4 Flatten the nested dataframe.")
+    df = unnest_csv_step(df, row, logger=logger, UNNEST_CSV_ROUTE=unnest_csv_route)
+
+    next_step("Step 2.5 Randomly select a URL from the DataFrame to get to the final URL.")
+    url = randomly_select_value_from_pandas_dataframe_column('url', df, seed=RANDOM_SEED)
+
+    next_step("Step 2.6 Download the HTML of the final URL to disk.")
+    artifact_path = await scraper.download_html_to_disk(url)
+    if artifact_path is None:
+        # Not a skip status, so the library is tried again on the next run.
+        state_store.set_status(row.gnis, "download_failed", row=row)
+        return "download_failed"
+
+    next_step(f"Step 2.7 Mark the library as done in the state store.")
+    state_store.set_status(row.gnis, "done", artifact_path=artifact_path, row=row)
+    return "done"
+
+
+async def _scrape_worker(worker_id: int,
+                         rows_df: pd.DataFrame,
+                         last_request: multiprocessing.sharedctypes.Synchronized,
+                         progress_queue: multiprocessing.Queue,
+                         headless: bool
+                        ) -> None:
+    # Every worker's page loads go through the same schedule, so together they still honour robots.txt.
+    PolitenessLimiter.register(get_domain(MUNICODE_DOMAIN), SharedPolitenessLimiter(last_request))
+    # Every worker has its own connection. Write-ahead logging lets them read while another one writes.
+    state_store = GnisStateStore()
+    count_list = []
+    try:
+        async with async_playwright() as pw_instance:
+            scraper: ScrapeMunicodeLibraryPage = await ScrapeMunicodeLibraryPage.start(
+                domain=MUNICODE_DOMAIN,
+                pw_instance=pw_instance,
+                headless=headless,
+                memory_watchdog=BrowserMemoryWatchdog()
+            )
+            for idx, row in enumerate(rows_df.itertuples(), start=1):
+                start = time.perf_counter()
+                try:
+                    status = await scrape_library_row(scraper, row, idx, count_list, state_store)
+                except Exception as e:
+                    logger.error(f"Worker {worker_id} errored on {row.url}: {e}")
+                    state_store.set_status(row.gnis, "error", row=row)
+                    status = "error"
+                progress_queue.put({
+                    'worker_id': worker_id, 'gnis': row.gnis, 'status': status, 'seconds': time.perf_counter() - start
+                })
+            await scraper.exit()
+    finally:
+        state_store.close()
+        progress_queue.put({'worker_id': worker_id, 'status': WORKER_FINISHED})
+
+
+def run_scrape_worker(worker_id: int,
+                      rows_df: pd.DataFrame,
+                      last_request: multiprocessing.sharedctypes.Synchronized,
+                      progress_queue: multiprocessing.Queue,
+                      headless: bool = False
+                     ) -> None:
+    """
+    Entry point of a worker process. Scrapes its shard of rows with its own event loop and browser.
+    """
+    asyncio.run(_scrape_worker(worker_id, rows_df, last_request, progress_queue, headless))
+
+
+def scrape_municode_libraries_with_workers(input_urls_df: pd.DataFrame,
+                                           num_workers: int,
+                                           headless: bool = False
+                                          ) -> pd.DataFrame:
+    """
+    Shard the libraries in input_urls_df that still need scraping across worker processes,
+    each with its own event loop and browser, and collect their progress as they go. Every worker shares one politeness schedule through
+    a SharedPolitenessLimiter, so the combined request rate still honours robots.txt,
+    while CPU-bound post-processing (unnesting, pandas, file writes) is spread across cores.
+
+    Args:
+        input_urls_df (pd.DataFrame): Rows with gnis, place_name, and url columns.
+        num_workers (int): Number of worker processes.
+        headless (bool): Whether the workers' browsers are headless. Defaults to False.
+
+    Returns:
+        pd.DataFrame: One row per processed library, with its worker_id, gnis, status, and seconds taken.
+
+    Example:
+        >>> summary_df = scrape_municode_libraries_with_workers(input_urls_df, num_workers=4)
+    """
+    state_store = open_state_store(input_urls_df)
+    input_urls_df = state_store.pending_rows(input_urls_df)
+    state_store.close()
+
+    ctx = multiprocessing.get_context("spawn")
+    last_request = ctx.Value('d', 0.0)
+    progress_queue = ctx.Queue()
+
+    # Deal the rows out round-robin, so each worker gets a similar mix of libraries.
+    shards = [input_urls_df.iloc[i::num_workers] for i in range(num_workers)]
+    processes = [
+        ctx.Process(
+            target=run_scrape_worker,
+            args=(worker_id, shard, last_request, progress_queue, headless),
+            name=f"scrape_worker_{worker_id}"
+        )
+        for worker_id, shard in enumerate(shards) if len(shard) > 0
+    ]
+    logger.info(f"Scraping {len(input_urls_df):,} libraries across {len(processes)} worker processes...")
+    for process in processes:
+        process.start()
+
+    start = time.perf_counter()
+    results: list[dict] = []
+    finished = 0
+    while finished < len(processes):
+        try:
+            message = progress_queue.get(timeout=5)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                logger.error("Every worker process has exited without finishing. Stopping...")
+                break
+            continue
+        if message['status'] == WORKER_FINISHED:
+            finished += 1
+            logger.info(f"Worker {message['worker_id']} finished ({finished} of {len(processes)}).")
+            continue
+        results.append(message)
+        logger.info(
+            f"Worker {message['worker_id']}: GNIS {message['gnis']} {message['status']} "
+            f"in {message['seconds']:.1f} seconds ({len(results):,} of {len(input_urls_df):,} libraries)"
+        )
+
+    for process in processes:
+        process.join()
+
+    summary_df = pd.DataFrame(results, columns=['worker_id', 'gnis', 'status', 'seconds'])
+    logger.info(f"""
+    Worker run finished:
+    - Libraries processed: {len(summary_df):,} of {len(input_urls_df):,}
+    - Statuses: {summary_df['status'].value_counts().to_dict()}
+    - Duration: {time.perf_counter() - start:.2f} seconds
+    """, f=True)
+    return summary_df
+
+
+@dataclass
+class StageStats:
+    """
+    Throughput counters for one stage of scrape_municode_libraries_pipelined.
+    busy_seconds is time spent working, and blocked_seconds is time spent waiting on a full downstream queue.
+    """
+    name: str
+    items: int = 0
+    busy_seconds: float = 0
+    blocked_seconds: float = 0
+
+    def summary(self, elapsed: float) -> str:
+        per_minute = self.items / elapsed * 60 if elapsed else 0
+        return (
+            f"    - {self.name}: {self.items:,} items ({per_minute:.2f}/min), "
+            f"{self.busy_seconds:.1f} s busy, {self.blocked_seconds:.1f} s blocked on a full queue"
+        )
+
+
+def _unnest_and_select_url(df: pd.DataFrame, row, unnest_csv_route: bool) -> str:
+    """
+    Flatten a walked ToC and randomly select one of its URLs. CPU-bound, so run in an executor.
+    """
+    df = unnest_csv_step(df, row, logger=logger, UNNEST_CSV_ROUTE=unnest_csv_route)
+    return randomly_select_value_from_pandas_dataframe_column('url', df, seed=RANDOM_SEED)
+
+
+async def scrape_municode_libraries_pipelined(scraper: ScrapeMunicodeLibraryPage,
+                                              input_urls_df: pd.DataFrame,
+                                              count_list: list[int],
+                                              state_store: GnisStateStore,
+                                              queue_size: int = 2,
+                                              max_workers: int = 2,
+                                              unnest_csv_route: bool = False
+                                             ) -> list[StageStats]:
+    """
+    Scrape Municode libraries as a pipeline of stages connected by bounded queues, so that
+    the post-processing of one library overlaps with the network waits of the next:
+
+    1. walk: skip checks, navigate, count, and walk the ToC (browser).
+    2. unnest: flatten the ToC and pick a URL (executor).
+    3. download: download the picked URL's content and check browser memory (browser).
+    4. record: mark the library as done, or as download_failed, in the state store.
+
+    The two browser stages share the scraper, so they take turns through a lock.
+    A library that errors in a stage is marked as "error" and dropped from the pipeline, so the rest carry on.
+    A full queue makes the stage before it wait, so at most queue_size libraries are buffered between stages.
+
+    Args:
+        scraper (ScrapeMunicodeLibraryPage): A started scraper.
+        input_urls_df (pd.DataFrame): Rows with gnis, place_name, and url columns.
+        count_list (list[int]): List the number of top-level menu elements of each library is appended to.
+        state_store (GnisStateStore): Where each library's status is checked and recorded. See open_state_store.
+        queue_size (int): Maximum number of libraries waiting between two stages. Defaults to 2.
+        max_workers (int): Number of executor threads for the unnest stage. Defaults to 2.
+        unnest_csv_route (bool): Passed to unnest_csv_step. Defaults to False.
+
+    Returns:
+        list[StageStats]: Throughput counters for each stage.
+    """
+    loop = asyncio.get_running_loop()
+    browser_lock = asyncio.Lock()
+    walked: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    unnested: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    downloaded: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    stats = {name: StageStats(name) for name in ("walk", "unnest", "download", "record")}
+    len_input_urls_df = len(input_urls_df)
+
+    async def _put(queue_: asyncio.Queue, item, stage: StageStats) -> None:
+        start = time.perf_counter()
+        await queue_.put(item)
+        stage.blocked_seconds += time.perf_counter() - start
+
+    def _record_error(row, stage: StageStats, e: Exception) -> None:
+        # One library failing shouldn't stop the others, so it's recorded to be retried on the next run.
+        logger.error(f"The {stage.name} stage errored on {row.url}: {e}")
+        state_store.set_status(row.gnis, "error", row=row)
+
+    # NOTE Each stage tells the next one there's nothing more coming with a None.
+    # It isn't sent from a finally block, as a stage only stops early when the task group is cancelling every stage.
+    async def _walk_stage() -> None:
+        stage = stats["walk"]
+        for idx, row in enumerate(input_urls_df.itertuples(), start=1):
+            logger.info(f"Processing URL {idx} of {len_input_urls_df}: {row.url}")
+            if _get_skip_status(row, state_store):
+                continue
+            start = time.perf_counter()
+            try:
+                async with browser_lock:
+                    await scraper.navigate_to(url=row.url, idx=idx, page_type="library")
+                    await scraper.count_top_level_menu_elements(count_list)
+                    df = await scraper.scrape_municode_toc_menu(row)
+            except Exception as e:
+                _record_error(row, stage, e)
+                continue
+            stage.busy_seconds += time.perf_counter() - start
+            stage.items += 1
+            if df is None:
+                state_store.set_status(row.gnis, "walk_failed", row=row)
+                continue
+            await _put(walked, (row, df), stage)
+        await walked.put(None)
+
+    async def _unnest_stage() -> None:
+        stage = stats["unnest"]
+        while (item := await walked.get()) is not None:
+            row, df = item
+            start = time.perf_counter()
+            try:
+                url = await loop.run_in_executor(executor, _unnest_and_select_url, df, row, unnest_csv_route)
+            except Exception as e:
+                _record_error(row, stage, e)
+                continue
+            stage.busy_seconds += time.perf_counter() - start
+            stage.items += 1
+            await _put(unnested, (row, url), stage)
+        await unnested.put(None)
+
+    async def _download_stage() -> None:
+        stage = stats["download"]
+        while (item := await unnested.get()) is not None:
+            row, url = item
+            start = time.perf_counter()
+            try:
+                async with browser_lock:
+                    artifact_path = await scraper.download_html_to_disk(url)
+                    await scraper.check_memory(f"GNIS {row.gnis}")
+            except Exception as e:
+                _record_error(row, stage, e)
+                continue
+            stage.busy_seconds += time.perf_counter() - start
+            stage.items += 1
+            await _put(downloaded, (row, artifact_path), stage)
+        await downloaded.put(None)
+
+    async def _record_stage() -> None:
+        stage = stats["record"]
+        while (item := await downloaded.get()) is not None:
+            row, artifact_path = item
+            start = time.perf_counter()
+            # A single-row transaction, so it's done on the loop rather than moving the connection between threads.
+            if artifact_path is None:
+                state_store.set_status(row.gnis, "download_failed", row=row)
+            else:
+                state_store.set_status(row.gnis, "done", artifact_path=artifact_path, row=row)
+            stage.busy_seconds += time.perf_counter() - start
+            stage.items += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as executor:
+        # If a stage fails outright, the task group cancels the others, so none of them is left waiting on a queue.
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for stage in (_walk_stage, _unnest_stage, _download_stage, _record_stage):
+                    task_group.create_task(stage())
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+    elapsed = time.perf_counter() - start
+
+    logger.info("\n".join(
+        [f"Pipeline finished in {elapsed:.2f} seconds:"] + [stage.summary(elapsed) for stage in stats.values()]
+    ), f=True)
+    return list(stats.values())
@@ -0,0 +1,93 @@
+import json
+
+
+import pandas as pd
+
+
+from utils.shared.sanitize_filename import sanitize_filename
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import load_node_records_from_jsonl
+from web_scraper.sites.municode.library.table_of_contents.rebuild_municode_toc_from_html import (
+    group_html_files_by_library, iter_toc_records_from_html, rebuild_traversal_results_from_html_files
+)
+
+
+LIBRARY_URL = "https://library.municode.com/ex/example/codes/code_of_ordinances"
+
+# The body of an expanded Municode ToC: chapter 1 and its article are expanded, chapter 2 isn't.
+EXPANDED_HTML = f"""
+<div><ul>
+  <li id="genTocCH1">
+    <button>Collapse</button><a href="{LIBRARY_URL}?nodeId=CH1">Chapter 1.  General</a>
+    <ul>
+      <li id="genTocCH1ARTI">
+        <button>Collapse</button><a href="{LIBRARY_URL}?nodeId=CH1ARTI">Article I. In General</a>
+        <ul>
+          <li id="genTocCH1ARTIS1-1"><a href="{LIBRARY_URL}?nodeId=CH1ARTIS1-1">Sec. 1-1. Definitions</a></li>
+          <li id="genTocCH1ARTIS1-2"><a href="{LIBRARY_URL}?nodeId=CH1ARTIS1-2">Sec. 1-2. Penalties</a></li>
+        </ul>
+      </li>
+      <li id="genTocCH1S1-3"><a href="{LIBRARY_URL}?nodeId=CH1S1-3">Sec. 1-3. Severability</a></li>
+    </ul>
+  </li>
+  <li id="genTocCH2">
+    <button>Expand</button><a href="{LIBRARY_URL}?nodeId=CH2">Chapter 2. Zoning</a>
+  </li>
+</ul></div>
+"""
+
+# An extra page, with only chapter 2 expanded.
+EXTRA_PAGE_HTML = f"""
+<div><ul>
+  <li id="genTocCH1"><button>Expand</button><a href="{LIBRARY_URL}?nodeId=CH1">Chapter 1.  General</a></li>
+  <li id="genTocCH2">
+    <button>Collapse</button><a href="{LIBRARY_URL}?nodeId=CH2">Chapter 2. Zoning</a>
+    <ul><li id="genTocCH2S2-1"><a href="{LIBRARY_URL}?nodeId=CH2S2-1">Sec. 2-1. Districts</a></li></ul>
+  </li>
+</ul></div>
+"""
+
+
+def test_records_are_nested_in_pre_order_with_parent_ids_and_depths():
+    records = list(iter_toc_records_from_html(EXPANDED_HTML, source="example.html"))
+
+    assert [(record['node_id'], record['parent_id'], record['depth']) for record in records] == [
+        ("genTocCH1", None, 0),
+        ("genTocCH1ARTI", "genTocCH1", 1),
+        ("genTocCH1ARTIS1-1", "genTocCH1ARTI", 2),
+        ("genTocCH1ARTIS1-2", "genTocCH1ARTI", 2),
+        ("genTocCH1S1-3", "genTocCH1", 1),
+        ("genTocCH2", None, 0),
+    ]
+    assert records[0]['text'] == "Chapter 1.  General"
+    assert records[0]['url'] == f"{LIBRARY_URL}?nodeId=CH1"
+    metadata = [json.loads(record['metadata']) for record in records]
+    assert metadata[0] == {'path': '', 'source': "example.html", 'expanded': True}
+    assert metadata[2] == {'path': '', 'source': "example.html"} # Leaves have no button.
+    assert metadata[5]['expanded'] is False
+
+
+def test_html_files_are_named_after_their_library_and_merged(tmp_path):
+    stem = sanitize_filename(LIBRARY_URL)
+    main_page, extra_page = tmp_path / f"{stem}.html", tmp_path / f"{stem}_page1.html"
+    main_page.write_text(EXPANDED_HTML, encoding='utf-8')
+    extra_page.write_text(EXTRA_PAGE_HTML, encoding='utf-8')
+    unknown_page = tmp_path / "unknown.html"
+    libraries = pd.DataFrame({'gnis': [12345], 'place_name': ["City of Example"], 'url': [LIBRARY_URL]})
+
+    groups = group_html_files_by_library([str(extra_page), str(unknown_page), str(main_page)], libraries)
+    assert groups == {
+        "city_of_example_12345_menu_traversal_results.jsonl": [str(main_page), str(extra_page)],
+        "unknown_menu_traversal_results.jsonl": [str(unknown_page)],
+    }
+
+    output_path = tmp_path / "city_of_example_12345_menu_traversal_results.jsonl"
+    summary = rebuild_traversal_results_from_html_files(groups[output_path.name], str(output_path))
+    assert summary['error'] is None
+    df = load_node_records_from_jsonl(str(output_path))
+    # Every node once, with the extra page's nodes after the main page's.
+    assert df['node_id'].tolist() == [
+        "genTocCH1", "genTocCH1ARTI", "genTocCH1ARTIS1-1", "genTocCH1ARTIS1-2", "genTocCH1S1-3", "genTocCH2",
+        "genTocCH2S2-1",
+    ]
+    assert df['parent_id'].iloc[-1] == "genTocCH2"
+    assert summary['node_count'] == 7
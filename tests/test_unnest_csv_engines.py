@@ -0,0 +1,137 @@
+import json
+
+
+import pandas as pd
+import pytest
+
+
+from validated.unnest_csv_step import unnest_csv, UNNEST_ENGINES, UNNESTED_COLUMNS
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import (
+    FLAT_NODE_COLUMNS, save_node_records_to_jsonl
+)
+
+
+NESTED_COLUMNS = ['text', 'children', 'metadata', 'url', 'node_id', 'depth']
+
+
+def _make_node(node_id: str, text, depth: int, children: list[dict] = None) -> dict:
+    return {
+        'text': text,
+        'children': children or [],
+        'metadata': {'path': '', 'expanded': bool(children)},
+        'url': f"https://library.municode.com/ex/codes/code_of_ordinances?nodeId={node_id}",
+        'node_id': f"genToc_{node_id}",
+        'depth': depth,
+    }
+
+
+def _make_tree() -> list[dict]:
+    return [
+        _make_node("A", "Chapter  1.   General\n  provisions", 0, [
+            _make_node("A1", "Sec.  1-1.   Definitions", 1, [
+                _make_node("A1a", "(a)  Terms", 2),
+                _make_node("A1b", float("nan"), 2), # e.g. a node whose text couldn't be read.
+            ]),
+            _make_node("A2", "Sec. 1-2. Penalties", 1),
+        ]),
+        _make_node("B", "Chapter 2.  Zoning", 0, [_make_node("B1", "Sec.   2-1.  Districts", 1)]),
+        _make_node("C", float("nan"), 0),
+    ]
+
+
+def _make_nested_df(roots: list[dict], children_as_str: bool = False) -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {**root, 'metadata': json.dumps(root['metadata']),
+             'children': repr(root['children']) if children_as_str else root['children']}
+            for root in roots
+        ],
+        columns=NESTED_COLUMNS
+    )
+
+
+def _iter_flat_records(roots: list[dict]):
+    stack = [(root, None) for root in reversed(roots)]
+    while stack:
+        node, parent_id = stack.pop()
+        yield {key: node[key] for key in FLAT_NODE_COLUMNS if key != 'parent_id'} | {'parent_id': parent_id}
+        stack.extend((child, node['node_id']) for child in reversed(node['children']))
+
+
+def _make_flat_df(roots: list[dict]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [record | {'metadata': json.dumps(record['metadata'])} for record in _iter_flat_records(roots)],
+        columns=FLAT_NODE_COLUMNS
+    )
+
+
+INPUTS = {
+    "nested": lambda: _make_nested_df(_make_tree()),
+    "nested_children_as_str": lambda: _make_nested_df(_make_tree(), children_as_str=True),
+    "flat_parent_id": lambda: _make_flat_df(_make_tree()),
+    "flat_with_unknown_parent": lambda: _make_flat_df(_make_tree()).assign(
+        parent_id=lambda df: df['parent_id'].where(df['node_id'] != "genToc_B1", "genToc_missing")
+    ),
+    "empty_nested": lambda: pd.DataFrame(columns=NESTED_COLUMNS),
+    "empty_flat": lambda: pd.DataFrame(columns=FLAT_NODE_COLUMNS),
+}
+
+
+def _unnest_with_every_engine(df: pd.DataFrame, tmp_path) -> dict[str, tuple[pd.DataFrame, bytes]]:
+    outputs = {}
+    for engine in UNNEST_ENGINES:
+        output_path = tmp_path / f"{engine}_unnested.csv"
+        result_df = unnest_csv(df.copy(), str(output_path), engine=engine)
+        outputs[engine] = (result_df, output_path.read_bytes())
+    return outputs
+
+
+@pytest.mark.parametrize("input_name", INPUTS)
+def test_every_engine_gives_the_same_output(input_name, tmp_path):
+    outputs = _unnest_with_every_engine(INPUTS[input_name](), tmp_path)
+
+    (expected_df, expected_csv), *others = outputs.values()
+    assert list(expected_df.columns) == UNNESTED_COLUMNS
+    for result_df, result_csv in others:
+        assert list(result_df.columns) == UNNESTED_COLUMNS
+        assert result_csv == expected_csv
+        pd.testing.assert_frame_equal(result_df, expected_df, check_dtype=False)
+
+
+@pytest.mark.parametrize("input_name", ["empty_nested", "empty_flat"])
+@pytest.mark.parametrize("engine", UNNEST_ENGINES)
+def test_empty_input_gives_an_empty_frame_with_every_column(input_name, engine, tmp_path):
+    result_df = unnest_csv(INPUTS[input_name](), str(tmp_path / "unnested.csv"), engine=engine)
+    assert result_df.empty
+    assert list(result_df.columns) == UNNESTED_COLUMNS
+
+
+@pytest.mark.parametrize("engine", UNNEST_ENGINES)
+def test_nested_and_flat_inputs_unnest_alike(engine, tmp_path):
+    nested_df = unnest_csv(INPUTS["nested"](), str(tmp_path / "nested.csv"), engine=engine)
+    flat_df = unnest_csv(INPUTS["flat_parent_id"](), str(tmp_path / "flat.csv"), engine=engine)
+    pd.testing.assert_frame_equal(nested_df, flat_df, check_dtype=False)
+
+
+@pytest.mark.parametrize("engine", UNNEST_ENGINES)
+def test_whitespace_and_parent_text(engine, tmp_path):
+    result_df = unnest_csv(INPUTS["flat_parent_id"](), str(tmp_path / "unnested.csv"), engine=engine)
+    by_node_id = result_df.set_index('node_id')
+
+    assert by_node_id.loc["genToc_A", 'text'] == "Chapter 1. General provisions"
+    assert by_node_id.loc["genToc_A1", 'parent_text'] == "Chapter 1. General provisions"
+    assert by_node_id.loc["genToc_A1a", 'parent_text'] == "Sec. 1-1. Definitions"
+    assert pd.isna(by_node_id.loc["genToc_A", 'parent_text'])
+    assert pd.isna(by_node_id.loc["genToc_A1b", 'text'])
+    assert pd.isna(by_node_id.loc["genToc_C", 'text'])
+    assert result_df['depth'].astype(int).is_monotonic_increasing
+
+
+@pytest.mark.parametrize("engine", UNNEST_ENGINES)
+def test_jsonl_input(engine, tmp_path):
+    jsonl_path = tmp_path / "example_menu_traversal_results.jsonl"
+    save_node_records_to_jsonl(_iter_flat_records(_make_tree()), str(jsonl_path))
+    from_jsonl = unnest_csv(str(jsonl_path), str(tmp_path / "from_jsonl.csv"), engine=engine)
+    from_df = unnest_csv(INPUTS["flat_parent_id"](), str(tmp_path / "from_df.csv"), engine=engine)
+    assert (tmp_path / "from_jsonl.csv").read_bytes() == (tmp_path / "from_df.csv").read_bytes()
+    assert len(from_jsonl) == len(from_df)
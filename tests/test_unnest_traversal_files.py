@@ -0,0 +1,55 @@
+import json
+
+
+import pandas as pd
+
+
+from validated.unnest_csv_step import unnest_traversal_files, UNNESTED_COLUMNS
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import (
+    FLAT_NODE_COLUMNS, save_node_records_to_jsonl
+)
+
+
+RECORDS = [
+    {'text': "Chapter 1.  General", 'parent_id': None, 'metadata': {}, 'url': "?nodeId=CH1", 'node_id': "genToc_CH1", 'depth': 0},
+    {'text': "Sec. 1-1.", 'parent_id': "genToc_CH1", 'metadata': {}, 'url': "?nodeId=S1", 'node_id': "genToc_S1", 'depth': 1},
+    {'text': "Chapter 2.", 'parent_id': None, 'metadata': {}, 'url': "?nodeId=CH2", 'node_id': "genToc_CH2", 'depth': 0},
+]
+
+
+def _write_traversal_files(folder) -> None:
+    # JSON Lines node records, from WalkMunicodeToc.nested_menu and rebuild_municode_toc_from_html.
+    save_node_records_to_jsonl(RECORDS, str(folder / "alpha_1_menu_traversal_results.jsonl"))
+
+    # A results CSV with a nested children column, from before the JSON Lines files.
+    pd.DataFrame([
+        {'text': "Chapter 1.  General", 'metadata': "{}", 'url': "?nodeId=CH1", 'node_id': "genToc_CH1", 'depth': 0,
+         'children': repr([{'text': "Sec. 1-1.", 'metadata': {}, 'url': "?nodeId=S1", 'node_id': "genToc_S1", 'depth': 1}])},
+        {'text': "Chapter 2.", 'metadata': "{}", 'url': "?nodeId=CH2", 'node_id': "genToc_CH2", 'depth': 0, 'children': "[]"},
+    ]).to_csv(folder / "beta_2_menu_traversal_results.csv", index=False)
+
+    # Flat node records with parent ids, from WalkMunicodeToc.streamed_menu.
+    pd.DataFrame(
+        [record | {'metadata': json.dumps(record['metadata'])} for record in RECORDS], columns=FLAT_NODE_COLUMNS
+    ).to_csv(folder / "gamma_3_menu_traversal_nodes.csv", index=False)
+
+
+def test_every_kind_of_traversal_file_is_unnested(tmp_path):
+    _write_traversal_files(tmp_path)
+
+    summary_df = unnest_traversal_files(str(tmp_path), max_workers=1)
+
+    assert summary_df['file'].tolist() == [
+        "alpha_1_menu_traversal_results.jsonl",
+        "beta_2_menu_traversal_results.csv",
+        "gamma_3_menu_traversal_nodes.csv",
+    ]
+    assert summary_df['status'].tolist() == ["unnested"] * 3
+    assert summary_df['rows'].tolist() == [3, 3, 3]
+    for output_path in summary_df['output_path']:
+        assert output_path.endswith("_unnested.csv")
+        assert list(pd.read_csv(output_path).columns) == UNNESTED_COLUMNS
+
+    # The outputs are up to date now, so a second batch skips every file, and doesn't pick up the outputs themselves.
+    summary_df = unnest_traversal_files(str(tmp_path), max_workers=1)
+    assert summary_df['status'].tolist() == ["skipped"] * 3
@@ -0,0 +1,84 @@
+import asyncio
+from dataclasses import dataclass, field
+import os
+
+
+import pandas as pd
+import pytest
+
+
+from web_scraper.sites.municode.library.table_of_contents import walk_municode_toc
+from web_scraper.sites.municode.library.table_of_contents.walk_municode_toc import WalkMunicodeToc
+
+
+@dataclass
+class FakeNode:
+    """
+    Stands in for a menu node's ElementHandle.
+    """
+    node_id: str
+    children: list['FakeNode'] = field(default_factory=list)
+
+    async def dispose(self) -> None:
+        pass
+
+
+def _make_walker(roots: list[FakeNode], fail_on: set[str]) -> WalkMunicodeToc:
+    """
+    Make a walker over a tree of fake nodes, whose expansion check fails once for each node id in fail_on.
+    """
+    walker = WalkMunicodeToc(page=None, place_name="Example", output_folder="")
+
+    async def _get_anchors(root_selector):
+        return list(roots)
+
+    async def _should_expand_node(node):
+        if node.node_id in fail_on:
+            fail_on.discard(node.node_id)
+            raise RuntimeError(f"Failed to check node {node.node_id}")
+        return bool(node.children)
+
+    async def _return(value):
+        return value
+
+    async def _no_op():
+        pass
+
+    walker._get_anchors = _get_anchors
+    walker._is_valid_root_node = lambda node: _return(True)
+    walker._make_node_id = lambda node: _return(node.node_id)
+    walker._get_node_text = lambda node: _return(f"Text of {node.node_id}")
+    walker._get_node_url = lambda node: _return(f"https://example.com/{node.node_id}")
+    walker._should_expand_node = _should_expand_node
+    walker._expand_node = lambda node: _return(True)
+    walker._wait_for_child_container_to_load = lambda node: _return(node)
+    walker._get_child_nodes = lambda node: _return(list(node.children))
+    walker._log_traversal_summary = _no_op
+    return walker
+
+
+def _make_tree() -> list[FakeNode]:
+    return [
+        FakeNode("a", [FakeNode("a1", [FakeNode("a1x")]), FakeNode("a2")]),
+        FakeNode("b"),
+    ]
+
+
+def test_node_that_fails_after_being_built_is_yielded_on_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(walk_municode_toc, "OUTPUT_FOLDER", str(tmp_path))
+    row = next(pd.DataFrame({"gnis": [12345], "place_name": ["Example"]}).itertuples())
+
+    # The first walk yields 'a', then fails on 'a1' after its NodeData has been built.
+    walker = _make_walker(_make_tree(), fail_on={"a1"})
+    with pytest.raises(RuntimeError):
+        asyncio.run(walker.streamed_menu("nav", row))
+    checkpoint_path = tmp_path / "example_12345_menu_traversal_checkpoint.json"
+    assert checkpoint_path.exists()
+
+    # The resumed walk must not lose 'a1', or yield 'a' twice.
+    walker = _make_walker(_make_tree(), fail_on=set())
+    df = asyncio.run(walker.streamed_menu("nav", row))
+
+    assert df['node_id'].tolist() == ["a", "a1", "a1x", "a2", "b"]
+    assert df['parent_id'].fillna("").tolist() == ["", "a", "a1", "a", ""]
+    assert not os.path.exists(checkpoint_path)
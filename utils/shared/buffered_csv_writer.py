@@ -0,0 +1,193 @@
+import atexit
+import csv
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Iterable, Optional, Sequence
+
+
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+def _get_file_mode(filepath: str) -> int:
+    """
+    Get the permissions a rewritten file should have: the target's own if it exists,
+    otherwise the ones open() would give a new file under the current umask.
+    """
+    try:
+        return os.stat(filepath).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _to_csv_value(value: Any) -> Any:
+    """
+    Write missing values as empty cells, the way pandas' to_csv does.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return value
+
+
+class BufferedCsvWriter:
+    """
+    One writer for every CSV the program appends to or rewrites.
+
+    Appended rows are buffered per file and written with the csv module in a single open,
+    once a file has max_rows rows buffered, once its oldest buffered row is max_seconds old,
+    or on shutdown (normal exit, SIGINT, or SIGTERM through the logger's signal handler).
+    Full rewrites go to a temporary file in the same folder that is then renamed over the target,
+    so a crash mid-write never leaves a truncated CSV. Lines end with os.linesep, as in to_csv.
+
+    Use the process-wide instance, csv_writer, so every row ends up flushed on shutdown.
+
+    Args:
+        max_rows (int): Flush a file once this many of its rows are buffered. Defaults to 100.
+        max_seconds (float): Flush a file once its oldest buffered row is this many seconds old. Defaults to 5.
+
+    Example:
+        >>> from utils.shared.buffered_csv_writer import csv_writer
+        >>> csv_writer.append("output_urls.csv", [12345, "City of Example", url], header=["gnis", "place_name", "url"])
+        >>> csv_writer.rewrite("code_versions.csv", list_of_dicts)
+    """
+    def __init__(self, max_rows: int = 100, max_seconds: float = 5):
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self._lock = threading.RLock()
+        self._buffers: dict[str, list[Sequence]] = {}
+        self._headers: dict[str, Optional[Sequence[str]]] = {}
+        self._oldest: dict[str, float] = {} # When each file's oldest buffered row was appended.
+        self._stop = threading.Event()
+        self._flusher: threading.Thread = None
+        self.rows_written: int = 0
+        self.flushes: int = 0
+
+    def _start_flusher(self) -> None:
+        """
+        Start the daemon thread that flushes rows that have been buffered too long, if it isn't running.
+        """
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_stale_rows, name="csv_writer_flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_stale_rows(self) -> None:
+        while not self._stop.wait(self.max_seconds / 2):
+            now = time.monotonic()
+            with self._lock:
+                stale = [path for path, oldest in self._oldest.items() if now - oldest >= self.max_seconds]
+                for path in stale:
+                    self._flush_file(path)
+
+    def append(self, filepath: str, row: Sequence, header: Sequence[str] = None) -> None:
+        """
+        Buffer a row to append to a CSV file.
+
+        Args:
+            filepath (str): Path of the CSV file.
+            row (Sequence): The row's values, in column order.
+            header (Sequence[str], optional): Column names, written first if the file doesn't exist or is empty.
+        """
+        with self._lock:
+            buffer = self._buffers.setdefault(filepath, [])
+            if not buffer:
+                self._oldest[filepath] = time.monotonic()
+            buffer.append([_to_csv_value(value) for value in row])
+            if header is not None:
+                self._headers[filepath] = header
+            if len(buffer) >= self.max_rows:
+                self._flush_file(filepath)
+            else:
+                self._start_flusher()
+
+    def _flush_file(self, filepath: str) -> None:
+        """
+        Write a file's buffered rows in one open. Must be called with the lock held.
+        """
+        rows = self._buffers.pop(filepath, None)
+        self._oldest.pop(filepath, None)
+        if not rows:
+            return
+        header = self._headers.get(filepath)
+        try:
+            needs_header = header is not None and (not os.path.exists(filepath) or os.path.getsize(filepath) == 0)
+            with open(filepath, 'a', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file, lineterminator=os.linesep)
+                if needs_header:
+                    writer.writerow(header)
+                writer.writerows(rows)
+        except OSError as e:
+            logger.error(f"Error appending {len(rows):,} rows to {filepath}: {e}")
+            # Keep the rows, so the next flush can try again.
+            self._buffers[filepath] = rows + self._buffers.get(filepath, [])
+            self._oldest[filepath] = time.monotonic()
+            return
+        self.rows_written += len(rows)
+        self.flushes += 1
+        logger.debug(f"Appended {len(rows):,} rows to {filepath}.")
+
+    def flush(self, filepath: str = None) -> None:
+        """
+        Write the buffered rows of one file, or of every file if no filepath is given.
+        """
+        with self._lock:
+            for path in [filepath] if filepath else list(self._buffers):
+                self._flush_file(path)
+
+    def buffered_rows(self, filepath: str) -> int:
+        """
+        Get how many of a file's rows are buffered but not yet written, e.g. to check a flush succeeded.
+        """
+        with self._lock:
+            return len(self._buffers.get(filepath, []))
+
+    def rewrite(self, filepath: str, rows: Iterable[dict], fieldnames: Sequence[str] = None) -> None:
+        """
+        Atomically replace a CSV file with a list of dictionaries.
+        Any rows still buffered for the file are flushed first, then superseded by the new contents.
+
+        Args:
+            filepath (str): Path of the CSV file.
+            rows (Iterable[dict]): The rows.
+            fieldnames (Sequence[str], optional): Column names, in order.
+                Defaults to every key in the rows, in the order they first appear.
+
+        Raises:
+            OSError: If the file can't be written. The original file is left as it was.
+        """
+        rows = list(rows)
+        if fieldnames is None:
+            fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+        folder = os.path.dirname(os.path.abspath(filepath))
+        with self._lock:
+            self._flush_file(filepath)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".csv")
+            try:
+                # mkstemp makes the file readable only by its owner, which os.replace would carry over to the target.
+                os.chmod(tmp_path, _get_file_mode(filepath))
+                with os.fdopen(fd, 'w', newline='', encoding='utf-8') as file:
+                    writer = csv.DictWriter(file, fieldnames, restval='', lineterminator=os.linesep)
+                    writer.writeheader()
+                    writer.writerows({key: _to_csv_value(value) for key, value in row.items()} for row in rows)
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def close(self) -> None:
+        """
+        Stop the flusher thread and write every buffered row.
+        """
+        self._stop.set()
+        self.flush()
+
+
+csv_writer = BufferedCsvWriter()
+atexit.register(csv_writer.close)
+Logger.register_shutdown_callback(csv_writer.close)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Optional
+from urllib.robotparser import RequestRate
+
+
+class PolitenessLimiter:
+    """
+    Space out requests so that no two of them start less than the minimum interval apart.
+    The minimum interval is the larger of robots.txt's crawl delay and its request rate's seconds per request.
+    Requests are scheduled against a deadline, so only the time remaining since the last request is slept,
+    and any time spent on other work (page loads, walks, file writes) counts towards the delay.
+
+    Share one instance between every page and scraper that requests from the same site,
+    e.g. through PolitenessLimiter.for_domain, so that they don't violate the site's robots.txt together.
+
+    Example:
+        >>> limiter = PolitenessLimiter.for_domain("municode.com")
+        >>> limiter.set_rules(crawl_delay=15, request_rate=rp.request_rate("*"))
+        >>> await limiter.wait()
+        >>> await page.goto(url)
+    """
+    _limiters_by_domain: dict[str, 'PolitenessLimiter'] = {}
+
+    def __init__(self, crawl_delay: float = 0, request_rate: Optional[RequestRate] = None):
+        self.crawl_delay = crawl_delay or 0
+        self.request_rate = request_rate or None
+        self._lock = asyncio.Lock()
+        self._last_request: float = None
+        self.requests: int = 0
+        self.total_wait: float = 0 # Seconds actually slept in wait().
+
+    @classmethod
+    def for_domain(cls, domain: str) -> 'PolitenessLimiter':
+        """
+        Get the process-wide limiter for a domain, making it if it doesn't exist yet.
+        """
+        if domain not in cls._limiters_by_domain:
+            cls._limiters_by_domain[domain] = cls()
+        return cls._limiters_by_domain[domain]
+
+    @classmethod
+    def register(cls, domain: str, limiter: 'PolitenessLimiter') -> None:
+        """
+        Make a limiter the process-wide limiter for a domain, e.g. one shared with other processes.
+        """
+        cls._limiters_by_domain[domain] = limiter
+
+    def set_rules(self, crawl_delay: float = 0, request_rate: Optional[RequestRate] = None) -> None:
+        """
+        Set the crawl delay and request rate, e.g. from a site's robots.txt.
+        """
+        self.crawl_delay = crawl_delay or 0
+        self.request_rate = request_rate or None
+
+    @property
+    def min_interval(self) -> float:
+        """
+        Minimum number of seconds between the starts of two requests.
+        """
+        interval = self.crawl_delay
+        if self.request_rate and self.request_rate.requests > 0:
+            interval = max(interval, self.request_rate.seconds / self.request_rate.requests)
+        return interval
+
+    def record_request(self) -> None:
+        """
+        Record that a request was just made outside of wait().
+        """
+        self._last_request = time.monotonic()
+        self.requests += 1
+
+    async def wait(self) -> float:
+        """
+        Sleep until the next request is allowed, then record it.
+
+        Returns:
+            float: The number of seconds slept.
+        """
+        async with self._lock:
+            remaining = 0
+            if self._last_request is not None:
+                remaining = self._last_request + self.min_interval - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    self.total_wait += remaining
+            self.record_request()
+            return max(remaining, 0)
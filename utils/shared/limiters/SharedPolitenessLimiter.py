@@ -0,0 +1,51 @@
+import asyncio
+import multiprocessing.sharedctypes
+import time
+from typing import Optional
+from urllib.robotparser import RequestRate
+
+
+from utils.shared.limiters.PolitenessLimiter import PolitenessLimiter
+
+
+class SharedPolitenessLimiter(PolitenessLimiter):
+    """
+    A PolitenessLimiter whose schedule is shared between processes through a multiprocessing.Value,
+    so several worker processes together still start no two requests less than the minimum interval apart.
+    Each wait() reserves the next free request slot under the Value's lock, then sleeps until it outside the lock.
+
+    Example:
+        >>> last_request = multiprocessing.get_context("spawn").Value('d', 0.0)
+        >>> # In each worker process:
+        >>> PolitenessLimiter.register("municode.com", SharedPolitenessLimiter(last_request))
+    """
+    def __init__(self,
+                 last_request: multiprocessing.sharedctypes.Synchronized,
+                 crawl_delay: float = 0,
+                 request_rate: Optional[RequestRate] = None
+                ):
+        super().__init__(crawl_delay=crawl_delay, request_rate=request_rate)
+        self._shared_last_request = last_request # Wall-clock time of the last reserved request, for every process.
+
+    def _reserve(self) -> float:
+        """
+        Reserve the next request slot and return how many seconds away it is.
+        """
+        with self._shared_last_request.get_lock():
+            now = time.time()
+            slot = max(now, self._shared_last_request.value + self.min_interval)
+            self._shared_last_request.value = slot
+        return slot - now
+
+    def record_request(self) -> None:
+        with self._shared_last_request.get_lock():
+            self._shared_last_request.value = max(self._shared_last_request.value, time.time())
+        super().record_request()
+
+    async def wait(self) -> float:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            self.total_wait += delay
+        super().record_request()
+        return delay
@@ -1,9 +1,7 @@
-import os
-
-
 import pandas as pd
 
 
+from utils.shared.buffered_csv_writer import csv_writer
 from logger.logger import Logger
 
 
@@ -15,7 +13,8 @@ def save_list_of_dicts_to_csv_via_pandas(list_of_dicts: list[dict],
                                         output_path: str = None,
                                         ) -> None|pd.DataFrame:
     """
-    Save a list of dictionaries to a CSV file using Pandas DataFrame.
+    Save a list of dictionaries to a CSV file, atomically replacing it if it exists.
+    The CSV is written with the csv module. A Pandas DataFrame is only built if return_df is True.
 
     TODO Add in other options. Pandas has a LOT of them.
 
@@ -39,14 +38,15 @@ def save_list_of_dicts_to_csv_via_pandas(list_of_dicts: list[dict],
     >>> list_of_dicts_to_csv_via_pandas(data, 'output.csv', logger=my_logger)
     """
     # Type checking.
-    if isinstance(list_of_dicts, list) and isinstance(list_of_dicts[0], dict):
+    if not isinstance(list_of_dicts, list) or not all(isinstance(dic, dict) for dic in list_of_dicts):
         error_message = f"list_of_dicts argument is not a list of dicts, but a {type(list_of_dicts)}"
         logger.error(error_message)
         raise ValueError(error_message)
     assert logger, "No logger provided."
 
     # Export list_of_dicts to a CSV file.
-    pd.DataFrame().from_records(list_of_dicts).to_csv(filepath, index=index)
+    rows = [{'': i, **dic} for i, dic in enumerate(list_of_dicts)] if index else list_of_dicts
+    csv_writer.rewrite(filepath, rows)
     logger.info(f"Saved list_of_dicts to {filepath}.")
 
     if return_df:
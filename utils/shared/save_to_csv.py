@@ -1,5 +1,4 @@
-import csv
-
+from utils.shared.buffered_csv_writer import csv_writer
 from logger.logger import Logger
 
 logger = Logger(logger_name=__name__)
@@ -7,7 +6,7 @@ logger = Logger(logger_name=__name__)
 
 def save_to_csv(data: list[dict], filepath: str) -> None:
     """
-    Save a list of dictionaries to a CSV file.
+    Save a list of dictionaries to a CSV file, atomically replacing it if it exists.
     """
     # Check if the list is empty.
     if not data:
@@ -28,11 +27,7 @@ def save_to_csv(data: list[dict], filepath: str) -> None:
     keys = data[0].keys()
 
     try:
-        with open(filepath, 'w', newline='') as file:
-            dict_writer = csv.DictWriter(file, keys)
-            dict_writer.writeheader()
-            dict_writer.writerows(data)
-    
+        csv_writer.rewrite(filepath, data, fieldnames=keys)
         logger.info(f"Data saved to {filepath}")
     except IOError as e:
         logger.error(f"Error saving data to {filepath}: {str(e)}")
@@ -2,24 +2,21 @@ import os
 from typing import NamedTuple
 
 
-import pandas as pd
-
-
+from utils.shared.buffered_csv_writer import csv_writer
 from config.config import INPUT_FOLDER
 
 
 def append_pandas_row_to_csv(row: NamedTuple, filename: str) -> None:
     """
-    Append a single row from a pandas NamedTuple to a CSV file using pandas.
+    Append a single row from a pandas NamedTuple to a CSV file.
+    The row is buffered by the shared csv_writer and written in a batch with the file's other rows.
     
     Args:
         row (NamedTuple): The row to append.
         filename (str): The name of the CSV file.
     """
-    df = pd.DataFrame(
-        {column: [getattr(row, column)] for column in row._fields if column != 'Index'}
+    columns = [column for column in row._fields if column != 'Index']
+    csv_writer.append(
+        os.path.join(INPUT_FOLDER, filename), [getattr(row, column) for column in columns], header=columns
     )
-    df.to_csv(os.path.join(INPUT_FOLDER, filename), index=False, mode='a', header=False)
-    print(f"Appended row to {filename}.")
     return
-
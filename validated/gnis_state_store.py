@@ -0,0 +1,167 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+
+import pandas as pd
+
+
+from config.config import INPUT_FOLDER
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+GNIS_STATE_DB_PATH = os.path.join(INPUT_FOLDER, "gnis_state.sqlite")
+
+# The bookkeeping CSVs the store replaces, and the status their rows had.
+STATUS_CSVS = {
+    "done": "output_urls.csv",
+    "walk_failed": "walk_failed_urls.csv",
+    "malformed": "malformed_urls.csv",
+}
+SKIP_STATUSES = ("done", "walk_failed", "malformed") # Statuses whose rows aren't scraped again.
+
+
+class GnisStateStore:
+    """
+    Persistent state of every library in a scrape, keyed by GNIS, in SQLite with write-ahead logging.
+    Each library has a status ("pending", "done", "walk_failed", "malformed", "download_failed", or "error"),
+    an attempt count, first-seen and updated timestamps, and the paths of the files scraped from it.
+    Libraries whose status isn't in SKIP_STATUSES are scraped again on the next run.
+    Lookups are primary-key reads and status updates are single transactions,
+    so resume checks are constant-time and a crash can't leave a half-written record.
+
+    Args:
+        db_path (str): Path to the SQLite database. Defaults to GNIS_STATE_DB_PATH.
+
+    Example:
+        >>> store = GnisStateStore()
+        >>> store.import_csvs() # Once, to carry over the CSV bookkeeping of earlier runs.
+        >>> store.add_rows(input_urls_df)
+        >>> for row in store.pending_rows().itertuples():
+        >>>     ...
+        >>>     store.set_status(row.gnis, "done", artifact_path=html_path)
+    """
+    def __init__(self, db_path: str = GNIS_STATE_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS libraries (
+                    gnis INTEGER PRIMARY KEY,
+                    place_name TEXT,
+                    url TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    first_seen REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    artifact_paths TEXT NOT NULL DEFAULT '[]'
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS libraries_status ON libraries (status)")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add_rows(self, df: pd.DataFrame, status: str = "pending") -> int:
+        """
+        Add rows with gnis, place_name, and url columns in one transaction. Rows already in the store are left as is.
+
+        Returns:
+            int: The number of rows added.
+        """
+        now = time.time()
+        records = [
+            (int(gnis), place_name, url, status, now, now)
+            for gnis, place_name, url in df[['gnis', 'place_name', 'url']].itertuples(index=False)
+        ]
+        with self.conn:
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO libraries (gnis, place_name, url, status, first_seen, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                records
+            )
+        return cursor.rowcount
+
+    def import_csvs(self, input_folder: str = INPUT_FOLDER) -> None:
+        """
+        Carry over the rows of the bookkeeping CSVs in STATUS_CSVS, with their statuses.
+        """
+        for status, filename in STATUS_CSVS.items():
+            path = os.path.join(input_folder, filename)
+            if not os.path.exists(path):
+                continue
+            df = pd.read_csv(path)
+            added = self.add_rows(df, status=status)
+            logger.info(f"Imported {added:,} of {len(df):,} rows from {filename} as '{status}'.")
+
+    def get(self, gnis: Any) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT gnis, place_name, url, status, attempts, first_seen, updated_at, artifact_paths "
+            "FROM libraries WHERE gnis = ?", (int(gnis),)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('gnis', 'place_name', 'url', 'status', 'attempts', 'first_seen', 'updated_at', 'artifact_paths')
+        record = dict(zip(keys, row))
+        record['artifact_paths'] = json.loads(record['artifact_paths'])
+        return record
+
+    def get_status(self, gnis: Any) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM libraries WHERE gnis = ?", (int(gnis),)).fetchone()
+        return row[0] if row else None
+
+    def should_skip(self, gnis: Any) -> bool:
+        return self.get_status(gnis) in SKIP_STATUSES
+
+    def set_status(self, gnis: Any, status: str, artifact_path: str = None, row=None) -> None:
+        """
+        Set a library's status and count the attempt, adding it first if it isn't in the store.
+
+        Args:
+            gnis: The library's GNIS.
+            status (str): The new status.
+            artifact_path (str, optional): Path of a file scraped from the library, added to its artifact paths.
+            row (NamedTuple, optional): The library's input row, used if it has to be added.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO libraries (gnis, place_name, url, first_seen, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (int(gnis), getattr(row, 'place_name', None), getattr(row, 'url', None), now, now)
+            )
+            self.conn.execute(
+                "UPDATE libraries SET status = ?, attempts = attempts + 1, updated_at = ?, "
+                "artifact_paths = CASE WHEN ? IS NULL THEN artifact_paths ELSE json_insert(artifact_paths, '$[#]', ?) END "
+                "WHERE gnis = ?",
+                (status, now, artifact_path, artifact_path, int(gnis))
+            )
+
+    def pending_rows(self, df: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Get the libraries that still need scraping.
+
+        Args:
+            df (pd.DataFrame, optional): Input rows with a gnis column. If given, its rows that still need scraping
+                are returned in their original order. Otherwise every pending library in the store is returned.
+
+        Returns:
+            pd.DataFrame: The rows, with at least gnis, place_name, and url columns.
+        """
+        placeholders = ", ".join("?" * len(SKIP_STATUSES))
+        if df is None:
+            return pd.read_sql_query(
+                f"SELECT gnis, place_name, url FROM libraries WHERE status NOT IN ({placeholders}) ORDER BY gnis",
+                self.conn, params=SKIP_STATUSES
+            )
+        skipped = pd.read_sql_query(
+            f"SELECT gnis FROM libraries WHERE status IN ({placeholders})", self.conn, params=SKIP_STATUSES
+        )['gnis']
+        return df[~df['gnis'].isin(skipped)]
+
+    def status_counts(self) -> dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM libraries GROUP BY status").fetchall())
@@ -1,17 +1,25 @@
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
 import os
 import re
+import time
 from typing import NamedTuple
-import sys
 
 
 import ast
+import numpy as np
 import pandas as pd
 
 
+from web_scraper.sites.municode.library.table_of_contents.node_records_jsonl import load_node_records_from_jsonl
 from config.config import OUTPUT_FOLDER
 from logger.logger import Logger
+module_logger = Logger(logger_name=__name__)
+
+
+WHITESPACE_PATTERN = re.compile(r'\s{2,}') # Runs of whitespace leftover from the scraping process.
+UNNESTED_COLUMNS = ['text', 'parent_text', 'metadata', 'url', 'node_id', 'depth'] # Columns every engine outputs.
 
 
 def _flatten_children(row: NamedTuple) -> list[dict]:
@@ -54,10 +62,12 @@ def _flatten_children(row: NamedTuple) -> list[dict]:
             _flatten(child, parent_text=item['text'])
     
     # Convert string representation of list to Python object
+    # NOTE This is only needed for traversal results CSVs saved before they were saved as JSON Lines.
     if isinstance(row.children, str):
         try:
             children = ast.literal_eval(row.children)
-        except:
+        except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+            module_logger.warning(f"Could not parse the children of node {row.node_id}, so they were dropped: {e}")
             children = []
     else:
         children = row.children
@@ -69,13 +79,170 @@ def _flatten_children(row: NamedTuple) -> list[dict]:
     return flattened
 
 
-def unnest_csv(input_file: str | pd.DataFrame, output_file):
+def _link_parent_text(df: pd.DataFrame) -> list[dict]:
+    """
+    Convert flattened node records, where children are linked to their parents by 'parent_id',
+    into the same records _flatten_children produces.
+
+    Args:
+        df: A dataframe of flattened node records, e.g. from WalkMunicodeToc.streamed_menu.
+
+    Returns:
+        List of dictionaries containing flattened data
+    """
+    text_by_node_id = dict(zip(df['node_id'], df['text']))
+    return [
+        {
+            'text': row.text,
+            'parent_text': text_by_node_id.get(row.parent_id) if isinstance(row.parent_id, str) else None,
+            'metadata': row.metadata,
+            'url': row.url,
+            'node_id': row.node_id,
+            'depth': row.depth
+        } for row in df.itertuples()
+    ]
+
+
+def _flatten_children_to_columns(df: pd.DataFrame) -> tuple[dict[str, list], np.ndarray]:
+    """
+    Flatten the children column of a whole dataframe straight into one list per output column,
+    with an explicit stack instead of recursion and no dictionary per node.
+    Nodes come out in the same order, with the same values, as _flatten_children.
+
+    Returns:
+        The text, metadata, url, node_id, and depth columns, and the position of each node's parent (-1 for roots).
+    """
+    texts, metadatas, urls, node_ids, depths, parent_index = [], [], [], [], [], []
+    encode = json.JSONEncoder().encode # What json.dumps uses with its default arguments.
+    for row in df.itertuples():
+        # Add the root node (depth 0)
+        root_index = len(texts)
+        texts.append(row.text)
+        metadatas.append(row.metadata)
+        urls.append(row.url)
+        node_ids.append(row.node_id)
+        depths.append(0)
+        parent_index.append(-1)
+
+        children = row.children
+        if isinstance(children, str):
+            try:
+                children = ast.literal_eval(children)
+            except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+                module_logger.warning(f"Could not parse the children of node {row.node_id}, so they were dropped: {e}")
+                children = []
+
+        stack = [(child, root_index) for child in reversed(children)]
+        while stack:
+            item, parent = stack.pop()
+            index = len(texts)
+            texts.append(item['text'])
+            metadatas.append(encode(item.get('metadata', {})))
+            urls.append(item.get('url', ''))
+            node_ids.append(item.get('node_id', ''))
+            depths.append(item.get('depth', ''))
+            parent_index.append(parent)
+            stack.extend((child, index) for child in reversed(item.get('children', [])))
+
+    columns = {'text': texts, 'metadata': metadatas, 'url': urls, 'node_id': node_ids, 'depth': depths}
+    return columns, np.array(parent_index, dtype=np.int64)
+
+
+def _link_parent_index(df: pd.DataFrame) -> np.ndarray:
+    """
+    Get the position of each flattened node record's parent with a hash join on node_id (-1 for roots).
+    Like _link_parent_text, only string parent ids are linked, and the last node with a duplicate id wins.
+    """
+    parent_ids = df['parent_id']
+    index_by_node_id = {node_id: index for index, node_id in enumerate(df['node_id'])}
+    parent_index = parent_ids.map(index_by_node_id)
+    is_linked = parent_ids.map(type).eq(str).to_numpy() & parent_index.notna().to_numpy()
+    return np.where(is_linked, parent_index.fillna(-1).to_numpy(dtype=np.int64), -1)
+
+
+def _normalize_whitespace(series: pd.Series) -> pd.Series:
+    """
+    Replace runs of two or more whitespace characters in the string values of a series with a single space.
+    Values that aren't strings are left as is.
+    """
+    series = series.astype(object)
+    is_str = series.map(type).eq(str)
+    if is_str.any():
+        series[is_str] = series[is_str].str.replace(WHITESPACE_PATTERN, ' ', regex=True)
+    return series
+
+
+def _unnest_python(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flatten nodes into an unnested dataframe, one dictionary per node.
+    """
+    # Flatten the nested structure
+    flattened_data = []
+    if 'parent_id' in df.columns: # Already flat. Just link each node to its parent's text.
+        flattened_data = _link_parent_text(df)
+    else:
+        for row in df.itertuples():
+            if not isinstance(row, tuple) or not hasattr(row, '_fields'):
+                raise TypeError(f"Row is not a NamedTuple but {type(row)}")
+
+            flattened_data.extend(_flatten_children(row))
+
+    # Create new dataframe from flattened data. The columns are given, so an empty input still has them.
+    result_df = pd.DataFrame(flattened_data, columns=UNNESTED_COLUMNS)
+
+    # Regex the text column to remove large spaces leftover from the scraping process.
+    result_df['text'] = result_df['text'].apply(lambda text: re.sub(WHITESPACE_PATTERN, ' ', text) if isinstance(text, str) else text)
+
+    # Ditto for the parent text column.
+    result_df['parent_text'] = result_df['parent_text'].apply(lambda text: re.sub(WHITESPACE_PATTERN, ' ', text) if isinstance(text, str) else text)
+    return result_df
+
+
+def _unnest_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flatten nodes into an unnested dataframe with the same columns and values as the "python" engine.
+    A node's parent text is its parent's text, so whitespace is only normalized once, in the text column,
+    and the parent text column is taken from it by parent position.
+    """
+    if 'parent_id' in df.columns: # Already flat. Just link each node to its parent.
+        columns = {column: df[column].to_numpy() for column in ('text', 'metadata', 'url', 'node_id', 'depth')}
+        parent_index = _link_parent_index(df)
+    else:
+        columns, parent_index = _flatten_children_to_columns(df)
+
+    text = _normalize_whitespace(pd.Series(columns['text'], dtype=object)).to_numpy()
+    parent_text = np.where(parent_index >= 0, text.take(np.maximum(parent_index, 0)), None)
+    return pd.DataFrame({
+        'text': text,
+        'parent_text': parent_text,
+        'metadata': columns['metadata'],
+        'url': columns['url'],
+        'node_id': columns['node_id'],
+        'depth': columns['depth'],
+    })
+
+
+# Functions that flatten nodes into an unnested dataframe, by engine name.
+# Every engine gives the same output. See tests/test_unnest_csv_engines.py.
+UNNEST_ENGINES = {
+    "vectorized": _unnest_vectorized,
+    "python": _unnest_python,
+}
+
+
+def unnest_csv(input_file: str | pd.DataFrame, output_file, engine: str = "vectorized"):
     """
     Un-nest a CSV file with a nested 'children' column.
+    Flattened node records with a 'parent_id' column are also accepted,
+    including JSON Lines files of them, e.g. '*_menu_traversal_results.jsonl'.
     
     Args:
-        input_file: Path to input CSV file
+        input_file: Path to input JSON Lines or CSV file
         output_file: Path to output CSV file
+        engine: How to flatten the nodes. Must be one of UNNEST_ENGINES.
+            "vectorized" builds the output columns directly and normalizes whitespace with pandas string methods.
+            "python" builds a dictionary per node and normalizes whitespace one value at a time.
+            Both give the same output. Defaults to "vectorized".
 
     Example:
     >>> # Example usage
@@ -87,27 +254,17 @@ def unnest_csv(input_file: str | pd.DataFrame, output_file):
             print(f"Successfully unnested CSV. First few rows of result:")
             print(result.head())
     """
-    if isinstance(input_file, str):
+    if engine not in UNNEST_ENGINES:
+        raise ValueError(f"engine '{engine}' is not one of {tuple(UNNEST_ENGINES)}")
+
+    if isinstance(input_file, str) and input_file.endswith(".jsonl"):
+        df = load_node_records_from_jsonl(input_file)
+    elif isinstance(input_file, str):
         df = pd.read_csv(input_file)
     else: # If it's a dataframe, just rename it to df for consistency.
         df = input_file
 
-    # Flatten the nested structure
-    flattened_data = []
-    for row in df.itertuples():
-        if not isinstance(row, tuple) or not hasattr(row, '_fields'):
-            raise TypeError(f"Row is not a NamedTuple but {type(row)}")
-
-        flattened_data.extend(_flatten_children(row))
-
-    # Create new dataframe from flattened data
-    result_df = pd.DataFrame(flattened_data)
-
-    # Regex the text column to remove large spaces leftover from the scraping process.
-    result_df['text'] = result_df['text'].apply(lambda text: re.sub(r'\s{2,}', ' ', text) if isinstance(text, str) else text)
-
-    # Ditto for the parent text column.
-    result_df['parent_text'] = result_df['parent_text'].apply(lambda text: re.sub(r'\s{2,}', ' ', text) if isinstance(text, str) else text)
+    result_df = UNNEST_ENGINES[engine](df)
 
     # Sort by depth to ensure proper hierarchy in output
     result_df = result_df.sort_values('depth').reset_index(drop=True)
@@ -118,22 +275,148 @@ def unnest_csv(input_file: str | pd.DataFrame, output_file):
     return result_df
 
 
+def _unnest_traversal_file(input_path: str, output_path: str, engine: str = "vectorized") -> dict:
+    """
+    Unnest one traversal results file, catching any error so one bad file doesn't stop a batch.
+    Runs in a worker process.
+
+    Returns:
+        dict: The file's name, output path, status ("unnested" or "error"), row count, seconds taken, and error.
+    """
+    start = time.perf_counter()
+    try:
+        rows = len(unnest_csv(input_path, output_path, engine=engine))
+        status, error = "unnested", None
+    except Exception as e:
+        rows = 0
+        status, error = "error", f"{type(e).__name__}: {e}"
+    return {
+        'file': os.path.basename(input_path),
+        'output_path': output_path,
+        'status': status,
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+    }
+
+
+def get_traversal_files_to_unnest(folder: str = OUTPUT_FOLDER, force: bool = False) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """
+    Find the traversal results files in a folder, and where each one's unnested CSV goes.
+    JSON Lines files are preferred. A results CSV is only used if there's no JSON Lines file for it.
+    The flat '*_menu_traversal_nodes.csv' files of WalkMunicodeToc.streamed_menu are found too.
+
+    Args:
+        folder (str): Folder of '*traversal_results.jsonl', '*traversal_results.csv',
+            and '*_menu_traversal_nodes.csv' files. Defaults to OUTPUT_FOLDER.
+        force (bool): Whether to unnest files whose unnested CSV is newer than them anyway. Defaults to False.
+
+    Returns:
+        Two lists of (input path, output path) pairs: the files to unnest, and the files that are already up to date.
+    """
+    files = sorted(os.listdir(folder))
+    file_names = set(files)
+    to_unnest, up_to_date = [], []
+    for file in files:
+        # Prefer the JSON Lines traversal results. Only unnest a CSV if there's no JSON Lines file for it.
+        if not (file.endswith(("traversal_results.jsonl", "_menu_traversal_nodes.csv")) or (
+            file.endswith("traversal_results.csv") and file.replace(".csv", ".jsonl") not in file_names
+        )):
+            continue
+        input_path = os.path.join(folder, file)
+        output_path = os.path.join(folder, os.path.splitext(file)[0] + "_unnested.csv")
+        if not force and os.path.exists(output_path) and os.path.getmtime(output_path) > os.path.getmtime(input_path):
+            up_to_date.append((input_path, output_path))
+        else:
+            to_unnest.append((input_path, output_path))
+    return to_unnest, up_to_date
+
+
+def unnest_traversal_files(folder: str = OUTPUT_FOLDER,
+                           max_workers: int = None,
+                           engine: str = "vectorized",
+                           force: bool = False
+                           ) -> pd.DataFrame:
+    """
+    Unnest every traversal results file in a folder in a process pool, skipping files that are already up to date,
+    so re-flattening the whole corpus, e.g. after a format change, scales with the number of cores.
+
+    Args:
+        folder (str): Folder of traversal results files. Defaults to OUTPUT_FOLDER.
+        max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        engine (str): Passed to unnest_csv. Defaults to "vectorized".
+        force (bool): Whether to unnest files whose unnested CSV is newer than them anyway. Defaults to False.
+
+    Returns:
+        pd.DataFrame: One row per traversal results file, with its output path, status
+            ("unnested", "skipped", or "error"), row count, seconds taken, and error.
+
+    Example:
+        >>> summary_df = unnest_traversal_files(force=True) # Re-flatten everything after a format change.
+    """
+    to_unnest, up_to_date = get_traversal_files_to_unnest(folder, force=force)
+    module_logger.info(
+        f"Unnesting {len(to_unnest):,} traversal results files in '{folder}' "
+        f"({len(up_to_date):,} already up to date)..."
+    )
+
+    start = time.perf_counter()
+    summaries = [
+        {'file': os.path.basename(input_path), 'output_path': output_path, 'status': "skipped",
+         'rows': None, 'seconds': 0.0, 'error': None}
+        for input_path, output_path in up_to_date
+    ]
+    if to_unnest:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_unnest_traversal_file, input_path, output_path, engine): (input_path, output_path)
+                for input_path, output_path in to_unnest
+            }
+            for future in as_completed(futures):
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    # e.g. BrokenProcessPool if a worker was killed. Every file it leaves unfinished gets an error row.
+                    input_path, output_path = futures[future]
+                    summary = {
+                        'file': os.path.basename(input_path), 'output_path': output_path, 'status': "error",
+                        'rows': 0, 'seconds': 0.0, 'error': f"{type(e).__name__}: {e}"
+                    }
+                summaries.append(summary)
+                module_logger.info(
+                    f"{summary['status'].capitalize()} {summary['file']}: "
+                    f"{summary['rows']:,} rows in {summary['seconds']:.2f} seconds"
+                )
+    summary_df = pd.DataFrame(
+        summaries, columns=['file', 'output_path', 'status', 'rows', 'seconds', 'error']
+    ).sort_values('file', ignore_index=True)
+
+    unnested = summary_df[summary_df['status'] == "unnested"]
+    module_logger.info(f"""
+    Unnested traversal results files:
+    - Unnested: {len(unnested):,} ({unnested['rows'].sum():,.0f} rows, {unnested['seconds'].sum():.2f} seconds of work)
+    - Skipped (up to date): {(summary_df['status'] == "skipped").sum():,}
+    - Errors: {(summary_df['status'] == "error").sum():,}
+    - Duration: {time.perf_counter() - start:.2f} seconds
+    """, f=True)
+    for row in summary_df[summary_df['status'] == "error"].itertuples():
+        module_logger.error(f"Error unnesting {row.file}: {row.error}")
+    return summary_df
+
+
 def unnest_csv_step(df: pd.DataFrame=None, row: NamedTuple=None, logger=Logger, UNNEST_CSV_ROUTE: bool=False) -> None|pd.DataFrame:
+    """
+    Unnest a library's walked ToC to '<place_name>_<gnis>_menu_traversal_results_unnested.csv' and return it.
+    If df is None and UNNEST_CSV_ROUTE is True, every traversal results file in the output folder is unnested
+    instead, with unnest_traversal_files, and its summary is returned.
+    """
     if df is None:
         if UNNEST_CSV_ROUTE:
             logger.info("Performing unnesting of specified CSV files in output folder...")
-            for file in os.listdir(OUTPUT_FOLDER):
-                logger.debug(f"file: {file}")
-                base_name = os.path.basename(file)
-                if file.endswith("traversal_results.csv"):
-                    unnested_csv_path = os.path.join(OUTPUT_FOLDER, base_name.replace(".csv", "_unnested.csv"))
-                    try:
-                        unnested_df = unnest_csv(os.path.join(OUTPUT_FOLDER, file), unnested_csv_path)
-                    except Exception as e:
-                        logger.error(f"Error unnesting {file}: {e}")
-                        raise e
-            logger.debug("Finished unnesting CSV files. Exiting...")
-            sys.exit(0)
+            # Returns a summary of the batch, with one row per file.
+            unnested_df = unnest_traversal_files(OUTPUT_FOLDER)
+        else:
+            raise ValueError("df cannot be None unless UNNEST_CSV_ROUTE is True")
     else:
         if row is None:
             raise ValueError("row cannot be None if df is not None")
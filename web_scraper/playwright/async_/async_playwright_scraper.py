@@ -3,12 +3,12 @@ import asyncio
 from functools import wraps
 import os
 import re
+import time
 from typing import Any, Coroutine
 from urllib.robotparser import RobotFileParser
 from urllib.parse import urljoin, urlsplit, urlparse
 
 
-import aiohttp
 # These are imported primarily for type hinting.
 from playwright.async_api import (
     PlaywrightContextManager as AsyncPlaywrightContextManager,
@@ -18,6 +18,7 @@ from playwright.async_api import (
     Browser as AsyncPlaywrightBrowser,
     Error as AsyncPlaywrightError,
     TimeoutError as AsyncPlaywrightTimeoutError,
+    Route as AsyncPlaywrightRoute,
 )
 
 
@@ -25,6 +26,14 @@ from utils.shared.safe_format import safe_format
 from utils.shared.sanitize_filename import sanitize_filename
 from utils.shared.decorators.try_except import try_except, async_try_except
 from utils.shared.make_id import make_id
+from utils.shared.limiters.PolitenessLimiter import PolitenessLimiter
+from .utils.route_blocking_profile import RouteBlockingProfile, RouteBlockingStats, get_domain
+from .utils.context_pool import ContextPool, PooledContext
+from .utils.readiness_predicate import ReadinessPredicate, ReadinessStats
+from .utils.response_archive import ResponseArchive
+from .utils.browser_memory_watchdog import BrowserMemoryWatchdog, get_js_heap_mb
+from web_scraper.utils.robots_store import RobotsStore, RobotRules, get_url_path
+from web_scraper.utils.async_http_fetcher import AsyncHttpFetcher
 
 from config.config import OUTPUT_FOLDER, PROJECT_ROOT
 
@@ -58,6 +67,17 @@ class AsyncPlaywrightScraper:
         domain (str): The domain to scrape.
         pw_instance (AsyncPlaywrightContextManager): The Playwright instance to use.
         user_agent (str, optional): The user agent string to use. Defaults to "*".
+        blocking_profile (RouteBlockingProfile, optional): Requests to block in every context the scraper opens.
+            Defaults to None (block nothing).
+        context_pool_size (int, optional): Number of idle browser contexts to keep for reuse between navigations.
+            Defaults to 0 (open a new context and page for every navigation).
+        context_reset (str, optional): How pooled contexts are reset when returned. See ContextPool.RESET_MODES.
+            Defaults to "clear".
+        context_max_uses (int, optional): Navigations after which a pooled context is closed and replaced. Defaults to 50.
+        archive (ResponseArchive, optional): Archive to record every response to, or replay every response from.
+            When replaying, page loads aren't spaced out by the crawl delay. Defaults to None (use the network).
+        memory_watchdog (BrowserMemoryWatchdog, optional): Watchdog that check_memory samples the browser's memory with,
+            and that decides when to recycle the browser. Defaults to None (never recycle).
         **launch_kwargs: Additional keyword arguments to pass to the browser launch method.
 
     Notes:
@@ -67,20 +87,41 @@ class AsyncPlaywrightScraper:
         user_agent (str): The user agent string.
         sanitized_filename (str): A sanitized version of the domain for use in filenames.
         rp (RobotFileParser): The parsed robots.txt file for the domain.
+        robot_rules (RobotRules): The domain's robots.txt rules compiled for user_agent, used to check URLs.
         request_rate (float): The request rate specified in robots.txt.
         crawl_delay (int): The crawl delay specified in robots.txt.
+        politeness_limiter (PolitenessLimiter): Spaces out page loads by crawl_delay and request_rate.
+            Shared by every page and scraper in the process that requests from the same domain.
         browser (AsyncPlaywrightBrowser): The Playwright browser instance (initialized as None).
         context (AsyncPlaywrightBrowserContext): The browser context (initialized as None).
         page (AsyncPlaywrightPage): The current page (initialized as None).
+        route_stats (RouteBlockingStats): Counters of requests allowed and blocked by blocking_profile.
+        context_pool (ContextPool): Pool of reusable contexts and pages, or None if context_pool_size is 0.
+        readiness_stats (ReadinessStats): Time-to-ready of every navigation, per page type.
+        http_fetcher (AsyncHttpFetcher): Browser-free fetcher for URLs that don't need rendering.
+            Its requests to the scraper's site and its subdomains wait on politeness_limiter, like page loads do.
     """
+    # Page types navigate_to can wait for, and what each needs to show before it's ready. Subclasses fill this in.
+    READINESS_PREDICATES: dict[str, ReadinessPredicate] = {}
 
     def __init__(self,
                  domain: str,
                  pw_instance: AsyncPlaywrightContextManager,
                  user_agent: str="*",
+                 blocking_profile: RouteBlockingProfile=None,
+                 context_pool_size: int=0,
+                 context_reset: str="clear",
+                 context_max_uses: int=50,
+                 archive: ResponseArchive=None,
+                 memory_watchdog: BrowserMemoryWatchdog=None,
                  **launch_kwargs):
 
         self.launch_kwargs = launch_kwargs
+        self.blocking_profile: RouteBlockingProfile = blocking_profile
+        self.archive: ResponseArchive = archive
+        self.memory_watchdog: BrowserMemoryWatchdog = memory_watchdog
+        self.last_js_heap_mb: float = None # JS heap of the last page given back, for check_memory.
+        self.route_stats: RouteBlockingStats = RouteBlockingStats()
         self.pw_instance: AsyncPlaywrightContextManager = pw_instance
         self.domain: str = domain
         self.user_agent: str = user_agent
@@ -96,72 +137,73 @@ class AsyncPlaywrightScraper:
 
         # Get the robots.txt properties and assign them.
         self.rp: RobotFileParser = None
+        self.robot_rules: RobotRules = None
         self.request_rate: float = None
         self.crawl_delay: int = None
+        # Replayed runs don't touch the site, so they get their own limiter with no delay.
+        if self.replaying:
+            self.politeness_limiter: PolitenessLimiter = PolitenessLimiter()
+        else:
+            self.politeness_limiter: PolitenessLimiter = PolitenessLimiter.for_domain(get_domain(self.domain) or self.domain)
 
         self.browser: AsyncPlaywrightBrowser = None
         self.context: AsyncPlaywrightBrowserContext = None,
         self.page: AsyncPlaywrightPage = None
         self.screenshot_path = None
 
+        self.context_pool: ContextPool = None
+        if context_pool_size > 0:
+            self.context_pool = ContextPool(
+                self._make_context, size=context_pool_size, reset=context_reset, max_uses=context_max_uses
+            )
+        self.leased: PooledContext = None
+        self.readiness_stats: ReadinessStats = ReadinessStats()
+        # e.g. api.municode.com requests count against municode.com's limiter, which workers may share.
+        # Other hosts, e.g. of linked PDFs, are paced by their own robots.txt.
+        site = (get_domain(self.domain) or self.domain).removeprefix("www.")
+        self.http_fetcher: AsyncHttpFetcher = AsyncHttpFetcher(
+            user_agent=user_agent, site_limiters={site: self.politeness_limiter}
+        )
+
+    @property
+    def replaying(self) -> bool:
+        return self.archive is not None and self.archive.mode == "replay"
+
     # Define class enter and exit methods.
 
     async def _get_robot_rules(self) -> None:
         """
-        Get the site's robots.txt file and read it asynchronously with a timeout.
-        TODO Make a database of robots.txt files. This might be a good idea for scraping.
+        Get the site's robots.txt file from the robots store, fetching it from the server if it's missing or stale,
+        and compile its rules.
         """
         robots_url = urljoin(self.domain, 'robots.txt')
+        host = get_domain(robots_url)
+        self.rp = RobotFileParser(robots_url)
+        store = RobotsStore()
 
-        # Check if we already got the robots.txt file for this website
+        # Move the robots.txt file cached by older versions into the store, so it isn't refetched.
         domain_name = _extract_domain_name_from_url(self.domain)
         robots_txt_filepath = os.path.join(PROJECT_ROOT, "web_scraper", "sites", domain_name, f"{domain_name}_robots.txt")
-        e_tuple: tuple = None
-
-        self.rp = RobotFileParser(robots_url)
-
-        # If we already got the robots.txt file, load it in.
-        if os.path.exists(robots_txt_filepath):
-            logger.info(f"Using cached robots.txt file for '{self.domain}'...")
+        if store.get(host) is None and os.path.exists(robots_txt_filepath):
             with open(robots_txt_filepath, 'r') as f:
-                content = f.read()
-                self.rp.parse(content.splitlines())
-    
-        else: # Get the robots.txt file from the server if we don't have it.
-            async with aiohttp.ClientSession() as session:
-                try:
-                    logger.info(f"Getting robots.txt from '{robots_url}'...")
-                    async with session.get(robots_url, timeout=10) as response:  # 10 seconds timeout
-                        if response.status == 200:
-                            logger.info("robots.txt response ok")
-                            content = await response.text()
-                            self.rp.parse(content.splitlines())
-                        else:
-                            logger.warning(f"Failed to fetch robots.txt: HTTP {response.status}")
-                            return None
-                except asyncio.TimeoutError as e:
-                    e_tuple = (e.__qualname__, e)
-                except aiohttp.ClientError as e:
-                    e_tuple = (e.__qualname__, e)
-                finally:
-                    if e_tuple:
-                        mes = f"{e_tuple[0]} while fetching robots.txt from '{robots_url}': {e_tuple[1]}"
-                        logger.warning(mes)
-                        return None
-                    else:
-                        logger.info(f"Got robots.txt for {self.domain}")
-                        logger.debug(f"content:\n{content}",f=True)
-
-            # Save the robots.txt file to disk.
-            if not os.path.exists(robots_txt_filepath):
-                with open(robots_txt_filepath, 'w') as f:
-                    f.write(content)
+                store.put(host, f.read(), fetched_at=os.path.getmtime(robots_txt_filepath))
+
+        content = await store.fetch(robots_url)
+        if content is None:
+            store.close()
+            return None
+        logger.debug(f"content:\n{content}",f=True)
+        self.rp.parse(content.splitlines())
+        self.robot_rules = store.rules(host, self.user_agent)
+        store.close()
 
         # Set the request rate and crawl delay from the robots.txt file.
         self.request_rate: float = self.rp.request_rate(self.user_agent) or 0
         logger.info(f"request_rate set to {self.request_rate}")
-        self.crawl_delay: int = int(self.rp.crawl_delay(self.user_agent))
+        self.crawl_delay: int = int(self.rp.crawl_delay(self.user_agent) or 0)
         logger.info(f"crawl_delay set to {self.crawl_delay}")
+        if not self.replaying:
+            self.politeness_limiter.set_rules(crawl_delay=self.crawl_delay, request_rate=self.request_rate)
         return
 
     @async_try_except(exception=[AsyncPlaywrightTimeoutError, AsyncPlaywrightError], raise_exception=True)
@@ -194,8 +236,19 @@ class AsyncPlaywrightScraper:
         Close any remaining page, context, and browser instances before exit.
         """
         await self.close_current_page_and_context()
+        if self.context_pool:
+            await self.context_pool.close()
+        await self.http_fetcher.close()
         if self.browser:
             await self.close_browser()
+        if self.blocking_profile:
+            logger.info(self.route_stats.summary(), f=True)
+        if self.archive:
+            logger.info(self.archive.summary(), f=True)
+        if self.readiness_stats.ready_times:
+            logger.info(self.readiness_stats.summary(), f=True)
+        limiter = self.politeness_limiter
+        logger.info(f"Politeness limiter: {limiter.requests:,} requests, {limiter.total_wait:.1f} seconds slept in total.")
         return
 
 
@@ -214,14 +267,79 @@ class AsyncPlaywrightScraper:
         """
         Open a new browser context.
         """
+        self.context = await self._make_context(**kwargs)
+        return
+
+
+    async def _make_context(self, **kwargs) -> AsyncPlaywrightBrowserContext:
+        """
+        Make a new browser context with the scraper's blocking profile and response archive applied.
+        """
         if self.browser:
-            self.context = await self.browser.new_context(**kwargs)
+            context = await self.browser.new_context(**kwargs)
+            if self.blocking_profile or self.archive:
+                await context.route("**/*", self._handle_route)
             logger.debug("Browser context created successfully.")
-            return
+            return context
         else:
             raise AttributeError("'browser' attribute is missing or not initialized.")
 
 
+    async def _handle_route(self, route: AsyncPlaywrightRoute) -> None:
+        """
+        Abort requests that the blocking profile blocks and let the rest through, counting both.
+        Requests that are let through are recorded or replayed by the response archive, if there is one.
+        """
+        request = route.request
+        if self.blocking_profile:
+            domain = get_domain(request.url)
+            if self.blocking_profile.should_block(request.resource_type, domain):
+                self.route_stats.record_blocked(request.resource_type, domain)
+                await route.abort()
+                return
+            self.route_stats.record_allowed()
+        if self.archive:
+            await self.archive.handle_route(route)
+        else:
+            await route.continue_()
+
+
+    async def recycle_browser(self) -> None:
+        """
+        Close the browser, along with the current and pooled contexts, and launch a fresh one.
+        """
+        await self.close_current_page_and_context()
+        self.context, self.page = None, None
+        if self.context_pool:
+            await self.context_pool.drain()
+        await self.close_browser()
+        await self._load_browser()
+        if self.memory_watchdog:
+            self.memory_watchdog.record_recycle()
+        logger.info("Browser recycled.")
+        return
+
+
+    async def check_memory(self, label: str) -> None:
+        """
+        Sample and log the browser's memory after a unit of work, e.g. a library,
+        and recycle the browser if the memory watchdog says to. Does nothing without a memory watchdog.
+        Call this between units of work, as recycling closes the current page.
+        The JS heap is the current page's, or if it's already been given back, the one return_page sampled from it.
+        """
+        if self.memory_watchdog is None:
+            return
+        js_heap_mb, self.last_js_heap_mb = self.last_js_heap_mb, None
+        if self.page and not self.page.is_closed():
+            js_heap_mb = await get_js_heap_mb(self.context, self.page)
+        sample = self.memory_watchdog.sample(label, js_heap_mb=js_heap_mb)
+        reason = self.memory_watchdog.recycle_reason(sample)
+        if reason:
+            logger.info(f"Recycling browser because {reason}...")
+            await self.recycle_browser()
+        return
+
+
     async def close_browser(self) -> None:
         """
         Close a browser instance.
@@ -265,7 +383,38 @@ class AsyncPlaywrightScraper:
         return
 
 
+    async def lease_page(self) -> None:
+        """
+        Set the current context and page, leased from the context pool if there is one, otherwise newly opened.
+        """
+        if self.context_pool:
+            self.leased = await self.context_pool.lease()
+            self.context, self.page = self.leased.context, self.leased.page
+        else:
+            await self.open_new_context()
+            await self.open_new_page()
+        return
+
+
+    async def return_page(self) -> None:
+        """
+        Give the current context and page back to the context pool, or close them if they weren't leased from it.
+        With a memory watchdog, the page's JS heap is sampled first, as it can't be once the page is gone.
+        """
+        if self.memory_watchdog and self.page and not self.page.is_closed():
+            self.last_js_heap_mb = await get_js_heap_mb(self.context, self.page)
+        if self.leased:
+            await self.context_pool.release(self.leased)
+            self.leased = None
+            self.context, self.page = None, None
+        else:
+            await self.close_current_page_and_context()
+        return
+
+
     async def close_current_page_and_context(self) -> None:
+        if self.leased:
+            return await self.return_page()
         if self.page:
             await self.close_page()
         if self.context:
@@ -279,49 +428,88 @@ class AsyncPlaywrightScraper:
         """
         return await self.page.wait_for_load_state("networkidle")
 
+
+    async def wait_till_ready(self, page_type: str) -> bool:
+        """
+        Wait for a page to show what its page type's readiness predicate needs, falling back to networkidle
+        if the predicate's selector doesn't show up in time.
+
+        Returns:
+            bool: True if the page fell back to networkidle.
+        """
+        predicate = self.READINESS_PREDICATES[page_type]
+        try:
+            await self.page.wait_for_selector(predicate.selector, state=predicate.state, timeout=predicate.timeout)
+            return False
+        except AsyncPlaywrightTimeoutError:
+            logger.warning(f"'{predicate.selector}' was not {predicate.state} after {predicate.timeout} ms. Waiting for networkidle...")
+            await self.wait_till_idle()
+            return True
+
     # Orchestrated functions.
     # These function's put all the small bits together.
 
     @try_except(exception=[AsyncPlaywrightTimeoutError, AsyncPlaywrightError])
-    async def navigate_to(self, url: str, idx: int = None, **kwargs) -> Coroutine:
+    async def navigate_to(self, url: str, idx: int = None, page_type: str = None, **kwargs) -> Coroutine:
         """
         Open a specified webpage and wait for any dynamic elements to load.
-        This method respects robots.txt rules (e.g. not scrape disallowed URLs, respects crawl delays).
-        A new browser context and page are created for each navigation to ensure a clean state.
+        This method respects robots.txt rules (e.g. not scrape disallowed URLs, respects crawl delays and request rates).
+        Page loads are spaced out by the politeness limiter, which only sleeps for whatever is left of the delay
+        after the work done since the last page load.
+        A new browser context and page are created for each navigation to ensure a clean state,
+        unless the scraper has a context pool, in which case they're leased from it.
 
         Args:
             url (str): The URL of the webpage to navigate to.
+            idx (int, optional): Index of the URL in the caller's list, for logging.
+            page_type (str, optional): Key of READINESS_PREDICATES. If given, the page is ready once its predicate holds,
+                instead of once the network is idle, and goto only waits for DOMContentLoaded. Defaults to None (networkidle).
             **kwargs: Additional keyword arguments to pass to the page.goto() method.
 
         Returns:
             Coroutine: A coroutine that resolves when the page has finished loading.
 
         Raises:
+            ValueError: If page_type isn't a key of READINESS_PREDICATES. Checked before any page is returned or leased.
             AsyncPlaywrightTimeoutError: If the page fails to load within the specified timeout.
             AsyncPlaywrightError: If any other Playwright-related error occurs during navigation.
         """
+        if page_type is not None and page_type not in self.READINESS_PREDICATES:
+            raise ValueError(f"page_type '{page_type}' is not one of {list(self.READINESS_PREDICATES)}")
+
         # Clean up the URL.
         if "%2C" in url:
             url = re.sub("%2C", ",", url)
 
         # See if we're allowed to get the URL, as well as get the specified delay from robots.txt
-        if not self.rp.can_fetch(self.user_agent, url):
+        if self.robot_rules is None or not self.robot_rules.can_fetch(get_url_path(url)):
             logger.warning(f"Cannot scrape URL '{url}' as it's disallowed in robots.txt")
             return
 
-        # Wait per the robots.txt crawl delay.
-        if self.crawl_delay > 0:
-            if idx is not None and idx > 1:
-                logger.info(f"Sleeping for {self.crawl_delay} seconds to respect robots.txt crawl delay")
-                await asyncio.sleep(self.crawl_delay)
-
-        # Open a new context and page.
-        await self.open_new_context()
-        await self.open_new_page()
-
-        # Go to the URL and wait for it to fully load.
+        # Open a new context and page, or lease them from the pool.
+        # Pooled pages still on a previous navigation are handed back first.
+        if self.leased:
+            await self.return_page()
+        await self.lease_page()
+
+        # Wait out what's left of the robots.txt crawl delay, then go to the URL and wait for it to be ready.
+        slept = await self.politeness_limiter.wait()
+        if slept > 0:
+            logger.info(f"Slept {slept:.2f} seconds to respect robots.txt crawl delay")
+        start = time.perf_counter()
+        if self.memory_watchdog:
+            self.memory_watchdog.record_page()
+        if page_type is None:
+            await self.page.goto(url, **kwargs)
+            result = await self.wait_till_idle()
+            self.readiness_stats.record("networkidle", (time.perf_counter() - start) * 1000)
+            return result
+
+        kwargs.setdefault("wait_until", "domcontentloaded")
         await self.page.goto(url, **kwargs)
-        return await self.wait_till_idle()
+        fell_back = await self.wait_till_ready(page_type)
+        self.readiness_stats.record(page_type, (time.perf_counter() - start) * 1000, fell_back=fell_back)
+        return
 
 
     @async_try_except(exception=[AsyncPlaywrightTimeoutError, AsyncPlaywrightError], raise_exception=True)
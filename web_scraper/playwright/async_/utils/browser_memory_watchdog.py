@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+import os
+from typing import Optional
+
+
+import psutil
+from playwright.async_api import (
+    BrowserContext as AsyncPlaywrightBrowserContext,
+    Page as AsyncPlaywrightPage,
+    Error as AsyncPlaywrightError,
+)
+
+
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+BROWSER_PROCESS_NAMES = ("chrom", "headless_shell") # Substrings of Chromium's browser, renderer, and GPU process names.
+
+
+def get_browser_rss_mb() -> float:
+    """
+    Sum the resident memory of every Chromium process started by this process, in MB.
+    Only this process's descendants are counted, so other scrapers' browsers aren't.
+    """
+    rss = 0
+    for child in psutil.Process(os.getpid()).children(recursive=True):
+        try:
+            if any(name in child.name().lower() for name in BROWSER_PROCESS_NAMES):
+                rss += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return rss / 1024**2
+
+
+async def get_js_heap_mb(context: AsyncPlaywrightBrowserContext, page: AsyncPlaywrightPage) -> Optional[float]:
+    """
+    Get a page's used JS heap in MB from the CDP Performance metrics, or None if the page can't be sampled.
+    """
+    try:
+        session = await context.new_cdp_session(page)
+        await session.send("Performance.enable")
+        metrics = (await session.send("Performance.getMetrics"))["metrics"]
+        await session.detach()
+    except AsyncPlaywrightError:
+        return None
+    heap = next((metric["value"] for metric in metrics if metric["name"] == "JSHeapUsedSize"), None)
+    return heap / 1024**2 if heap is not None else None
+
+
+@dataclass
+class BrowserMemoryWatchdog:
+    """
+    Track a scraper's browser memory between units of work, e.g. libraries,
+    and say when the browser should be recycled to keep it from slowing down or crashing.
+
+    Attributes:
+        max_rss_mb (float): Recycle once the browser's processes use more than this many MB. Defaults to 2048.
+        max_pages (int): Recycle after this many page loads since the last recycle. Defaults to 200.
+    """
+    max_rss_mb: float = 2048
+    max_pages: int = 200
+    pages_since_recycle: int = 0
+    recycles: int = 0
+    samples: list[dict] = field(default_factory=list)
+
+    def record_page(self) -> None:
+        self.pages_since_recycle += 1
+
+    def sample(self, label: str, js_heap_mb: Optional[float] = None) -> dict:
+        """
+        Sample the browser's memory, log it, and keep it with the given label.
+        """
+        sample = {
+            'label': label,
+            'rss_mb': get_browser_rss_mb(),
+            'js_heap_mb': js_heap_mb,
+            'pages_since_recycle': self.pages_since_recycle,
+        }
+        self.samples.append(sample)
+        js_heap = f", JS heap {js_heap_mb:,.1f} MB" if js_heap_mb is not None else ""
+        logger.info(
+            f"Browser memory after {label}: RSS {sample['rss_mb']:,.1f} MB{js_heap}, "
+            f"{self.pages_since_recycle} pages since last recycle"
+        )
+        return sample
+
+    def recycle_reason(self, sample: dict) -> Optional[str]:
+        """
+        Get why the browser should be recycled, or None if it shouldn't be.
+        """
+        if sample['rss_mb'] > self.max_rss_mb:
+            return f"RSS {sample['rss_mb']:,.1f} MB is over {self.max_rss_mb:,} MB"
+        if self.pages_since_recycle >= self.max_pages:
+            return f"{self.pages_since_recycle} pages loaded since the last recycle"
+        return None
+
+    def record_recycle(self) -> None:
+        self.pages_since_recycle = 0
+        self.recycles += 1
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field
+import statistics
+import time
+from typing import Any, Callable, Coroutine
+
+
+from playwright.async_api import (
+    BrowserContext as AsyncPlaywrightBrowserContext,
+    Page as AsyncPlaywrightPage,
+)
+
+
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+# NOTE Storage is per-origin, so this has to run while the page is still on the site it was used for.
+CLEAR_STORAGE_JS = """
+() => {
+    try { localStorage.clear(); } catch (e) {}
+    try { sessionStorage.clear(); } catch (e) {}
+}
+"""
+
+
+@dataclass
+class PooledContext:
+    """
+    A browser context and page leased from a ContextPool.
+    """
+    context: AsyncPlaywrightBrowserContext
+    page: AsyncPlaywrightPage
+    uses: int = 0
+
+
+@dataclass
+class ContextPoolStats:
+    """
+    Timings for a ContextPool, in milliseconds.
+    """
+    created: int = 0
+    reused: int = 0
+    recycled: int = 0
+    create_times: list[float] = field(default_factory=list) # New context and page.
+    close_times: list[float] = field(default_factory=list) # Closing a context.
+    reset_times: list[float] = field(default_factory=list) # Resetting a context for reuse.
+
+    def summary(self) -> str:
+        mean = lambda times: statistics.mean(times) if times else 0
+        fresh_cost = mean(self.create_times) + mean(self.close_times)
+        reuse_cost = mean(self.reset_times)
+        return f"""
+        Context Pool Summary:
+        Contexts created: {self.created:,}
+        Leases served from the pool: {self.reused:,}
+        Contexts recycled: {self.recycled:,}
+        Mean create time: {mean(self.create_times):.1f} ms
+        Mean close time: {mean(self.close_times):.1f} ms
+        Mean reset time: {mean(self.reset_times):.1f} ms
+        Estimated savings per pooled navigation: {fresh_cost - reuse_cost:.1f} ms"""
+
+
+class ContextPool:
+    """
+    Keep browser contexts and pages alive between navigations, so the HTTP cache, compiled JS,
+    and site bootstrap aren't thrown away each time.
+
+    Args:
+        new_context (Callable): Coroutine function that makes a new, fully set-up browser context.
+        size (int): Maximum number of idle contexts to keep. Defaults to 1.
+        reset (str): What to do to a context when it's returned. Must be one of RESET_MODES.
+            "clear" clears its cookies and the current origin's local and session storage.
+            "keep" leaves it as is. Defaults to "clear".
+        max_uses (int): Leases after which a context is closed instead of returned to the pool. Defaults to 50.
+
+    Example:
+        >>> pool = ContextPool(browser.new_context, size=1, reset="clear", max_uses=50)
+        >>> leased = await pool.lease()
+        >>> await leased.page.goto(url)
+        >>> await pool.release(leased)
+        >>> await pool.close()
+    """
+    RESET_MODES = ("clear", "keep")
+
+    def __init__(self,
+                 new_context: Callable[[], Coroutine[Any, Any, AsyncPlaywrightBrowserContext]],
+                 size: int = 1,
+                 reset: str = "clear",
+                 max_uses: int = 50
+                ):
+        if reset not in self.RESET_MODES:
+            raise ValueError(f"reset '{reset}' is not one of {self.RESET_MODES}")
+        self.new_context = new_context
+        self.size = size
+        self.reset = reset
+        self.max_uses = max_uses
+        self.idle: list[PooledContext] = []
+        self.stats = ContextPoolStats()
+
+
+    async def lease(self) -> PooledContext:
+        """
+        Get an idle context and page from the pool, or make new ones if there aren't any.
+        """
+        if self.idle:
+            leased = self.idle.pop()
+            self.stats.reused += 1
+        else:
+            start = time.perf_counter()
+            context = await self.new_context()
+            page = await context.new_page()
+            self.stats.create_times.append((time.perf_counter() - start) * 1000)
+            self.stats.created += 1
+            leased = PooledContext(context=context, page=page)
+        leased.uses += 1
+        return leased
+
+
+    async def release(self, leased: PooledContext) -> None:
+        """
+        Return a leased context to the pool, resetting it per self.reset.
+        Contexts that are over max_uses, have a closed page, or don't fit in the pool are closed instead.
+        """
+        if leased.uses >= self.max_uses or leased.page.is_closed() or len(self.idle) >= self.size:
+            if leased.uses >= self.max_uses:
+                self.stats.recycled += 1
+                logger.debug(f"Recycling context after {leased.uses} uses.")
+            await self._close(leased)
+            return
+
+        start = time.perf_counter()
+        try:
+            if self.reset == "clear":
+                await leased.page.evaluate(CLEAR_STORAGE_JS)
+                await leased.context.clear_cookies()
+        except Exception as e:
+            logger.warning(f"Could not reset pooled context. Closing it instead: {e}")
+            await self._close(leased)
+            return
+        self.stats.reset_times.append((time.perf_counter() - start) * 1000)
+        self.idle.append(leased)
+
+
+    async def _close(self, leased: PooledContext) -> None:
+        start = time.perf_counter()
+        await leased.context.close()
+        self.stats.close_times.append((time.perf_counter() - start) * 1000)
+
+
+    async def drain(self) -> None:
+        """
+        Close every idle context in the pool, e.g. before the browser they belong to is closed.
+        """
+        while self.idle:
+            await self._close(self.idle.pop())
+
+
+    async def close(self) -> None:
+        """
+        Close every idle context in the pool and log the pool's stats.
+        """
+        await self.drain()
+        logger.info(self.stats.summary(), f=True)
@@ -0,0 +1,43 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+import statistics
+
+
+@dataclass(frozen=True)
+class ReadinessPredicate:
+    """
+    What a page of a given type needs to show before it's ready to scrape.
+
+    Attributes:
+        selector (str): CSS selector of an element that only exists once the page has rendered what we need.
+        state (str): Playwright element state to wait for: "attached", "detached", "visible", or "hidden".
+            Defaults to "visible".
+        timeout (float): Milliseconds to wait for the selector before falling back to networkidle. Defaults to 10000.
+    """
+    selector: str
+    state: str = "visible"
+    timeout: float = 10000
+
+
+@dataclass
+class ReadinessStats:
+    """
+    Time-to-ready per page type, in milliseconds, and how often each page type fell back to networkidle.
+    """
+    ready_times: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    fallbacks: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, page_type: str, milliseconds: float, fell_back: bool = False) -> None:
+        self.ready_times[page_type].append(milliseconds)
+        if fell_back:
+            self.fallbacks[page_type] += 1
+
+    def summary(self) -> str:
+        lines = ["", "        Time-to-Ready Summary:"]
+        for page_type, times in self.ready_times.items():
+            lines.append(
+                f"        {page_type}: {len(times):,} pages, "
+                f"mean {statistics.mean(times):.1f} ms, median {statistics.median(times):.1f} ms, max {max(times):.1f} ms, "
+                f"{self.fallbacks[page_type]:,} networkidle fallbacks"
+            )
+        return "\n".join(lines)
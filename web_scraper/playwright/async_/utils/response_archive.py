@@ -0,0 +1,146 @@
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from typing import Optional
+
+
+from playwright.async_api import Route as AsyncPlaywrightRoute
+
+
+from utils.shared.make_sha256_hash import make_sha256_hash
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+# Headers that describe the original transfer, not the decoded body we store, so they can't be replayed.
+UNREPLAYABLE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+
+@dataclass
+class ArchivedResponse:
+    """
+    One recorded response in a ResponseArchive's index.
+    """
+    method: str
+    url: str
+    status: int
+    headers: dict[str, str]
+    body_hash: str
+
+
+class ResponseArchive:
+    """
+    A content-addressed archive of the responses a browser context received, for offline, repeatable runs.
+    Bodies are stored once per SHA-256 hash under 'bodies/', and 'index.jsonl' maps each request
+    (method, URL, and a hash of its post data) to its status, headers, and body hash.
+
+    In "record" mode, every routed request is fetched from the network, stored, and fulfilled with the fetched response.
+    In "replay" mode, requests are fulfilled from the archive, after an optional injected latency,
+    and requests that weren't recorded are aborted, so nothing goes to the network.
+    NOTE: Requests made outside the browser context's routing, e.g. through page.request, aren't recorded or replayed.
+
+    Args:
+        archive_dir (str): Folder of the archive. Made if it doesn't exist.
+        mode (str): One of MODES.
+        latency (float): Seconds to wait before fulfilling each replayed request. Defaults to 0.
+
+    Example:
+        >>> archive = ResponseArchive(os.path.join(OUTPUT_FOLDER, "archives", "run_1"), mode="record")
+        >>> await context.route("**/*", archive.handle_route)
+    """
+    MODES = ("record", "replay")
+
+    def __init__(self, archive_dir: str, mode: str, latency: float = 0):
+        if mode not in self.MODES:
+            raise ValueError(f"mode '{mode}' is not one of {self.MODES}")
+        self.archive_dir = archive_dir
+        self.bodies_dir = os.path.join(archive_dir, "bodies")
+        self.index_path = os.path.join(archive_dir, "index.jsonl")
+        self.mode = mode
+        self.latency = latency
+        self.hits: int = 0
+        self.misses: int = 0
+        self.recorded: int = 0
+        os.makedirs(self.bodies_dir, exist_ok=True)
+
+        # Later records of the same request replace earlier ones.
+        self.index: dict[str, ArchivedResponse] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    entry = json.loads(line)
+                    self.index[entry.pop('key')] = ArchivedResponse(**entry)
+        logger.info(f"Opened response archive '{archive_dir}' in {mode} mode with {len(self.index):,} responses.")
+
+    @staticmethod
+    def make_key(method: str, url: str, post_data: Optional[bytes] = None) -> str:
+        return make_sha256_hash(method, url, hashlib.sha256(post_data or b"").hexdigest())
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.bodies_dir, body_hash)
+
+    def add(self, key: str, response: ArchivedResponse, body: bytes) -> None:
+        """
+        Store a response body, if it isn't already stored, and add the response to the index.
+        """
+        body_path = self._body_path(response.body_hash)
+        if not os.path.exists(body_path):
+            tmp_path = f"{body_path}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(body)
+            os.replace(tmp_path, body_path)
+        with open(self.index_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'key': key, **response.__dict__}) + "\n")
+        self.index[key] = response
+        self.recorded += 1
+
+    def get(self, key: str) -> Optional[tuple[ArchivedResponse, bytes]]:
+        response = self.index.get(key)
+        if response is None:
+            return None
+        with open(self._body_path(response.body_hash), 'rb') as file:
+            return response, file.read()
+
+    async def handle_route(self, route: AsyncPlaywrightRoute) -> None:
+        """
+        Record or replay a routed request, depending on the archive's mode.
+        """
+        request = route.request
+        key = self.make_key(request.method, request.url, request.post_data_buffer)
+
+        if self.mode == "record":
+            fetched = await route.fetch()
+            body = await fetched.body()
+            headers = {name: value for name, value in fetched.headers.items() if name.lower() not in UNREPLAYABLE_HEADERS}
+            self.add(key, ArchivedResponse(
+                method=request.method,
+                url=request.url,
+                status=fetched.status,
+                headers=headers,
+                body_hash=hashlib.sha256(body).hexdigest(),
+            ), body)
+            await route.fulfill(status=fetched.status, headers=headers, body=body)
+            return
+
+        archived = self.get(key)
+        if archived is None:
+            self.misses += 1
+            logger.debug(f"No archived response for {request.method} {request.url}. Aborting...")
+            await route.abort()
+            return
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        response, body = archived
+        self.hits += 1
+        await route.fulfill(status=response.status, headers=response.headers, body=body)
+
+    def summary(self) -> str:
+        return f"""
+        Response Archive Summary ({self.mode}):
+        Archive: {self.archive_dir}
+        Responses in index: {len(self.index):,}
+        Recorded this run: {self.recorded:,}
+        Replayed: {self.hits:,}
+        Missing from archive: {self.misses:,}"""
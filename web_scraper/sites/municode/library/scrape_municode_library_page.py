@@ -1,6 +1,8 @@
 import asyncio
+import json
 import random
-from typing import NamedTuple
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
 
 
 import pandas as pd
@@ -14,7 +16,12 @@ from playwright.async_api import (
 
 
 from web_scraper.playwright.async_.async_playwright_scraper import AsyncPlaywrightScraper
+from web_scraper.playwright.async_.utils.route_blocking_profile import RouteBlockingProfile
+from web_scraper.playwright.async_.utils.readiness_predicate import ReadinessPredicate
+from web_scraper.utils.async_http_fetcher import can_fetch_without_browser
 from .table_of_contents.walk_municode_toc import WalkMunicodeToc
+from .table_of_contents.capture_municode_toc import CaptureMunicodeToc
+from .table_of_contents.walk_municode_toc_in_parallel import walk_municode_toc_in_parallel
 
 from utils.shared.make_sha256_hash import make_sha256_hash
 from utils.shared.sanitize_filename import sanitize_filename
@@ -38,6 +45,43 @@ class ScrapeMunicodeLibraryPage(AsyncPlaywrightScraper):
     """
 
     NODE_ID_SELECTOR  = 'a[href*="?nodeId="]' # NOTE This selector works.
+    # Names of the methods that can walk the ToC, and the class they belong to.
+    WALK_MODES = {
+        "nested_menu": WalkMunicodeToc,
+        "nested_menu_in_page": WalkMunicodeToc,
+        "nested_menu_breadth_first": WalkMunicodeToc,
+        "streamed_menu": WalkMunicodeToc,
+        "compact_menu": WalkMunicodeToc,
+        "captured_menu": CaptureMunicodeToc,
+    }
+    RESUMABLE_WALK_MODES = ("streamed_menu",) # Walk modes that checkpoint and can resume after an error.
+    # Blocks images, fonts, media, and anything not served from Municode (e.g. analytics).
+    # Pass as blocking_profile=ScrapeMunicodeLibraryPage.MUNICODE_BLOCKING_PROFILE.
+    MUNICODE_BLOCKING_PROFILE = RouteBlockingProfile(
+        blocked_resource_types=frozenset({"image", "media", "font"}),
+        allowed_domains=("municode.com",),
+    )
+    CHUNK_WRAPPER_SELECTOR = ".chunk-content-wrapper"
+    # NOTE Gets each code chunk's text and HTML, with the id and heading of the chunk it's in, in document order.
+    EXTRACT_CHUNKS_JS = """
+    (selector) => Array.from(document.querySelectorAll(selector)).map((wrapper, index) => {
+        const chunk = wrapper.closest('[id]');
+        const headingSelector = 'h1, h2, h3, h4, h5, h6, .chunk-title';
+        const heading = wrapper.querySelector(headingSelector) || (chunk && chunk.querySelector(headingSelector));
+        return {
+            index: index,
+            id: chunk ? chunk.id : null,
+            heading: heading ? heading.textContent.trim() : null,
+            html: wrapper.innerHTML,
+            text: wrapper.innerText.trim(),
+        };
+    })
+    """
+    # A library page is ready once its ToC root nodes are visible, and a content page once its code text is attached.
+    READINESS_PREDICATES = {
+        "library": ReadinessPredicate(NODE_ID_SELECTOR, state="visible"),
+        "content": ReadinessPredicate(CHUNK_WRAPPER_SELECTOR, state="attached"),
+    }
 
     def __init__(self,
                 domain: str,
@@ -84,12 +128,49 @@ class ScrapeMunicodeLibraryPage(AsyncPlaywrightScraper):
         return count_list
 
 
-    async def download_html_to_disk(self, url: str, idx: int=None) -> None:
+    async def extract_chunks_to_disk(self, url: str) -> int:
+        """
+        Extract the current page's code chunks in-page and write them to '<sanitized url>.chunks.jsonl',
+        one record per chunk with its index, id, heading, inner HTML, and text.
+
+        Returns:
+            int: The number of chunks written.
         """
-        Navigate to the given URL and download the HTML content to disk.
+        chunks: list[dict] = await self.page.evaluate(self.EXTRACT_CHUNKS_JS, self.CHUNK_WRAPPER_SELECTOR)
+        if not chunks:
+            return 0
+        filepath = os.path.join(self.output_folder, sanitize_filename(url) + '.chunks.jsonl')
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(json.dumps({'url': url, **chunk}) + "\n")
+        logger.info(f"Extracted {len(chunks):,} chunks ({os.path.getsize(filepath):,} bytes) from {url} to {filepath}.")
+        return len(chunks)
+
+    async def download_html_to_disk(self, url: str, idx: int=None, keep_full_dom: bool=False) -> Optional[str]:
+        """
+        Navigate to the given URL and save its content to disk.
+        By default only the page's code chunks are extracted, to JSONL. The full HTML is also saved if keep_full_dom is True,
+        or if the page has no code chunks.
+        URLs that don't need a browser, e.g. documents and JSON, are streamed to disk over plain HTTP instead.
+
+        Returns:
+            str: The path of the file the content was saved to, or None if the download failed.
         """
         try:
-            await self.navigate_to(url, idx=idx)
+            if can_fetch_without_browser(url):
+                extension = os.path.splitext(urlparse(url).path)[1] or '.html'
+                filepath = os.path.join(self.output_folder, sanitize_filename(url) + extension)
+                await self.http_fetcher.download(url, filepath)
+                return filepath
+
+            await self.navigate_to(url, idx=idx, page_type="content")
+
+            chunk_count = await self.extract_chunks_to_disk(url)
+            if chunk_count > 0 and not keep_full_dom:
+                await self.return_page()
+                return os.path.join(self.output_folder, sanitize_filename(url) + '.chunks.jsonl')
+            if chunk_count == 0:
+                logger.warning(f"No '{self.CHUNK_WRAPPER_SELECTOR}' elements found on {url}. Saving the full HTML instead...")
 
             # Get the HTML content
             html_content = await self.page.content()
@@ -103,13 +184,14 @@ class ScrapeMunicodeLibraryPage(AsyncPlaywrightScraper):
                 f.write(html_content)
 
             logger.info(f"Successfully downloaded HTML from {url} to {filepath}.")
-            await self.close_current_page_and_context()
+            await self.return_page()
+            return filepath
         
         except (AsyncPlaywrightError, AsyncPlaywrightTimeoutError) as e:
             logger.error(f"Playwright error while downloading HTML from {url}: {e}")
         except Exception as e:
             logger.error(f"Unexpected error while downloading HTML from {url}: {e}")
-        return
+        return None
 
     async def screenshot_if_no_menu_elements(self, row: str) -> None:
         logger.info(f"Skipping URL: {row.url} because it errored. Taking screenshot and continuing to next row...")
@@ -117,53 +199,109 @@ class ScrapeMunicodeLibraryPage(AsyncPlaywrightScraper):
         await self.close_current_page_and_context()
         return None
 
-    async def scrape_municode_toc_menu(self, row: NamedTuple) -> pd.DataFrame|None:
+    async def _open_extra_library_pages(self, count: int) -> list:
+        """
+        Open extra pages on the current library URL in the current context, waiting on the politeness limiter before each.
+        """
+        url = self.page.url
+        pages = []
+        for i in range(count):
+            await self.politeness_limiter.wait()
+            logger.info(f"Opening extra page {i + 1} of {count} on {url}...")
+            page = await self.context.new_page()
+            await page.goto(url)
+            await page.wait_for_selector(self.NODE_ID_SELECTOR, state='visible', timeout=10000)
+            pages.append(page)
+        return pages
+
+    async def scrape_municode_toc_menu(self,
+                                       row: NamedTuple,
+                                       walk_mode: str = "nested_menu",
+                                       walk_kwargs: dict = None,
+                                       resume_attempts: int = 0,
+                                       num_pages: int = 1
+                                      ) -> pd.DataFrame|None:
         """
         Scrape a Table of Contents menu from Municode.
         
         Args:
             seed (int): Random seed for reproducibility.
             row (NamedTuple): A row from the dataframe containing the URL and place name.
+            walk_mode (str): Which method to walk the menu with. Must be one of WALK_MODES.
+                "captured_menu" builds the menu from Municode's codesToc JSON responses instead of the DOM.
+                Defaults to "nested_menu".
+            walk_kwargs (dict, optional): Additional keyword arguments for the walk class,
+                e.g. {"max_in_flight_expansions": 20} or {"fetch_remaining": True}.
+            resume_attempts (int): For walk modes in RESUMABLE_WALK_MODES, how many times to reload the page
+                and resume the walk from its checkpoint after a Playwright error. Defaults to 0.
+            num_pages (int): How many pages to walk the library on at once. Extra pages are opened on the same
+                library URL through the politeness limiter, and the root nodes are split between them.
+                Only supported with walk_mode "nested_menu". Defaults to 1.
             
         Returns:
             tuple: (selected_element, element_text, element_href)
         """
+        if walk_mode not in self.WALK_MODES:
+            raise ValueError(f"walk_mode '{walk_mode}' is not one of {list(self.WALK_MODES)}")
+        if num_pages > 1 and walk_mode != "nested_menu":
+            raise ValueError(f"num_pages > 1 is only supported with walk_mode 'nested_menu', not '{walk_mode}'")
 
-        try:
-            # Wait for the top-level menu elements to be visible
-            await self.page.wait_for_selector(self.NODE_ID_SELECTOR , state='visible', timeout=10000)
-
-            # Create walk instance
-            walk = WalkMunicodeToc(self.page, self.place_name, self.output_folder)
-
-            # Walk the nested menu and save the results.
-            df: pd.DataFrame = await walk.nested_menu(self.NODE_ID_SELECTOR, row)
-            if df is None or len(df) == 0:
-                logger.warning(f"Selector '{self.NODE_ID_SELECTOR}' was found for {row.url} but could not find menu elements.")
+        attempt = 0
+        while True:
+            try:
+                # Wait for the top-level menu elements to be visible
+                await self.page.wait_for_selector(self.NODE_ID_SELECTOR , state='visible', timeout=10000)
+
+                if num_pages > 1:
+                    # Open the extra pages, then walk the nested menu across all of them and save the results.
+                    pages = [self.page] + await self._open_extra_library_pages(num_pages - 1)
+                    df: pd.DataFrame = await walk_municode_toc_in_parallel(
+                        pages, self.NODE_ID_SELECTOR, row, self.place_name, self.output_folder, **(walk_kwargs or {})
+                    )
+                else:
+                    pages = [self.page]
+                    # Create walk instance
+                    walk = self.WALK_MODES[walk_mode](self.page, self.place_name, self.output_folder, **(walk_kwargs or {}))
+
+                    # Walk the nested menu and save the results.
+                    df: pd.DataFrame = await getattr(walk, walk_mode)(self.NODE_ID_SELECTOR, row)
+                if df is None or len(df) == 0:
+                    logger.warning(f"Selector '{self.NODE_ID_SELECTOR}' was found for {row.url} but could not find menu elements.")
+                    await self.screenshot_if_no_menu_elements(row)
+                    return None
+                else:
+                    logger.info("Walk of Municode ToC menu finished.")
+                    logger.debug(f"df\n{df.head()}",f=True)
+
+                # Save the HTML from the webpage(s) once the nodes have been expanded.
+                # NOTE Each extra page only has its own share of the nodes expanded, so each is saved separately.
+                logger.info("Nodes expanded successfully.\nGetting HTML...")
+                for i, page in enumerate(pages):
+                    html = await page.inner_html('body')
+                    page_suffix = f"_page{i}" if i > 0 else ""
+                    html_filepath = make_path_from_function_name(f"{sanitize_filename(page.url)}{page_suffix}.html")
+                    with open(html_filepath, 'w', encoding='utf-8') as file:
+                        file.write(html)
+                    logger.info(f"{os.path.basename(html_filepath)} successfully saved to output folder.")
+
+                for page in pages[1:]:
+                    await page.close()
+                await self.return_page()
+                return df
+
+            except (AsyncPlaywrightTimeoutError, AsyncPlaywrightError) as e:
+                if walk_mode in self.RESUMABLE_WALK_MODES and attempt < resume_attempts:
+                    attempt += 1
+                    logger.warning(f"Playwright Error in scrape_municode_toc_menu: {e}\nReloading and resuming from checkpoint (attempt {attempt} of {resume_attempts})...")
+                    await self.politeness_limiter.wait()
+                    await self.page.reload()
+                    continue
+                logger.error(f"Playwright Error in scrape_municode_toc_menu: {e}")
                 await self.screenshot_if_no_menu_elements(row)
                 return None
-            else:
-                logger.info("Walk of Municode ToC menu finished.")
-                logger.debug(f"df\n{df.head()}",f=True)
-
-            # Save the HTML from the webpage once the nodes have been expanded.
-            logger.info("Nodes expanded successfully.\nGetting HTML...")
-            html = await self.page.inner_html('body')
-            html_filepath = make_path_from_function_name(f"{sanitize_filename(self.page.url)}.html")
-            with open(html_filepath, 'w', encoding='utf-8') as file:
-                file.write(html)
-
-            logger.info(f"{os.path.basename(html_filepath)} successfully saved to output folder.")
-            await self.close_current_page_and_context()
-            return df
-
-        except (AsyncPlaywrightTimeoutError, AsyncPlaywrightError) as e:
-            logger.error(f"Playwright Error in scrape_municode_toc_menu: {e}")
-            await self.screenshot_if_no_menu_elements(row)
-            return None
-        except Exception as e:
-            logger.error(f"Error in scrape_municode_toc_menu: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"Error in scrape_municode_toc_menu: {e}")
+                raise
 
 
 class GetMunicodeSidebarElements(AsyncPlaywrightScraper):
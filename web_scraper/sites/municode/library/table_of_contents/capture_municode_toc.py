@@ -0,0 +1,246 @@
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+import re
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+
+import pandas as pd
+from playwright.async_api import (
+    Page,
+    Response,
+    TimeoutError as AsyncPlaywrightTimeoutError,
+)
+
+
+from .walk_municode_toc import WalkMunicodeToc, NodeData
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+class CaptureMunicodeToc(WalkMunicodeToc):
+    """
+    Build Municode's Table of Contents from the JSON payloads its front end fetches, instead of the rendered DOM.
+    When a ToC node expands, Municode's Angular front end fetches the node's children from its codesToc API.
+    This class listens on page.on("response") for those payloads and builds the NodeData tree directly from them.
+    Only the root nodes are read from the DOM.
+
+    With fetch_remaining=True, only the first expansion is done with a button click.
+    The rest of the child payloads are fetched directly from the captured endpoint via page.request,
+    which skips DOM rendering and layout entirely.
+
+    NOTE: The payload keys and the 'genToc_<Id>' element ids are what Municode served when this was written.
+    If Municode changes them, update the class constants below.
+
+    Example:
+        >>> capture = CaptureMunicodeToc(page, place_name, output_folder, fetch_remaining=True)
+        >>> df = await capture.captured_menu('a[href*="?nodeId="]', row)
+    """
+    # Municode's codesToc API
+    PATTERN_TOC_RESPONSE = re.compile(r'/codesToc(/children)?\?', re.IGNORECASE)
+    NODE_ID_PARAM = "nodeId"
+    NODE_ID_PREFIX = "genToc_" # The DOM id of a node's <li> is this prefix plus the payload's Id.
+
+    # Payload keys
+    PAYLOAD_ID_KEY = "Id"
+    PAYLOAD_HEADING_KEY = "Heading"
+    PAYLOAD_HAS_CHILDREN_KEY = "HasChildren"
+    PAYLOAD_CHILDREN_KEY = "Children"
+
+    # NOTE Gets the id, text, and url of each valid root node in one round trip.
+    ROOT_NODE_INFO = """
+    (rootSelector) => Array.from(document.querySelectorAll(rootSelector))
+        .filter(anchor => {
+            const parent = anchor.parentElement;
+            return parent && /^genToc.*/.test(parent.id) && parent.querySelector('button') !== null;
+        })
+        .map(anchor => {
+            const href = anchor.getAttribute('href');
+            return {
+                node_id: String(anchor.parentElement.id),
+                text: (anchor.textContent || '').trim(),
+                url: href ? String(href) : null,
+            };
+        })
+    """
+
+    def __init__(self, page: Page, place_name: str, output_folder: str, fetch_remaining: bool = False, **kwargs):
+        super().__init__(page, place_name, output_folder, **kwargs)
+        self.fetch_remaining = fetch_remaining
+        self.payloads: dict[Optional[str], Any] = {} # Captured payloads, keyed by the nodeId they were fetched for.
+        self.children_url: str = None # The first captured children URL. Used as a template for direct fetches.
+        self.base_url: str = None
+
+
+    async def captured_menu(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
+        """
+        Build the Table of Contents from captured codesToc payloads.
+        The saved node records are the same as nested_menu's.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+            row (NamedTuple): A row from the dataframe containing the URL and place name.
+
+        Returns:
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        """
+        self.base_url = urlunsplit(urlsplit(self.page.url)._replace(query="", fragment=""))
+        self.page.on("response", self._on_response)
+        try:
+            logger.info(f"Starting captured menu traversal for {self.place_name}...")
+            root_infos: list[dict] = await self.page.evaluate(self.ROOT_NODE_INFO, root_selector)
+            if not root_infos:
+                raise ValueError(f"No root nodes found matching selector '{root_selector}'")
+
+            results = []
+            for info in root_infos:
+                if self._node_was_visited(info['node_id'], 0):
+                    continue
+                node_data = self._make_node_data(info['text'], info['node_id'], info['url'], 0)
+                await self._add_children(node_data)
+                results.append(node_data)
+
+            logger.info("Captured menu traversal completed. Logging and saving...")
+
+            # Log the results
+            await self._log_traversal_summary()
+
+            # Save the results to a JSON Lines file of node records.
+            return self._save_results(results, row)
+
+        except Exception as e:
+            logger.error(f"Error during captured menu traversal: {e}")
+            raise e
+        finally:
+            self.page.remove_listener("response", self._on_response)
+
+
+    def _make_node_data(self, text: str, node_id: str, url: str, depth: int) -> NodeData:
+        return NodeData(
+            text=text,
+            node_id=node_id,
+            depth=depth,
+            url=url,
+            metadata={
+                'path': '/'.join(self.state.traversal_path),
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+
+
+    async def _add_children(self, node_data: NodeData) -> None:
+        """
+        Recursively get the children payload for a node and add them to its NodeData.
+        """
+        toc_id = node_data.node_id.removeprefix(self.NODE_ID_PREFIX)
+        child_depth = node_data.depth + 1
+
+        try:
+            payload = await self._get_children_payload(node_data.node_id, toc_id)
+        except Exception as e:
+            logger.error(f"Error getting children of node {node_data.node_id}: {e}")
+            self.state.errors.append({
+                'node_id': node_data.node_id,
+                'depth': node_data.depth,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            })
+            node_data.metadata['expanded'] = False
+            return
+
+        node_data.metadata['expanded'] = True
+        self.state.expanded_nodes.add(node_data.node_id)
+
+        for child in self._get_payload_nodes(payload):
+            child_toc_id = str(child[self.PAYLOAD_ID_KEY])
+            child_node_id = f"{self.NODE_ID_PREFIX}{child_toc_id}"
+            if self._node_was_visited(child_node_id, child_depth) or self._depth_is_over_max_depth(child_node_id, child_depth):
+                continue
+
+            child_data = self._make_node_data(
+                (child.get(self.PAYLOAD_HEADING_KEY) or '').strip(),
+                child_node_id,
+                f"{self.base_url}?{urlencode({self.NODE_ID_PARAM: child_toc_id})}",
+                child_depth
+            )
+            if child.get(self.PAYLOAD_HAS_CHILDREN_KEY):
+                await self._add_children(child_data)
+            node_data.children.append(child_data)
+
+
+    def _get_payload_nodes(self, payload: Any) -> list[dict]:
+        """
+        Get the list of child nodes from a codesToc payload.
+        """
+        if isinstance(payload, list):
+            return payload
+        if isinstance(payload, dict):
+            return payload.get(self.PAYLOAD_CHILDREN_KEY) or []
+        return []
+
+
+    async def _get_children_payload(self, node_id: str, toc_id: str) -> Any:
+        """
+        Get a node's children payload, either from what was already captured,
+        by fetching it directly, or by clicking the node's button and capturing the response.
+        """
+        if toc_id in self.payloads:
+            return self.payloads[toc_id]
+
+        if self.fetch_remaining and self.children_url:
+            response = await self.page.request.get(self._make_children_url(toc_id))
+            if response.ok:
+                payload = await response.json()
+                self.payloads[toc_id] = payload
+                return payload
+            # e.g. a rate limit or an error page. Don't cache it, and let the page make the request instead.
+            logger.warning(
+                f"Fetching the children of nodeId '{toc_id}' returned HTTP {response.status}. Clicking its button instead..."
+            )
+
+        start = datetime.now().timestamp()
+        async with self.page.expect_response(
+            lambda response: self._get_node_id_param(response.url) == toc_id and self._is_toc_response(response),
+            timeout=self.MAX_WAIT_TIME
+        ) as response_info:
+            await self.page.click(f'[id="{node_id}"] > button', timeout=self.MAX_WAIT_TIME)
+        response = await response_info.value
+        self.state.expansion_times.append((datetime.now().timestamp() - start) * 1000)
+
+        payload = await response.json()
+        self.payloads[toc_id] = payload
+        return payload
+
+
+    def _is_toc_response(self, response: Response) -> bool:
+        return response.ok and bool(self.PATTERN_TOC_RESPONSE.search(response.url))
+
+
+    def _get_node_id_param(self, url: str) -> Optional[str]:
+        values = parse_qs(urlsplit(url).query).get(self.NODE_ID_PARAM)
+        return values[0] if values else None
+
+
+    def _make_children_url(self, toc_id: str) -> str:
+        """
+        Make a children URL for a node by swapping the nodeId in the first captured children URL.
+        """
+        split_url = urlsplit(self.children_url)
+        query = parse_qs(split_url.query)
+        query[self.NODE_ID_PARAM] = [toc_id]
+        return urlunsplit(split_url._replace(query=urlencode(query, doseq=True)))
+
+
+    async def _on_response(self, response: Response) -> None:
+        """
+        Store any codesToc payload the page receives.
+        """
+        if not self._is_toc_response(response):
+            return
+        toc_id = self._get_node_id_param(response.url)
+        if toc_id is not None and self.children_url is None:
+            self.children_url = response.url
+        try:
+            self.payloads[toc_id] = await response.json()
+            logger.debug(f"Captured codesToc payload for nodeId '{toc_id}'")
+        except Exception as e:
+            logger.warning(f"Could not read codesToc payload from '{response.url}': {e}")
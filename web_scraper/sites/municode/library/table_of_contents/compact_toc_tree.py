@@ -0,0 +1,169 @@
+from array import array
+from datetime import datetime
+import json
+from typing import AsyncIterator, Optional
+
+
+import numpy as np
+import pandas as pd
+
+
+from .walk_municode_toc import NodeData, FLAT_NODE_COLUMNS
+
+
+class StringPool:
+    """
+    Intern strings so each unique string is stored once and referred to by an integer id.
+    Id 0 is reserved for None.
+    """
+
+    def __init__(self):
+        self.strings: list[Optional[str]] = [None]
+        self.ids: dict[str, int] = {}
+
+    def intern(self, string: Optional[str]) -> int:
+        if string is None:
+            return 0
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def take(self, string_ids: np.ndarray) -> np.ndarray:
+        """
+        Look up an array of string ids, returning an object array of strings.
+        """
+        return np.array(self.strings, dtype=object).take(string_ids)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class CompactTocTree:
+    """
+    Hold a walked Table of Contents in parallel arrays instead of nested NodeData objects.
+    Each node is one index into the arrays: parent index (-1 for root nodes), depth, text id, url id, node id,
+    whether it was expanded (-1 if not attempted), and its timestamp.
+    Text, urls, and node ids are interned in StringPool's, and there are no per-node dicts,
+    so large libraries are cheap to hold and convert to a DataFrame without per-node Python objects.
+
+    Example:
+        >>> tree = await CompactTocTree.from_node_records(walk.iter_nodes(root_selector))
+        >>> df = tree.to_dataframe()
+    """
+
+    def __init__(self):
+        self.parent_index = array('q')
+        self.depth = array('h')
+        self.text_id = array('q')
+        self.url_id = array('q')
+        self.node_id = array('q')
+        self.expanded = array('b')
+        self.timestamp = array('d')
+        self.texts = StringPool()
+        self.urls = StringPool()
+        self.node_ids = StringPool()
+
+    def __len__(self) -> int:
+        return len(self.depth)
+
+    def append(self,
+               text: str,
+               url: Optional[str],
+               node_id: str,
+               depth: int,
+               parent_index: int = -1,
+               expanded: Optional[bool] = None,
+               timestamp: float = None
+              ) -> int:
+        """
+        Add a node to the tree and return its index.
+        """
+        self.parent_index.append(parent_index)
+        self.depth.append(depth)
+        self.text_id.append(self.texts.intern(text))
+        self.url_id.append(self.urls.intern(url))
+        self.node_id.append(self.node_ids.intern(node_id))
+        self.expanded.append(-1 if expanded is None else int(expanded))
+        self.timestamp.append(timestamp if timestamp is not None else datetime.now().timestamp())
+        return len(self.depth) - 1
+
+    @classmethod
+    def from_node_data(cls, results: list[NodeData]) -> 'CompactTocTree':
+        """
+        Build a tree from NodeData objects, e.g. from WalkMunicodeToc.nested_menu.
+        Nodes are added in the same pre-order they were walked in.
+        """
+        tree = cls()
+        stack: list[tuple[NodeData, int]] = [(node_data, -1) for node_data in reversed(results)]
+        while stack:
+            node_data, parent_index = stack.pop()
+            timestamp = node_data.metadata.get('timestamp')
+            index = tree.append(
+                node_data.text,
+                node_data.url,
+                node_data.node_id,
+                node_data.depth,
+                parent_index=parent_index,
+                expanded=node_data.metadata.get('expanded'),
+                timestamp=datetime.fromisoformat(timestamp).timestamp() if timestamp else None
+            )
+            stack.extend((child, index) for child in reversed(node_data.children))
+        return tree
+
+    @classmethod
+    async def from_node_records(cls, records: AsyncIterator[dict]) -> 'CompactTocTree':
+        """
+        Build a tree from flattened node records, e.g. from WalkMunicodeToc.iter_nodes.
+        Parent ids are resolved to parent indexes as the records arrive.
+        """
+        tree = cls()
+        index_by_node_id: dict[str, int] = {}
+        async for record in records:
+            metadata = json.loads(record['metadata']) if record['metadata'] else {}
+            timestamp = metadata.get('timestamp')
+            index_by_node_id[record['node_id']] = tree.append(
+                record['text'],
+                record['url'],
+                record['node_id'],
+                record['depth'],
+                parent_index=index_by_node_id.get(record['parent_id'], -1),
+                expanded=metadata.get('expanded'),
+                timestamp=datetime.fromisoformat(timestamp).timestamp() if timestamp else None
+            )
+        return tree
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Convert the tree to a DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        Every column is built from the arrays with vectorized operations.
+        """
+        parent_index = np.frombuffer(self.parent_index, dtype=np.int64)
+        node_id_ids = np.frombuffer(self.node_id, dtype=np.int64)
+        expanded = pd.Series(np.frombuffer(self.expanded, dtype=np.int8))
+
+        # Parent ids are the node ids at the parent indexes. Root nodes get None (string id 0).
+        parent_id_ids = np.where(parent_index >= 0, node_id_ids.take(np.maximum(parent_index, 0)), 0)
+
+        # Rebuild the metadata JSON the walkers write: {"path": "", "timestamp": "...", ["expanded": ...]}
+        timestamps = pd.Series(np.frombuffer(self.timestamp, dtype=np.float64))
+        local_timezone = datetime.now().astimezone().tzinfo
+        iso_timestamps = (
+            pd.to_datetime(timestamps, unit='s', utc=True)
+              .dt.tz_convert(local_timezone)
+              .dt.tz_localize(None)
+              .dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+        )
+        expanded_json = expanded.map({-1: '', 0: ', "expanded": false', 1: ', "expanded": true'})
+        metadata = '{"path": "", "timestamp": "' + iso_timestamps + '"' + expanded_json + '}'
+
+        columns = {
+            'text': self.texts.take(np.frombuffer(self.text_id, dtype=np.int64)),
+            'parent_id': self.node_ids.take(parent_id_ids),
+            'metadata': metadata.to_numpy(),
+            'url': self.urls.take(np.frombuffer(self.url_id, dtype=np.int64)),
+            'node_id': self.node_ids.take(node_id_ids),
+            'depth': np.frombuffer(self.depth, dtype=np.int16),
+        }
+        return pd.DataFrame(columns, columns=FLAT_NODE_COLUMNS)
@@ -1,83 +1,152 @@
 /**
- * Expands and gathers hierarchical data from a webpage's DOM structure.
+ * Expands and gathers hierarchical data from Municode's Table of Contents in a single evaluate call.
  *
- * This asynchronous function identifies root nodes based on anchor elements,
- * expands nested elements by clicking buttons, and recursively collects
- * text content and child data. It's designed to work with a specific DOM
- * structure where expandable elements are indicated by buttons.
+ * This asynchronous function mirrors WalkMunicodeToc._traverse_node, but runs the whole
+ * expand-and-collect recursion inside the page. Root nodes are the anchors matching rootSelector
+ * whose parent has a 'genToc_*' id and a button. Each node is expanded by clicking its button,
+ * then its children are collected from the 'children_of_*' list that the button controls.
  *
- * @param {NodeList|Array} anchors - A collection of anchor elements to process.
+ * @param {Object} args - The arguments passed in from Playwright's page.evaluate.
+ * @param {string} args.rootSelector - CSS selector for the root anchors.
+ * @param {number} args.maxDepth - Maximum depth to traverse. Nodes deeper than this are skipped.
+ * @param {number} args.maxWaitTime - Maximum time in milliseconds to wait for a node's children to load.
  * @returns {Promise<Array>} A promise that resolves to an array of objects,
  *                           each representing a root node and its nested data.
  *
  * @example
- * // Assuming 'document.querySelectorAll("a")' returns the relevant anchors
- * const anchors = document.querySelectorAll("a");
- * const hierarchicalData = await expandAndGatherData(anchors);
+ * // From Python, via Playwright
+ * results = await page.evaluate(js, {"rootSelector": 'a[href*="?nodeId="]', "maxDepth": 100, ...})
  */
-async (anchors) => {
-    // Define the recursive function to gather data
-    async function expandAndGather(node) {
-        const data = {
-            text: node.textContent.trim(),
-            children: [],
-        };
-        const childRegex = new RegExp('^children_of_.*')
-        const collapseRegex = new RegExp('^Collapse')
-    
-        const button = node.parentElement.querySelector('button');  // Adjusted to look within the node itself
-        // If the buttons exist and there isn't the text 'Collapse' in them...
-        if (button && !collapseRegex.test(button.textContent.trim())) { 
-                await button.click();
-                await new Promise(resolve => setTimeout(resolve, 1000));
-            } else {
-                // Debug to check if the button is disabled or not found
-                console.log('Button not found or disabled for node:', node);
-            }
+async ({rootSelector, maxDepth, maxWaitTime}) => {
+    const genTocRegex = new RegExp('^genToc.*');  // Regex of top level nodes
+    const childRegex = new RegExp('^children_of_.*');
+    const collapseRegex = new RegExp('^Collapse');
 
-        // Adjusted to collect children directly from node.
-        const ul = node.parentElement.querySelector('ul');
-        console.log('ul:', ul);
-        if (ul && childRegex.test(ul.id)) {
-            const childNodes = Array.from(ul.children);
-            const count = childNodes.length;
+    const visited = new Set();  // Keep track of visited node ids, like TraversalState.visited_nodes
+    let fallbackCount = 0;
 
-            if (count > 0) { // NOTE Because this JS is evaluated via API, this doesn't actually work.
-                console.log('Child nodes found:', count)
-            } else {
-                console.log('No child nodes found for node:', node)
-            };
+    const makeNodeId = (node) => {
+        const nodeId = node.parentElement ? node.parentElement.id : null;
+        return nodeId ? String(nodeId) : `node_${fallbackCount++}`;
+    };
 
-            for (const child of childNodes) {
-                const childData = await expandAndGather(child);
-                const flatResults = results.flat()
-                if (childData) {
-                    data.children.push(childData);
-                }
+    const getButton = (node) => node.parentElement.querySelector('button');
+
+    const shouldExpandNode = (node) => {
+        const button = getButton(node);
+        if (!button) {
+            return false;
+        }
+        const buttonText = button.textContent.trim();
+        return Boolean(buttonText) && !collapseRegex.test(buttonText);
+    };
+
+    const verifyExpansion = (node) => {
+        const ul = node.parentElement.querySelector('ul');
+        return Boolean(ul && ul.children.length > 0);
+    };
+
+    // Click the node's button, then resolve the moment its sub-list gets children via a MutationObserver.
+    // Resolves with the current state of the sub-list if maxWaitTime runs out first.
+    const clickAndWaitForChildren = (node) => new Promise(resolve => {
+        let timer = null;
+        const observer = new MutationObserver(() => {
+            if (verifyExpansion(node)) {
+                finish(true);
             }
+        });
+        const finish = (result) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(result);
+        };
+        timer = setTimeout(() => finish(verifyExpansion(node)), maxWaitTime);
+        observer.observe(node.parentElement, {childList: true, subtree: true});
+        getButton(node).click();
+        if (verifyExpansion(node)) {
+            finish(true);
         }
-        return data;
-    }
+    });
 
-    const genTocRegex = new RegExp('^genToc_.*');  // Regex of top level nodes
-    const rootNodes = [];  // Keep track of roots
+    // Returns whether the node was expanded and how long the expansion took in milliseconds.
+    const expandNode = async (node) => {
+        const button = getButton(node);
+        if (!button) {
+            return {expanded: true, elapsed: null};  // No button means no expansion needed
+        }
+        if (collapseRegex.test(button.textContent.trim())) {
+            return {expanded: true, elapsed: null};  // Already expanded
+        }
+        const start = performance.now();
+        const expanded = await clickAndWaitForChildren(node);
+        return {expanded: expanded, elapsed: performance.now() - start};
+    };
 
-    // Find root nodes - only those with parent IDs matching 'genToc_*'
-    for (const anchor of anchors) {
-        if (genTocRegex.test(anchor.parentElement.id)) {
-            // Look for a button within the same parent element
-            const button = anchor.parentElement.querySelector('button');
-            if (button) {
-                rootNodes.push(anchor);  // Store the anchor object
+    // Return the direct child anchors of the 'children_of_*' list controlled by the node's button.
+    const getChildNodes = (node) => {
+        const button = getButton(node);
+        if (!button) {
+            return [];
+        }
+        const ariaControls = button.getAttribute('aria-controls');
+        if (!ariaControls || !childRegex.test(ariaControls) || !document.getElementById(ariaControls)) {
+            return [];
+        }
+        const ul = node.parentElement.querySelector(':scope > ul');
+        return ul ? Array.from(ul.querySelectorAll(':scope > li > a')) : [];
+    };
+
+    const expandAndGather = async (node, depth) => {
+        const nodeId = makeNodeId(node);
+        if (visited.has(nodeId)) {
+            return null;
+        }
+        visited.add(nodeId);
+        if (depth > maxDepth) {
+            return null;
+        }
+
+        const href = node.getAttribute('href');
+        const data = {
+            text: (node.textContent || '').trim(),
+            url: href ? String(href) : null,
+            node_id: nodeId,
+            depth: depth,
+            timestamp: Date.now(),
+            expanded: null,
+            expansion_ms: null,
+            children: [],
+        };
+
+        if (shouldExpandNode(node)) {
+            const expansion = await expandNode(node);
+            data.expanded = expansion.expanded;
+            data.expansion_ms = expansion.elapsed;
+            if (data.expanded) {
+                for (const child of getChildNodes(node)) {
+                    const childData = await expandAndGather(child, depth + 1);
+                    if (childData) {
+                        data.children.push(childData);
+                    }
+                }
             }
         }
-    }
+        return data;
+    };
+
+    // Find root nodes - only those with parent IDs matching 'genToc*' and a button.
+    const rootNodes = Array.from(document.querySelectorAll(rootSelector)).filter(anchor => {
+        const parent = anchor.parentElement;
+        return parent && genTocRegex.test(parent.id) && parent.querySelector('button') !== null;
+    });
 
     // Start gathering from the root nodes
     const results = [];
     for (const rootNode of rootNodes) {
-        const nodeData = await expandAndGather(rootNode);
-        results.push(nodeData);
+        const nodeData = await expandAndGather(rootNode, 0);
+        if (nodeData) {
+            results.push(nodeData);
+        }
     }
-    return flatResults;
+    return results;
 }
@@ -0,0 +1,84 @@
+import json
+import os
+from typing import Any, Iterable, Iterator
+
+
+import pandas as pd
+
+
+# Columns of a flattened node record. Children are linked to their parents by parent_id.
+FLAT_NODE_COLUMNS = ['text', 'parent_id', 'metadata', 'url', 'node_id', 'depth']
+
+
+def iter_node_records(results: Iterable[Any]) -> Iterator[dict]:
+    """
+    Flatten NodeData trees, e.g. from WalkMunicodeToc.nested_menu, into node records in pre-order.
+    Each record has the keys in FLAT_NODE_COLUMNS, with metadata left as a dictionary.
+
+    Args:
+        results: Root NodeData objects.
+
+    Yields:
+        dict: A node record.
+    """
+    stack: list[tuple[Any, str]] = [(node_data, None) for node_data in reversed(list(results))]
+    while stack:
+        node_data, parent_id = stack.pop()
+        yield {
+            'text': node_data.text,
+            'parent_id': parent_id,
+            'metadata': node_data.metadata,
+            'url': node_data.url,
+            'node_id': node_data.node_id,
+            'depth': node_data.depth,
+        }
+        stack.extend((child, node_data.node_id) for child in reversed(node_data.children))
+
+
+def save_node_records_to_jsonl(records: Iterable[dict], filepath: str) -> int:
+    """
+    Write node records to a JSON Lines file, one node per line, replacing the file atomically.
+    Metadata is written as a JSON object, so it can be read back without any string parsing.
+
+    Returns:
+        int: The number of records written.
+    """
+    count = 0
+    temp_path = f"{filepath}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        for record in records:
+            metadata = record['metadata']
+            if isinstance(metadata, str): # e.g. from WalkMunicodeToc.iter_nodes
+                metadata = json.loads(metadata) if metadata else {}
+            file.write(json.dumps({**record, 'metadata': metadata}, ensure_ascii=False))
+            file.write('\n')
+            count += 1
+    os.replace(temp_path, filepath)
+    return count
+
+
+def load_node_records_from_jsonl(filepath: str) -> pd.DataFrame:
+    """
+    Read a JSON Lines file of node records into a DataFrame with the columns in FLAT_NODE_COLUMNS.
+    Metadata is turned back into a JSON string, as in the node record CSVs.
+    The whole file is parsed in one json.loads call, which is much faster than one call per line.
+    """
+    with open(filepath, 'r', encoding='utf-8') as file:
+        records: list[dict] = json.loads('[' + ','.join(line for line in file if line.strip()) + ']')
+    encode = json.JSONEncoder().encode # What json.dumps uses with its default arguments.
+    columns = {column: [record.get(column) for record in records] for column in FLAT_NODE_COLUMNS}
+    columns['metadata'] = [encode(metadata or {}) for metadata in columns['metadata']]
+    return pd.DataFrame(columns, columns=FLAT_NODE_COLUMNS)
+
+
+def make_node_records_dataframe(records: Iterable[dict]) -> pd.DataFrame:
+    """
+    Make a DataFrame with the columns in FLAT_NODE_COLUMNS from node records, with metadata as JSON strings.
+    """
+    return pd.DataFrame.from_records(
+        [
+            {**record, 'metadata': record['metadata'] if isinstance(record['metadata'], str) else json.dumps(record['metadata'])}
+            for record in records
+        ],
+        columns=FLAT_NODE_COLUMNS
+    )
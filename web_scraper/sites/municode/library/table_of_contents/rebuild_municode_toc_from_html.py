@@ -0,0 +1,210 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import re
+import time
+from typing import Iterator, Optional
+
+
+import lxml.html
+import pandas as pd
+
+
+from utils.shared.sanitize_filename import sanitize_filename
+from .node_records_jsonl import save_node_records_to_jsonl
+from .walk_municode_toc import WalkMunicodeToc
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+# Top-level ToC nodes: 'genToc*' list items that aren't inside another one, with a nodeId link and a button.
+ROOT_NODES_XPATH = (
+    "//li[starts-with(@id, 'genToc')][not(ancestor::li[starts-with(@id, 'genToc')])]"
+    "[a[contains(@href, '?nodeId=')]][.//button]"
+)
+CHILD_NODES_XPATH = "./ul/li[a]" # A node's children, in the sub-list rendered when it was expanded.
+PAGE_SUFFIX_PATTERN = re.compile(r'_page(\d+)$') # Suffix of the extra pages scrape_municode_toc_menu saves.
+
+
+def iter_toc_records_from_html(html: str, source: str = "") -> Iterator[dict]:
+    """
+    Rebuild the flattened node records of a Municode Table of Contents from expanded-body HTML,
+    e.g. the HTML scrape_municode_toc_menu saves after a walk.
+    Nodes are yielded in the same pre-order, and with the same visited and depth rules, as WalkMunicodeToc.
+
+    Args:
+        html (str): The saved HTML.
+        source (str): Name of the HTML file, stored in each record's metadata.
+
+    Yields:
+        dict: A node record with the keys in FLAT_NODE_COLUMNS.
+    """
+    tree = lxml.html.fromstring(html)
+    visited: set[str] = set()
+
+    # Each stack entry is (li, depth, parent_id). Pushed in reverse so nodes pop in document order.
+    stack: list[tuple[lxml.html.HtmlElement, int, Optional[str]]] = [
+        (li, 0, None) for li in reversed(tree.xpath(ROOT_NODES_XPATH))
+    ]
+    fallback_count = 0
+    while stack:
+        li, depth, parent_id = stack.pop()
+        node_id = li.get('id')
+        if not node_id:
+            node_id = f"node_{fallback_count}"
+            fallback_count += 1
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        if depth > WalkMunicodeToc.MAX_DEPTH:
+            continue
+
+        anchor = li.find('a')
+        child_lis = li.xpath(CHILD_NODES_XPATH)
+        metadata = {'path': '', 'source': source}
+        if li.find('.//button') is not None:
+            metadata['expanded'] = bool(child_lis)
+
+        yield {
+            'text': (anchor.text_content() or '').strip(),
+            'parent_id': parent_id,
+            'metadata': json.dumps(metadata),
+            'url': anchor.get('href') or None,
+            'node_id': node_id,
+            'depth': depth,
+        }
+        stack.extend((child_li, depth + 1, node_id) for child_li in reversed(child_lis))
+
+
+def group_html_files_by_library(html_paths: list[str], libraries: pd.DataFrame = None) -> dict[str, list[str]]:
+    """
+    Group saved HTML files by the traversal results file they rebuild.
+    scrape_municode_toc_menu names each file after its page's URL, with '_page<i>' for a library's extra pages,
+    so files are matched to libraries by URL, and rebuild the library's '<place_name>_<gnis>_menu_traversal_results.jsonl'.
+    A file that doesn't match a library rebuilds '<html file name>_menu_traversal_results.jsonl' instead.
+
+    Args:
+        html_paths (list[str]): Paths of saved expanded-body HTML files.
+        libraries (pd.DataFrame, optional): Rows with gnis, place_name, and url columns, e.g. the input URLs.
+
+    Returns:
+        dict[str, list[str]]: Each traversal results file name, and its HTML files, main page first.
+    """
+    libraries_by_url = {}
+    if libraries is not None:
+        libraries_by_url = {sanitize_filename(row.url): row for row in libraries.itertuples()}
+
+    groups: dict[str, list[tuple[int, str]]] = {}
+    for html_path in html_paths:
+        stem = os.path.splitext(os.path.basename(html_path))[0]
+        match = PAGE_SUFFIX_PATTERN.search(stem)
+        page = int(match.group(1)) if match else 0
+        row = libraries_by_url.get(stem[:match.start()] if match else stem)
+        if row is None:
+            logger.warning(f"No library matches '{os.path.basename(html_path)}'. Naming its output after the file...")
+            filename = f"{stem}_menu_traversal_results.jsonl"
+        else:
+            filename = WalkMunicodeToc._make_filename(row, "menu_traversal_results.jsonl")
+        groups.setdefault(filename, []).append((page, html_path))
+    return {filename: [path for _, path in sorted(pages)] for filename, pages in groups.items()}
+
+
+def _iter_toc_records_from_html_files(html_paths: list[str]) -> Iterator[dict]:
+    """
+    Rebuild the node records of one library from its HTML files, main page first.
+    Each extra page only has its own share of the nodes expanded, so nodes already yielded from an earlier page are skipped.
+    """
+    yielded: set[str] = set()
+    for html_path in html_paths:
+        with open(html_path, 'r', encoding='utf-8') as file:
+            html = file.read()
+        for record in iter_toc_records_from_html(html, source=os.path.basename(html_path)):
+            if record['node_id'] not in yielded:
+                yielded.add(record['node_id'])
+                yield record
+
+
+def rebuild_traversal_results_from_html_files(html_paths: list[str], output_path: str) -> dict:
+    """
+    Rebuild a library's traversal results from its saved HTML files and write them to output_path as JSON Lines.
+
+    Returns:
+        dict: The output file's name, number of HTML files, output path, node count, seconds taken, and error if there was one.
+    """
+    start = time.perf_counter()
+    try:
+        node_count = save_node_records_to_jsonl(_iter_toc_records_from_html_files(html_paths), output_path)
+        error = None
+    except Exception as e:
+        node_count = 0
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'file': os.path.basename(output_path),
+        'html_files': len(html_paths),
+        'output_path': output_path,
+        'node_count': node_count,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+    }
+
+
+def rebuild_traversal_results_from_html_folder(html_folder: str,
+                                               libraries: pd.DataFrame = None,
+                                               output_folder: str = None,
+                                               max_workers: int = None,
+                                               chunksize: int = 8
+                                               ) -> pd.DataFrame:
+    """
+    Rebuild the traversal results of every library with saved HTML files in a folder, in a process pool.
+    This doesn't need a browser or Municode, so traversal results can be regenerated after a schema change.
+    With libraries, each output has the same name as the library's own traversal results, so it can replace them.
+
+    Args:
+        html_folder (str): Folder of saved expanded-body HTML files.
+        libraries (pd.DataFrame, optional): Rows with gnis, place_name, and url columns, to name the outputs after.
+            See group_html_files_by_library.
+        output_folder (str, optional): Where to write the traversal results. Defaults to html_folder.
+        max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunksize (int): Number of libraries to send to a worker at a time. Defaults to 8.
+
+    Returns:
+        pd.DataFrame: One row per traversal results file, with its number of HTML files, output path,
+            node count, seconds taken, and error.
+
+    Example:
+        >>> summary_df = rebuild_traversal_results_from_html_folder(
+        >>>     os.path.join(OUTPUT_FOLDER, "scrape_municode_toc_menu"), libraries=input_urls_df, output_folder=OUTPUT_FOLDER
+        >>> )
+    """
+    output_folder = output_folder or html_folder
+    os.makedirs(output_folder, exist_ok=True)
+    html_paths = [
+        os.path.join(html_folder, file) for file in sorted(os.listdir(html_folder)) if file.endswith(".html")
+    ]
+    groups = group_html_files_by_library(html_paths, libraries)
+    logger.info(f"Rebuilding the traversal results of {len(groups)} libraries from {len(html_paths)} HTML files in '{html_folder}'...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        summaries = list(executor.map(
+            rebuild_traversal_results_from_html_files,
+            list(groups.values()),
+            [os.path.join(output_folder, filename) for filename in groups],
+            chunksize=chunksize
+        ))
+    summary_df = pd.DataFrame(
+        summaries, columns=['file', 'html_files', 'output_path', 'node_count', 'seconds', 'error']
+    )
+
+    errors = summary_df['error'].notna().sum()
+    logger.info(f"""
+    Rebuilt traversal results from HTML:
+    - Libraries: {len(summary_df):,}
+    - HTML files: {summary_df['html_files'].sum():,}
+    - Nodes: {summary_df['node_count'].sum():,}
+    - Errors: {errors:,}
+    - Duration: {time.perf_counter() - start:.2f} seconds
+    """, f=True)
+    for row in summary_df[summary_df['error'].notna()].itertuples():
+        logger.error(f"Error rebuilding {row.file} from HTML: {row.error}")
+    return summary_df
@@ -1,16 +1,24 @@
 import asyncio
 from dataclasses import dataclass, field
-from typing import Optional, Any
+import json
+import os
+from typing import AsyncIterator, Optional, Any
 from playwright.async_api import Page, ElementHandle
 from datetime import datetime
 import re
+import statistics
+import time
 from typing import NamedTuple
 
 
 import pandas as pd
 
+from utils.shared.buffered_csv_writer import csv_writer
 from utils.shared.sanitize_filename import sanitize_filename
-from utils.shared.save_dataclass_to_csv_via_pandas import save_dataclass_to_csv_via_pandas
+from .node_records_jsonl import (
+    FLAT_NODE_COLUMNS, iter_node_records, save_node_records_to_jsonl, make_node_records_dataframe
+)
+from config.config import OUTPUT_FOLDER
 from logger.logger import Logger
 logger = Logger(logger_name=__name__)
 
@@ -22,11 +30,46 @@ class TraversalState:
     """
     visited_nodes: set[str] = field(default_factory=set)
     expanded_nodes: set[str] = field(default_factory=set)
+    completed_nodes: set[str] = field(default_factory=set) # Nodes whose whole subtree has been walked.
+    yielded_nodes: set[str] = field(default_factory=set) # Nodes whose records have been handed to a sink.
     depth_map: dict[str, int] = field(default_factory=dict)
     traversal_path: list[str] = field(default_factory=list)
     errors: list[dict[str, Any]] = field(default_factory=list)
+    expansion_times: list[float] = field(default_factory=list) # milliseconds per expansion
     start_time: float = field(default_factory=lambda: datetime.now().timestamp())
 
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the state to a JSON-serializable dictionary for checkpointing.
+        """
+        return {
+            'visited_nodes': sorted(self.visited_nodes),
+            'expanded_nodes': sorted(self.expanded_nodes),
+            'completed_nodes': sorted(self.completed_nodes),
+            'yielded_nodes': sorted(self.yielded_nodes),
+            'depth_map': self.depth_map,
+            'traversal_path': self.traversal_path,
+            'errors': self.errors,
+            'start_time': self.start_time,
+        }
+
+    @classmethod
+    def from_dict(cls, state_dict: dict[str, Any]) -> 'TraversalState':
+        """
+        Rebuild a state from a dictionary made by to_dict.
+        """
+        return cls(
+            visited_nodes=set(state_dict['visited_nodes']),
+            expanded_nodes=set(state_dict['expanded_nodes']),
+            completed_nodes=set(state_dict['completed_nodes']),
+            # NOTE Older checkpoints didn't track yielded nodes, but every node they visited was yielded.
+            yielded_nodes=set(state_dict.get('yielded_nodes', state_dict['visited_nodes'])),
+            depth_map=state_dict['depth_map'],
+            traversal_path=state_dict['traversal_path'],
+            errors=state_dict['errors'],
+            start_time=state_dict['start_time'],
+        )
+
 
 @dataclass
 class NodeData:
@@ -41,6 +84,48 @@ class NodeData:
     depth: int = 0
 
 
+class NodeRecordCsvSink:
+    """
+    Append flattened node records to a CSV file through the shared csv_writer,
+    which writes them in batches, and writes whatever is left on exit, SIGINT, or SIGTERM.
+    The file is created with a header when the sink is made, so a crash mid-walk
+    still leaves every flushed record on disk.
+
+    If resume is True and the file already exists, records are appended to it instead.
+
+    Example:
+        >>> sink = NodeRecordCsvSink("nodes.csv")
+        >>> async for record in walk.iter_nodes(root_selector):
+        >>>     sink.append(record)
+        >>> sink.close()
+    """
+
+    def __init__(self, filepath: str, resume: bool = False):
+        self.filepath = filepath
+        self.count = 0
+        if resume and os.path.exists(self.filepath):
+            return
+        csv_writer.rewrite(self.filepath, [], fieldnames=FLAT_NODE_COLUMNS)
+
+    def append(self, record: dict) -> None:
+        csv_writer.append(self.filepath, [record[column] for column in FLAT_NODE_COLUMNS], header=FLAT_NODE_COLUMNS)
+        self.count += 1
+
+    def flush(self) -> None:
+        """
+        Write every appended record to disk.
+
+        Raises:
+            OSError: If some of the records couldn't be written, e.g. so a checkpoint isn't saved without them.
+        """
+        csv_writer.flush(self.filepath)
+        if csv_writer.buffered_rows(self.filepath):
+            raise OSError(f"Could not write every node record to '{self.filepath}'")
+
+    def close(self) -> None:
+        self.flush()
+
+
 class WalkMunicodeToc:
     """
     Traverse nested menu structures using Playwright.
@@ -76,6 +161,10 @@ class WalkMunicodeToc:
     MAX_WAIT_TIME = 5000  # milliseconds (5 Seconds)
     RETRY_INTERVAL = 100  # milliseconds (1/10 of a Second)
     MAX_RETRIES = MAX_WAIT_TIME // RETRY_INTERVAL # 5000 // 100 = 50 retries
+    MAX_EXPANSION_ATTEMPTS = 3 # Clicks to try when waiting on the MutationObserver.
+    EXPANSION_MODES = ("observer", "polling")
+    MAX_IN_FLIGHT_EXPANSIONS = 10 # Expansions to run at once per page in nested_menu_breadth_first.
+    CHECKPOINT_INTERVAL = 100 # Node records between streamed_menu checkpoints.
     
     # Regex patterns
     PATTERN_GEN_TOC = re.compile(r'^genToc_.*')
@@ -83,19 +172,97 @@ class WalkMunicodeToc:
     PATTERN_COLLAPSE = re.compile(r'^Collapse')
     PATTERN_X_PATH_BUTTON = 'xpath=../button'
 
+    # In-page JS for nested_menu_in_page
+    EXPAND_AND_GATHER_JS_PATH = os.path.join(os.path.dirname(__file__), "expandAndGather.js")
+
     # JS selectors
     NODE_PARENT_ID_BUTTON_SELECTOR = """
     (node) => {
         return node.parentElement.querySelector('button');
         }
     """
+    # NOTE Clicks the node's button in-page, then resolves the moment the node's sub-list gets children,
+    # or with the current state of the sub-list once the timeout runs out.
+    CLICK_AND_WAIT_FOR_CHILDREN = """
+    (node, timeout) => {
+        const parent = node.parentElement;
+        const hasChildren = () => {
+            const ul = parent.querySelector('ul');
+            return Boolean(ul && ul.children.length > 0);
+        };
+        return new Promise(resolve => {
+            let timer = null;
+            const observer = new MutationObserver(() => {
+                if (hasChildren()) {
+                    finish(true);
+                }
+            });
+            const finish = (result) => {
+                observer.disconnect();
+                clearTimeout(timer);
+                resolve(result);
+            };
+            timer = setTimeout(() => finish(hasChildren()), timeout);
+            observer.observe(parent, {childList: true, subtree: true});
+            const button = parent.querySelector('button');
+            if (button && !/^Collapse/.test(button.textContent.trim())) {
+                button.click();
+            }
+            if (hasChildren()) {
+                finish(true);
+            }
+        });
+    }
+    """
+    # NOTE Runs CLICK_AND_WAIT_FOR_CHILDREN over a batch of nodes at once and times each one.
+    CLICK_AND_WAIT_FOR_CHILDREN_BATCH = """
+    ({nodes, timeout}) => {
+        const clickAndWait = """ + CLICK_AND_WAIT_FOR_CHILDREN + """;
+        return Promise.all(nodes.map(node => {
+            const start = performance.now();
+            return clickAndWait(node, timeout).then(expanded => ({
+                expanded: expanded,
+                elapsed: performance.now() - start,
+            }));
+        }));
+    }
+    """
+    # NOTE Gets the id, text, url, and whether to expand for a batch of nodes in one round trip.
+    NODE_INFO_BATCH = """
+    (nodes) => nodes.map(node => {
+        const parent = node.parentElement;
+        const button = parent ? parent.querySelector('button') : null;
+        const buttonText = button ? button.textContent.trim() : '';
+        const href = node.getAttribute('href');
+        return {
+            node_id: parent && parent.id ? String(parent.id) : null,
+            text: (node.textContent || '').trim(),
+            url: href ? String(href) : null,
+            should_expand: Boolean(buttonText) && !/^Collapse/.test(buttonText),
+        };
+    })
+    """
 
-    def __init__(self, page: Page, place_name: str, output_folder: str, debug: bool = True):
+    def __init__(self,
+                 page: Page,
+                 place_name: str,
+                 output_folder: str,
+                 debug: bool = True,
+                 expansion_mode: str = "observer",
+                 max_in_flight_expansions: int = MAX_IN_FLIGHT_EXPANSIONS
+                ):
+        if expansion_mode not in self.EXPANSION_MODES:
+            raise ValueError(f"expansion_mode '{expansion_mode}' is not one of {self.EXPANSION_MODES}")
+        if max_in_flight_expansions < 1:
+            raise ValueError(f"max_in_flight_expansions must be at least 1, got {max_in_flight_expansions}")
         self.page = page
         self.debug = debug
         self.place_name = place_name
         self.output_folder = output_folder
+        self.expansion_mode = expansion_mode
+        self.max_in_flight_expansions = max_in_flight_expansions
         self.state = TraversalState()
+        self._resume_nodes: set[str] = set() # Yielded but unfinished nodes from a checkpoint.
 
 
     async def nested_menu(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
@@ -110,34 +277,436 @@ class WalkMunicodeToc:
             row (NamedTuple): A row from the dataframe containing the URL and place name.
             
         Returns:
-            pd.DataFrame of objects from the NodeData dataclass, where each object is a column and each row is a node.
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
         """
-        root_anchors = await self._get_anchors(root_selector)
         try:
-            # Walk the node data if the root node is valid. Otherwise, skip it.
             logger.info(f"Starting menu traversal for {self.place_name}...")
-            results = [ 
-                node_data for anchor in root_anchors 
-                if (await self._is_valid_root_node(anchor))
-                if (node_data := await self._traverse_node(anchor, 0))
-            ]
+            results = await self.walk_roots(root_selector)
             logger.info("Menu traversal completed. Logging and saving...")
 
             # Log the results
             await self._log_traversal_summary()
 
-            # Save the results to a CSV file via pandas.
-            place_name: str = row.place_name
-            place_name = place_name.replace(" ", "_").lower()
-            filename = f"{place_name}_{row.gnis}_menu_traversal_results.csv"
-            df = save_dataclass_to_csv_via_pandas(results, filename=filename, return_df=True)
-            return df
+            # Save the results to a JSON Lines file of node records.
+            return self._save_results(results, row)
 
         except Exception as e:
             logger.error(f"Error during menu traversal: {e}")
             raise e
 
 
+    async def walk_roots(self, root_selector: str) -> list[NodeData]:
+        """
+        Recursively walk every valid root node matching root_selector, without logging or saving the results.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+
+        Returns:
+            list[NodeData]: The walked root nodes, in document order.
+        """
+        root_anchors = await self._get_anchors(root_selector)
+        # Walk the node data if the root node is valid. Otherwise, skip it.
+        return [ 
+            node_data for anchor in root_anchors 
+            if (await self._is_valid_root_node(anchor))
+            if (node_data := await self._traverse_node(anchor, 0))
+        ]
+
+
+    async def nested_menu_in_page(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
+        """
+        Walk nested menu structures inside the page with a single page.evaluate call.
+        Runs the same expand-and-collect recursion as nested_menu via expandAndGather.js,
+        so no Python<->browser round trips are made per node.
+        The saved node records are the same as nested_menu's.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+            row (NamedTuple): A row from the dataframe containing the URL and place name.
+
+        Returns:
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        """
+        with open(self.EXPAND_AND_GATHER_JS_PATH, 'r', encoding='utf-8') as file:
+            expand_and_gather_js = file.read()
+
+        try:
+            logger.info(f"Starting in-page menu traversal for {self.place_name}...")
+            raw_results: list[dict] = await self.page.evaluate(expand_and_gather_js, {
+                "rootSelector": root_selector,
+                "maxDepth": self.MAX_DEPTH,
+                "maxWaitTime": self.MAX_WAIT_TIME,
+            })
+            results = [self._build_dataclass_from_dict(node_dict) for node_dict in raw_results]
+            logger.info("In-page menu traversal completed. Logging and saving...")
+
+            # Log the results
+            await self._log_traversal_summary()
+
+            # Save the results to a JSON Lines file of node records.
+            return self._save_results(results, row)
+
+        except Exception as e:
+            logger.error(f"Error during in-page menu traversal: {e}")
+            raise e
+
+
+    async def nested_menu_breadth_first(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
+        """
+        Walk nested menu structures one level at a time.
+        Every collapsed node at the current depth is clicked in batches of up to max_in_flight_expansions,
+        and their child containers are waited on together before moving down a level.
+        This turns N sequential child fetches per level into roughly one wait per batch.
+        The saved node records are the same as nested_menu's.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+            row (NamedTuple): A row from the dataframe containing the URL and place name.
+
+        Returns:
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        """
+        root_anchors = await self._get_anchors(root_selector)
+        try:
+            logger.info(f"Starting breadth-first menu traversal for {self.place_name}...")
+            results: list[NodeData] = []
+
+            # Each frontier entry is (node, parent NodeData or None for root nodes).
+            frontier: list[tuple[ElementHandle, Optional[NodeData]]] = [
+                (anchor, None) for anchor in root_anchors if (await self._is_valid_root_node(anchor))
+            ]
+            depth = 0
+            while frontier:
+                logger.debug(f"Traversing {len(frontier)} nodes at depth {depth}")
+                frontier = await self._traverse_level(frontier, depth, results)
+                depth += 1
+
+            logger.info("Breadth-first menu traversal completed. Logging and saving...")
+
+            # Log the results
+            await self._log_traversal_summary()
+
+            # Save the results to a JSON Lines file of node records.
+            return self._save_results(results, row)
+
+        except Exception as e:
+            logger.error(f"Error during breadth-first menu traversal: {e}")
+            raise e
+
+
+    async def _traverse_level(self,
+                              frontier: list[tuple[ElementHandle, Optional[NodeData]]],
+                              depth: int,
+                              results: list[NodeData]
+                             ) -> list[tuple[ElementHandle, Optional[NodeData]]]:
+        """
+        Build the NodeData for every node in one level of the menu, expand them in batches,
+        and return the next level's frontier.
+        """
+        node_infos: list[dict] = await self.page.evaluate(self.NODE_INFO_BATCH, [node for node, _ in frontier])
+
+        to_expand: list[tuple[ElementHandle, NodeData]] = []
+        for (node, parent_data), info in zip(frontier, node_infos):
+            node_id = info['node_id'] or f"node_{id(node)}"
+            if self._node_was_visited(node_id, depth) or self._depth_is_over_max_depth(node_id, depth):
+                continue
+
+            node_data = NodeData(
+                text=info['text'],
+                node_id=node_id,
+                depth=depth,
+                url=info['url'],
+                metadata={
+                    'path': '/'.join(self.state.traversal_path),
+                    'timestamp': datetime.now().isoformat()
+                }
+            )
+            if parent_data is None:
+                results.append(node_data)
+            else:
+                parent_data.children.append(node_data)
+
+            if info['should_expand']:
+                to_expand.append((node, node_data))
+
+        next_frontier: list[tuple[ElementHandle, Optional[NodeData]]] = []
+        batch_size = self.max_in_flight_expansions
+        for start in range(0, len(to_expand), batch_size):
+            batch = to_expand[start:start + batch_size]
+            expansions: list[dict] = await self.page.evaluate(self.CLICK_AND_WAIT_FOR_CHILDREN_BATCH, {
+                "nodes": [node for node, _ in batch],
+                "timeout": self.MAX_WAIT_TIME,
+            })
+
+            for (node, node_data), expansion in zip(batch, expansions):
+                expand_success = expansion['expanded']
+                self.state.expansion_times.append(expansion['elapsed'])
+                node_data.metadata['expanded'] = expand_success
+                logger.debug(f"Node {node_data.node_id} expansion {'successful' if expand_success else 'failed'}")
+                if not expand_success:
+                    continue
+
+                self.state.expanded_nodes.add(node_data.node_id)
+                child_container = await self._wait_for_child_container_to_load(node)
+                if child_container:
+                    child_nodes = await self._get_child_nodes(child_container)
+                    logger.debug(f"Found {len(child_nodes)} children for node {node_data.node_id}")
+                    next_frontier.extend((child, node_data) for child in child_nodes)
+
+        return next_frontier
+
+
+    async def streamed_menu(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
+        """
+        Walk nested menu structures iteratively, appending each node to disk as it is discovered.
+        Nodes are written as flattened records with parent ids to '<place_name>_<gnis>_menu_traversal_nodes.csv',
+        in batches by the shared csv_writer, so a crash only loses the current batch.
+
+        The traversal state is checkpointed to '<place_name>_<gnis>_menu_traversal_checkpoint.json'
+        every CHECKPOINT_INTERVAL nodes and when the walk errors.
+        If a checkpoint exists when the walk starts, the walk resumes from it:
+        finished subtrees are skipped, and only unfinished ones are re-expanded.
+        The checkpoint is deleted once the walk completes.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+            row (NamedTuple): A row from the dataframe containing the URL and place name.
+
+        Returns:
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        """
+        filepath = os.path.join(OUTPUT_FOLDER, self._make_filename(row, "menu_traversal_nodes.csv"))
+        checkpoint_path = os.path.join(OUTPUT_FOLDER, self._make_filename(row, "menu_traversal_checkpoint.json"))
+
+        resume = self._load_checkpoint(checkpoint_path)
+        sink = NodeRecordCsvSink(filepath, resume=resume)
+        records_since_checkpoint = 0
+        try:
+            logger.info(f"{'Resuming' if resume else 'Starting'} streamed menu traversal for {self.place_name}...")
+            async for record in self.iter_nodes(root_selector):
+                sink.append(record)
+                self.state.yielded_nodes.add(record['node_id'])
+                records_since_checkpoint += 1
+                if records_since_checkpoint >= self.CHECKPOINT_INTERVAL:
+                    sink.flush()
+                    self._save_checkpoint(checkpoint_path)
+                    records_since_checkpoint = 0
+        except Exception as e:
+            logger.error(f"Error during streamed menu traversal: {e}")
+            sink.flush()
+            self._save_checkpoint(checkpoint_path)
+            logger.info(f"Checkpoint saved to '{checkpoint_path}'")
+            raise e
+        finally:
+            sink.close()
+            logger.info(f"Wrote {sink.count} node records to '{filepath}'")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        # Log the results
+        await self._log_traversal_summary()
+        return pd.read_csv(filepath)
+
+
+    async def compact_menu(self, root_selector: str, row: NamedTuple) -> pd.DataFrame:
+        """
+        Walk nested menu structures iteratively into a CompactTocTree instead of nested NodeData objects.
+        The flattened node records are saved to '<place_name>_<gnis>_menu_traversal_nodes.csv'.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+            row (NamedTuple): A row from the dataframe containing the URL and place name.
+
+        Returns:
+            pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+        """
+        # NOTE Imported here as compact_toc_tree imports from this module.
+        from .compact_toc_tree import CompactTocTree
+
+        try:
+            logger.info(f"Starting compact menu traversal for {self.place_name}...")
+            tree = await CompactTocTree.from_node_records(self.iter_nodes(root_selector))
+            logger.info(f"Compact menu traversal completed with {len(tree)} nodes. Logging and saving...")
+        except Exception as e:
+            logger.error(f"Error during compact menu traversal: {e}")
+            raise e
+
+        # Log the results
+        await self._log_traversal_summary()
+
+        df = tree.to_dataframe()
+        df.to_csv(os.path.join(OUTPUT_FOLDER, self._make_filename(row, "menu_traversal_nodes.csv")), index=False)
+        return df
+
+
+    def _save_checkpoint(self, checkpoint_path: str) -> None:
+        """
+        Atomically write the traversal state to a JSON checkpoint file.
+        NOTE The node records sink must be flushed first, so the checkpoint never claims nodes that aren't on disk.
+        """
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.state.to_dict(), file)
+        os.replace(temp_path, checkpoint_path)
+        logger.debug(f"Checkpointed {len(self.state.visited_nodes)} visited nodes to '{checkpoint_path}'")
+
+
+    def _load_checkpoint(self, checkpoint_path: str) -> bool:
+        """
+        Load the traversal state from a checkpoint file, if there is one.
+        Return True if a checkpoint was loaded, False otherwise.
+        """
+        if not os.path.exists(checkpoint_path):
+            return False
+        with open(checkpoint_path, 'r', encoding='utf-8') as file:
+            self.state = TraversalState.from_dict(json.load(file))
+        # A node can be visited but not yielded if the walk failed between the two, e.g. while expanding it.
+        # Forget those visits, so the node is built and yielded again instead of being lost.
+        self.state.visited_nodes &= self.state.yielded_nodes | self.state.completed_nodes
+        self._resume_nodes = self.state.yielded_nodes - self.state.completed_nodes
+        logger.info(
+            f"Loaded checkpoint '{checkpoint_path}': {len(self.state.visited_nodes)} nodes visited, "
+            f"{len(self._resume_nodes)} unfinished subtrees to resume."
+        )
+        return True
+
+
+    async def iter_nodes(self, root_selector: str) -> AsyncIterator[dict]:
+        """
+        Iteratively walk nested menu structures with an explicit stack, yielding a flattened record for each node.
+        Nodes are yielded in the same order nested_menu visits them. Memory is bounded by the size of the stack,
+        and callers can consume nodes before the walk finishes.
+        When resuming from a checkpoint, completed subtrees are skipped, and nodes that were yielded
+        but not completed are re-expanded without being yielded again.
+
+        Args:
+            root_selector: CSS selector for root menu elements
+
+        Yields:
+            dict: A node record with the keys in FLAT_NODE_COLUMNS.
+        """
+        root_anchors = await self._get_anchors(root_selector)
+        valid_root_anchors = [anchor for anchor in root_anchors if (await self._is_valid_root_node(anchor))]
+
+        # Each stack entry is (node, depth, parent_id). Pushed in reverse so nodes pop in document order.
+        # A None node is a marker that the subtree of the node with id parent_id has been walked.
+        stack: list[tuple[Optional[ElementHandle], int, Optional[str]]] = [
+            (anchor, 0, None) for anchor in reversed(valid_root_anchors)
+        ]
+        while stack:
+            node, depth, parent_id = stack.pop()
+            if node is None:
+                self.state.completed_nodes.add(parent_id)
+                continue
+
+            node_id = 'unknown'
+            try:
+                node_id = await self._make_node_id(node)
+                if node_id in self.state.completed_nodes:
+                    await node.dispose()
+                    continue
+
+                if node_id in self._resume_nodes: # Already yielded before the checkpoint.
+                    self._resume_nodes.discard(node_id)
+                    if self._depth_is_over_max_depth(node_id, depth):
+                        continue
+                    node_data = None
+                else:
+                    node_data = await self._build_dataclass_for_node(node, node_id, depth)
+                    if not node_data:
+                        continue
+
+                child_nodes = []
+                if await self._should_expand_node(node):
+                    expand_success = await self._expand_node(node)
+                    if node_data:
+                        node_data.metadata['expanded'] = expand_success
+                    if expand_success:
+                        child_container = await self._wait_for_child_container_to_load(node)
+                        if child_container:
+                            child_nodes = await self._get_child_nodes(child_container)
+                            logger.debug(f"Found {len(child_nodes)} children for node {node_id}")
+
+            except Exception as e:
+                logger.error(f"Error traversing node {node_id}: {e}")
+                self.state.errors.append({
+                    'node_id': node_id,
+                    'depth': depth,
+                    'error': str(e),
+                    'timestamp': datetime.now().isoformat()
+                })
+                raise e
+
+            stack.append((None, depth, node_id))
+            stack.extend((child, depth + 1, node_id) for child in reversed(child_nodes))
+            await node.dispose() # We don't need the handle after its children are on the stack.
+
+            if node_data:
+                yield {
+                    'text': node_data.text,
+                    'parent_id': parent_id,
+                    'metadata': json.dumps(node_data.metadata),
+                    'url': node_data.url,
+                    'node_id': node_data.node_id,
+                    'depth': node_data.depth,
+                }
+
+
+    def _build_dataclass_from_dict(self, node_dict: dict) -> NodeData:
+        """
+        Recursively build a NodeData object from a node dictionary returned by expandAndGather.js.
+        Also records the node in the traversal state, as _traverse_node would.
+        """
+        node_id = node_dict['node_id']
+        depth = node_dict['depth']
+        self.state.visited_nodes.add(node_id)
+        self.state.depth_map[node_id] = depth
+
+        metadata = {
+            'path': '/'.join(self.state.traversal_path),
+            'timestamp': datetime.fromtimestamp(node_dict['timestamp'] / 1000).isoformat()
+        }
+        if node_dict['expanded'] is not None:
+            metadata['expanded'] = node_dict['expanded']
+            if node_dict['expanded']:
+                self.state.expanded_nodes.add(node_id)
+        if node_dict['expansion_ms'] is not None:
+            self.state.expansion_times.append(node_dict['expansion_ms'])
+
+        return NodeData(
+            text=node_dict['text'],
+            node_id=node_id,
+            depth=depth,
+            url=node_dict['url'],
+            metadata=metadata,
+            children=[self._build_dataclass_from_dict(child) for child in node_dict['children']]
+        )
+
+
+    def _save_results(self, results: list[NodeData], row: NamedTuple) -> pd.DataFrame:
+        """
+        Save the traversal results as flattened node records to '<place_name>_<gnis>_menu_traversal_results.jsonl'
+        and return them as a DataFrame with the columns in FLAT_NODE_COLUMNS.
+        """
+        filepath = os.path.join(OUTPUT_FOLDER, self._make_filename(row, "menu_traversal_results.jsonl"))
+        records = list(iter_node_records(results))
+        save_node_records_to_jsonl(records, filepath)
+        logger.info(f"Saved {len(records)} node records to '{filepath}'")
+        return make_node_records_dataframe(records)
+
+
+    @staticmethod
+    def _make_filename(row: NamedTuple, suffix: str) -> str:
+        """
+        Make a '<place_name>_<gnis>_<suffix>' filename from a row.
+        """
+        place_name: str = row.place_name
+        place_name = place_name.replace(" ", "_").lower()
+        return f"{place_name}_{row.gnis}_{suffix}"
+
+
     async def _get_anchors(self, root_selector: str) -> list[ElementHandle]:
         """
         Retrieve anchor elements using the provided selector or a default pattern.
@@ -292,7 +861,8 @@ class WalkMunicodeToc:
 
     async def _expand_node(self, node: ElementHandle) -> bool:
         """
-        Attempt to expand a menu node
+        Attempt to expand a menu node.
+        How the expansion is waited on depends on self.expansion_mode.
         
         Args:
             node: ElementHandle for the node to expand
@@ -310,6 +880,41 @@ class WalkMunicodeToc:
         if button_text and self.PATTERN_COLLAPSE.match(button_text.strip()):
             return True
 
+        start = time.perf_counter()
+        if self.expansion_mode == "observer":
+            expanded = await self._click_and_wait_for_expansion(node)
+        else:
+            expanded = await self._click_and_poll_for_expansion(node, button)
+        self.state.expansion_times.append((time.perf_counter() - start) * 1000)
+        return expanded
+
+
+    async def _click_and_wait_for_expansion(self, node: ElementHandle) -> bool:
+        """
+        Click a node's button and wait on an in-page MutationObserver for its children to load.
+        Only clicks that didn't register are retried. Once the button reads "Collapse", another attempt
+        wouldn't click it, and would only wait out MAX_WAIT_TIME again.
+        """
+        for attempt in range(self.MAX_EXPANSION_ATTEMPTS):
+            try:
+                if await node.evaluate(self.CLICK_AND_WAIT_FOR_CHILDREN, self.MAX_WAIT_TIME):
+                    node_id = await self._make_node_id(node)
+                    self.state.expanded_nodes.add(node_id)
+                    return True
+                button = await node.query_selector(self.PATTERN_X_PATH_BUTTON)
+                button_text = await button.text_content() if button else None
+                if button_text and self.PATTERN_COLLAPSE.match(button_text.strip()):
+                    logger.debug(f"Node expanded but no children loaded within {self.MAX_WAIT_TIME} ms")
+                    return False
+            except Exception as e:
+                logger.warning(f"Expansion attempt {attempt + 1} failed: {e}")
+        return False
+
+
+    async def _click_and_poll_for_expansion(self, node: ElementHandle, button: ElementHandle) -> bool:
+        """
+        Click a node's button and poll for its children to load every RETRY_INTERVAL milliseconds.
+        """
         retry_count = 0
         while retry_count < self.MAX_RETRIES:
             try:
@@ -478,12 +1083,20 @@ class WalkMunicodeToc:
         Log summary of traversal operation.
         """
         duration = datetime.now().timestamp() - self.state.start_time
+        expansion_times = self.state.expansion_times
+        mean_expansion = statistics.mean(expansion_times) if expansion_times else 0
+        median_expansion = statistics.median(expansion_times) if expansion_times else 0
         logger.info(f"""
                     Traversal Summary:
                     Total nodes visited: {len(self.state.visited_nodes)}
                     Successfully expanded: {len(self.state.expanded_nodes)}
                     Max depth reached: {max(self.state.depth_map.values(), default=0)}
                     Errors encountered: {len(self.state.errors)}
+                    Expansion mode: {self.expansion_mode}
+                    Expansions timed: {len(expansion_times)}
+                    Mean expansion latency: {mean_expansion:.1f} ms
+                    Median expansion latency: {median_expansion:.1f} ms
+                    Max expansion latency: {max(expansion_times, default=0):.1f} ms
                     Duration: {duration:.2f} seconds""", f=True)
 
         if self.state.errors:
@@ -0,0 +1,109 @@
+import asyncio
+from typing import NamedTuple
+
+
+import pandas as pd
+from playwright.async_api import Page
+
+
+from .walk_municode_toc import WalkMunicodeToc, NodeData, TraversalState
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+# NOTE Gets the ids of the valid root nodes in document order, using the same test as _is_valid_root_node.
+ROOT_NODE_IDS = """
+(rootSelector) => Array.from(document.querySelectorAll(rootSelector))
+    .map(anchor => anchor.parentElement)
+    .filter(parent => parent && /^genToc.*/.test(parent.id) && parent.querySelector('button') !== null)
+    .map(parent => String(parent.id))
+"""
+
+
+def _make_partition_selector(root_ids: list[str], root_selector: str) -> str:
+    """
+    Make a selector that matches only the root anchors under the given root node ids.
+    """
+    return ", ".join(f'[id="{root_id}"] > {root_selector}' for root_id in root_ids)
+
+
+def _drop_duplicate_nodes(results: list[NodeData]) -> list[NodeData]:
+    """
+    Drop nodes, and their subtrees, whose node_id was already seen earlier in pre-order.
+    This mirrors how a single walker skips nodes it has already visited.
+    """
+    seen: set[str] = set()
+
+    def _keep(node_data: NodeData) -> bool:
+        if node_data.node_id in seen:
+            return False
+        seen.add(node_data.node_id)
+        node_data.children = [child for child in node_data.children if _keep(child)]
+        return True
+
+    return [node_data for node_data in results if _keep(node_data)]
+
+
+def _merge_states(states: list[TraversalState]) -> TraversalState:
+    """
+    Merge the traversal states of several walkers into one for the traversal summary.
+    """
+    merged = TraversalState(start_time=min(state.start_time for state in states))
+    for state in states:
+        merged.visited_nodes |= state.visited_nodes
+        merged.expanded_nodes |= state.expanded_nodes
+        merged.completed_nodes |= state.completed_nodes
+        merged.depth_map.update(state.depth_map)
+        merged.errors.extend(state.errors)
+        merged.expansion_times.extend(state.expansion_times)
+    return merged
+
+
+async def walk_municode_toc_in_parallel(pages: list[Page],
+                                        root_selector: str,
+                                        row: NamedTuple,
+                                        place_name: str,
+                                        output_folder: str,
+                                        **walk_kwargs
+                                        ) -> pd.DataFrame:
+    """
+    Walk disjoint subtrees of a Municode Table of Contents concurrently on several pages of the same library.
+    The root nodes are dealt out round-robin across the pages, each page walks its share with its own WalkMunicodeToc,
+    and the results are merged back into root order with duplicate node ids dropped.
+    The saved node records are the same as WalkMunicodeToc.nested_menu's.
+
+    NOTE: Every page must already be on the library URL. Loading them is the caller's job,
+    as that is where the crawl delay has to be respected.
+
+    Args:
+        pages (list[Page]): Pages that are all on the same library URL.
+        root_selector (str): CSS selector for root menu elements.
+        row (NamedTuple): A row from the dataframe containing the URL and place name.
+        place_name (str): Name of the place, for logging.
+        output_folder (str): Output folder for the walkers.
+        **walk_kwargs: Additional keyword arguments for WalkMunicodeToc.
+
+    Returns:
+        pd.DataFrame of flattened node records, with the columns in FLAT_NODE_COLUMNS.
+    """
+    root_ids: list[str] = await pages[0].evaluate(ROOT_NODE_IDS, root_selector)
+    partitions = [root_ids[i::len(pages)] for i in range(len(pages))]
+    walkers = [WalkMunicodeToc(page, place_name, output_folder, **walk_kwargs) for page in pages]
+    logger.info(f"Walking {len(root_ids)} root nodes for {place_name} across {len(pages)} pages...")
+
+    results_per_page: list[list[NodeData]] = await asyncio.gather(*[
+        walker.walk_roots(_make_partition_selector(partition, root_selector))
+        for walker, partition in zip(walkers, partitions) if partition
+    ])
+
+    # Put the root nodes back in document order, then drop nodes that more than one page walked.
+    node_data_by_root_id = {node_data.node_id: node_data for results in results_per_page for node_data in results}
+    results = _drop_duplicate_nodes([
+        node_data_by_root_id[root_id] for root_id in root_ids if root_id in node_data_by_root_id
+    ])
+    logger.info("Parallel menu traversal completed. Logging and saving...")
+
+    # Log the merged results and save them through the first walker.
+    walkers[0].state = _merge_states([walker.state for walker in walkers])
+    await walkers[0]._log_traversal_summary()
+    return walkers[0]._save_results(results, row)
@@ -0,0 +1,224 @@
+import asyncio
+from dataclasses import dataclass
+import os
+import re
+import time
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+
+import aiohttp
+
+
+from utils.shared.limiters.PolitenessLimiter import PolitenessLimiter
+from .robots_store import RobotsStore, RobotRules, get_url_path
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+# URLs that never need a browser to render: robots.txt, documents, and JSON APIs.
+BROWSER_FREE_URL_PATTERN = re.compile(
+    r'(/robots\.txt$)'
+    r'|(\.(pdf|docx?|xlsx?|csv|txt|json|xml|zip)(\?.*)?$)'
+    r'|(^https?://api\.municode\.com/)',
+    re.IGNORECASE
+)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def can_fetch_without_browser(url: str) -> bool:
+    """
+    Check whether a URL can be fetched with plain HTTP instead of a browser.
+    """
+    return BROWSER_FREE_URL_PATTERN.search(url) is not None
+
+
+@dataclass
+class HttpFetchStats:
+    requests: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+    seconds: float = 0
+
+    def summary(self) -> str:
+        mean_ms = self.seconds / self.requests * 1000 if self.requests else 0
+        return f"""
+        HTTP Fetch Summary:
+        Requests: {self.requests:,}
+        Errors: {self.errors:,}
+        Received: {self.bytes_received / 1024**2:,.2f} MB
+        Mean time per request: {mean_ms:.1f} ms"""
+
+
+class AsyncHttpFetcher:
+    """
+    Fetch pages that don't need a browser over plain HTTP.
+    Each domain gets one shared aiohttp.ClientSession, with keep-alive connections and a DNS cache,
+    and every request respects the domain's robots.txt rules and politeness limiter.
+    Responses are decoded from gzip and deflate, and from brotli if the Brotli package is installed.
+
+    Args:
+        user_agent (str): User agent to send and check robots.txt rules for. Defaults to "*".
+        limit_per_host (int): Maximum open connections per domain. Defaults to 4.
+        ttl_dns_cache (int): Seconds to cache DNS lookups for. Defaults to 300.
+        timeout (float): Total seconds allowed per request. Defaults to 30.
+        site_limiters (dict[str, PolitenessLimiter], optional): Limiters of whole sites, by domain,
+            e.g. {"municode.com": scraper.politeness_limiter}, so a scraper's pages and these requests
+            are spaced out together.
+            Requests to a site's domain or any of its subdomains wait on its limiter, which keeps its own rules.
+            Requests to any other host wait on that host's process-wide limiter, set from its own robots.txt.
+
+    Example:
+        >>> async with AsyncHttpFetcher() as fetcher:
+        >>>     if can_fetch_without_browser(url):
+        >>>         await fetcher.download(url, filepath)
+    """
+    def __init__(self,
+                 user_agent: str = "*",
+                 limit_per_host: int = 4,
+                 ttl_dns_cache: int = 300,
+                 timeout: float = 30,
+                 site_limiters: dict[str, PolitenessLimiter] = None
+                ):
+        self.user_agent = user_agent
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.site_limiters: dict[str, PolitenessLimiter] = site_limiters or {}
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+        self.robot_rules: dict[str, Optional[RobotRules]] = {}
+        self.stats = HttpFetchStats()
+
+    async def __aenter__(self) -> 'AsyncHttpFetcher':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    def _session_for(self, domain: str) -> aiohttp.ClientSession:
+        if domain not in self.sessions:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                keepalive_timeout=30,
+            )
+            headers = {} if self.user_agent == "*" else {'User-Agent': self.user_agent}
+            self.sessions[domain] = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=headers)
+        return self.sessions[domain]
+
+    def _site_limiter_for(self, domain: str) -> Optional[PolitenessLimiter]:
+        """
+        Get the limiter of the site a host belongs to, e.g. municode.com's for api.municode.com, or None if there isn't one.
+        """
+        for site, limiter in self.site_limiters.items():
+            if domain == site or domain.endswith(f".{site}"):
+                return limiter
+        return None
+
+    def _limiter_for(self, domain: str) -> PolitenessLimiter:
+        return self._site_limiter_for(domain) or PolitenessLimiter.for_domain(domain)
+
+    async def _allowed(self, url: str, domain: str) -> bool:
+        """
+        Check a URL against its domain's robots.txt, getting the file through the robots store the first time.
+        """
+        if domain not in self.robot_rules:
+            store = RobotsStore()
+            content = await store.fetch(f"{url.split('://', 1)[0]}://{domain}/robots.txt")
+            self.robot_rules[domain] = store.rules(domain, self.user_agent) if content is not None else None
+            rules = self.robot_rules[domain]
+            # A site's limiter is already set up from the site's own robots.txt.
+            if rules is not None and self._site_limiter_for(domain) is None:
+                PolitenessLimiter.for_domain(domain).set_rules(rules.crawl_delay, rules.request_rate)
+            store.close()
+        rules = self.robot_rules[domain]
+        return rules is not None and rules.can_fetch(get_url_path(url))
+
+    async def request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Make a request once robots.txt and the politeness limiter allow it.
+        The response must be used as an async context manager, so its connection goes back to the pool.
+
+        Raises:
+            PermissionError: If robots.txt disallows the URL.
+        """
+        domain = (urlparse(url).hostname or "").lower()
+        if not url.endswith("/robots.txt") and not await self._allowed(url, domain):
+            raise PermissionError(f"Cannot fetch URL '{url}' as it's disallowed in robots.txt")
+        await self._limiter_for(domain).wait()
+        self.stats.requests += 1
+        return self._session_for(domain).request(method, url, **kwargs)
+
+    async def get_text(self, url: str) -> str:
+        start = time.perf_counter()
+        try:
+            async with await self.request("GET", url) as response:
+                response.raise_for_status()
+                text = await response.text()
+                self.stats.bytes_received += len(text)
+                return text
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    async def get_json(self, url: str) -> Any:
+        start = time.perf_counter()
+        try:
+            async with await self.request("GET", url, headers={'Accept': 'application/json'}) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    async def download(self, url: str, filepath: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+        """
+        Stream a URL to a file in chunks, so large documents are never held in memory.
+        The file is written to a temporary path and renamed when complete.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        start = time.perf_counter()
+        tmp_path = f"{filepath}.tmp"
+        written = 0
+        try:
+            async with await self.request("GET", url) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        file.write(chunk)
+                        written += len(chunk)
+            os.replace(tmp_path, filepath)
+            self.stats.bytes_received += written
+            logger.info(f"Downloaded {written:,} bytes from {url} to {filepath}.")
+            return written
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.stats.errors += 1
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    async def is_alive(self, url: str) -> bool:
+        """
+        Check whether a URL responds with a non-error status, without downloading its body.
+        """
+        try:
+            async with await self.request("HEAD", url, allow_redirects=True) as response:
+                return response.status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"{type(e).__qualname__} while checking {url}: {e}")
+            return False
+
+    async def close(self) -> None:
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+        if self.stats.requests:
+            logger.info(self.stats.summary(), f=True)
@@ -1,7 +1,13 @@
+from functools import lru_cache
 import re
 from urllib.parse import urlparse
 
 
+@lru_cache(maxsize=None)
+def _compile_rule(rule_path: str) -> re.Pattern:
+    return re.compile(rule_path.replace('*', '.*'))
+
+
 def can_fetch(url: str, robot_rules: dict) -> tuple[bool, int]:
     """
     Compare a URL to a robots.txt dictionary and see if we can scrape it.
@@ -12,12 +18,12 @@ def can_fetch(url: str, robot_rules: dict) -> tuple[bool, int]:
 
     # Check if path matches any allow rule
     for allow_path in robot_rules.get('allow', []):
-        if re.match(allow_path.replace('*', '.*'), path):
+        if _compile_rule(allow_path).match(path):
             return True, delay
 
     # Check if path matches any disallow rule
     for disallow_path in robot_rules.get('disallow', []):
-        if re.match(disallow_path.replace('*', '.*'), path):
+        if _compile_rule(disallow_path).match(path):
             return False, delay
 
     # If no rules match, it's allowed by default
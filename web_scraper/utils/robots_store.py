@@ -0,0 +1,281 @@
+import asyncio
+from dataclasses import dataclass
+import os
+import re
+import sqlite3
+import time
+from typing import NamedTuple, Optional
+from urllib.robotparser import RequestRate
+
+
+import aiohttp
+import pandas as pd
+
+
+from config.config import PROJECT_ROOT
+from logger.logger import Logger
+logger = Logger(logger_name=__name__)
+
+
+ROBOTS_DB_PATH = os.path.join(PROJECT_ROOT, "web_scraper", "sites", "robots_txt.sqlite")
+URL_HOST_PATTERN = r'^[A-Za-z][A-Za-z0-9+.-]*://([^/?#:]+)'
+URL_PATH_PATTERN = r'^[A-Za-z][A-Za-z0-9+.-]*://[^/?#]*([^#]*)'
+
+
+def get_url_path(url: str) -> str:
+    """
+    Get the path and query string of a URL, which is what robots.txt rules are matched against.
+    """
+    match = re.match(URL_PATH_PATTERN, url)
+    path = match.group(1) if match else url
+    return path if path.startswith('/') else f"/{path}"
+
+
+class RobotsRecord(NamedTuple):
+    domain: str
+    content: str
+    etag: Optional[str]
+    fetched_at: float
+    status: int
+
+
+@dataclass
+class RobotRules:
+    """
+    One user agent's robots.txt rules, compiled into a character trie for longest-match lookups.
+    As in Google's robots.txt spec, the longest matching rule wins, and Allow wins ties.
+    Literal rules go in the trie. Rules with '*' or '$' are compiled to regexes once, and checked after the trie.
+
+    Example:
+        >>> rules = RobotRules.from_robots_txt(content, user_agent="*")
+        >>> rules.can_fetch("/ca/la/codes/code_of_ordinances?nodeId=CH1")
+        True
+    """
+    trie: dict
+    wildcard_rules: list[tuple[re.Pattern, int, bool]] # (pattern, specificity, allow)
+    crawl_delay: float = 0
+    request_rate: Optional[RequestRate] = None
+
+    _RULE = "" # Trie key for the rule ending at a node. Never a path character, so it can't clash.
+
+    @classmethod
+    def from_robots_txt(cls, content: str, user_agent: str = "*") -> 'RobotRules':
+        """
+        Parse robots.txt content and compile the rules of the group that applies to user_agent.
+        A group naming the user agent is used over the '*' group.
+        """
+        groups: list[tuple[list[str], list[tuple[str, str]]]] = []
+        agents: list[str] = []
+        lines: list[tuple[str, str]] = []
+        for raw_line in content.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = (part.strip() for part in line.split(':', 1))
+            field = field.lower()
+            if field == 'user-agent':
+                if lines: # A user-agent line after rules starts a new group.
+                    groups.append((agents, lines))
+                    agents, lines = [], []
+                agents.append(value.lower())
+            elif agents:
+                lines.append((field, value))
+        if agents:
+            groups.append((agents, lines))
+
+        user_agent = user_agent.lower()
+        group_lines = next(
+            (lines for agents, lines in groups if any(agent != '*' and agent in user_agent for agent in agents)),
+            next((lines for agents, lines in groups if '*' in agents), [])
+        )
+
+        rules = cls(trie={}, wildcard_rules=[])
+        for field, value in group_lines:
+            if field in ('allow', 'disallow') and value:
+                rules.add_rule(value, allow=field == 'allow')
+            elif field == 'crawl-delay':
+                try:
+                    rules.crawl_delay = float(value)
+                except ValueError:
+                    pass
+            elif field == 'request-rate':
+                requests, _, seconds = value.partition('/')
+                if requests.isdigit() and seconds.isdigit():
+                    rules.request_rate = RequestRate(int(requests), int(seconds))
+        return rules
+
+    def add_rule(self, path: str, allow: bool) -> None:
+        if '*' in path or path.endswith('$'):
+            end_anchor = '$' if path.endswith('$') else ''
+            pattern = '.*'.join(re.escape(part) for part in path.rstrip('$').split('*')) + end_anchor
+            self.wildcard_rules.append((re.compile(pattern), len(path), allow))
+            return
+        node = self.trie
+        for char in path:
+            node = node.setdefault(char, {})
+        # Allow wins if the same path is both allowed and disallowed.
+        node[self._RULE] = node.get(self._RULE, False) or allow
+
+    def can_fetch(self, path: str) -> bool:
+        """
+        Check whether a URL path (with its query string) is allowed.
+        """
+        if path == '/robots.txt':
+            return True
+        match_length, allowed = -1, True
+        node = self.trie
+        for length, char in enumerate(path, start=1):
+            node = node.get(char)
+            if node is None:
+                break
+            if self._RULE in node:
+                match_length, allowed = length, node[self._RULE]
+        for pattern, specificity, allow in self.wildcard_rules:
+            if pattern.match(path) and (specificity > match_length or (specificity == match_length and allow)):
+                match_length, allowed = specificity, allow
+        return allowed
+
+
+class RobotsStore:
+    """
+    Persistent store of robots.txt files in SQLite, with each file's fetch time, HTTP status, and ETag.
+    Files older than the TTL are revalidated with a conditional request, and compiled RobotRules
+    are cached in memory per domain and user agent.
+
+    Args:
+        db_path (str): Path to the SQLite database. Defaults to ROBOTS_DB_PATH.
+        ttl (float): Seconds before a stored robots.txt is revalidated. Defaults to one day.
+
+    Example:
+        >>> store = RobotsStore()
+        >>> content = await store.fetch("https://municode.com/robots.txt")
+        >>> allowed_urls = store.filter_allowed(df['url'], user_agent="*")
+    """
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, db_path: str = ROBOTS_DB_PATH, ttl: float = DEFAULT_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._rules_cache: dict[tuple[str, str, float], RobotRules] = {}
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS robots_txt (
+                domain TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                etag TEXT,
+                fetched_at REAL NOT NULL,
+                status INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, domain: str) -> Optional[RobotsRecord]:
+        row = self.conn.execute(
+            "SELECT domain, content, etag, fetched_at, status FROM robots_txt WHERE domain = ?", (domain,)
+        ).fetchone()
+        return RobotsRecord(*row) if row else None
+
+    def put(self, domain: str, content: str, etag: str = None, status: int = 200, fetched_at: float = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO robots_txt (domain, content, etag, fetched_at, status) VALUES (?, ?, ?, ?, ?)",
+            (domain, content, etag, fetched_at or time.time(), status)
+        )
+        self.conn.commit()
+
+    def is_fresh(self, record: RobotsRecord) -> bool:
+        return time.time() - record.fetched_at < self.ttl
+
+    async def fetch(self, robots_url: str) -> Optional[str]:
+        """
+        Get a robots.txt file, from the store if it's within the TTL, otherwise from the server.
+        Stale files are revalidated with If-None-Match, and kept if the server can't be reached.
+
+        Returns:
+            str: The robots.txt content, or None if there's no stored copy and the server couldn't be reached.
+            An empty string means the server has no robots.txt, so everything is allowed.
+        """
+        domain = re.match(URL_HOST_PATTERN, robots_url).group(1)
+        record = self.get(domain)
+        if record and self.is_fresh(record):
+            logger.info(f"Using stored robots.txt for '{domain}'...")
+            return record.content
+
+        headers = {'If-None-Match': record.etag} if record and record.etag else {}
+        try:
+            async with aiohttp.ClientSession() as session:
+                logger.info(f"Getting robots.txt from '{robots_url}'...")
+                async with session.get(robots_url, headers=headers, timeout=10) as response:  # 10 seconds timeout
+                    if response.status == 304 and record:
+                        logger.info(f"robots.txt for '{domain}' is unchanged.")
+                        self.put(domain, record.content, record.etag, record.status)
+                        return record.content
+                    if response.status == 200:
+                        content = await response.text()
+                    elif 400 <= response.status < 500:
+                        content = "" # No robots.txt, so everything is allowed.
+                    else:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+                    self.put(domain, content, response.headers.get('ETag'), response.status)
+                    logger.info(f"Got robots.txt for '{domain}' (HTTP {response.status})")
+                    return content
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"{type(e).__qualname__} while fetching robots.txt from '{robots_url}': {e}")
+            if record:
+                logger.warning(f"Using stale robots.txt for '{domain}' fetched at {time.ctime(record.fetched_at)}")
+                return record.content
+            return None
+
+    def rules(self, domain: str, user_agent: str = "*") -> Optional[RobotRules]:
+        """
+        Get the compiled rules for a domain. If the domain isn't stored, its parent domains are tried,
+        e.g. 'library.municode.com' falls back to 'municode.com'.
+        """
+        labels = domain.split('.')
+        for i in range(len(labels) - 1):
+            record = self.get('.'.join(labels[i:]))
+            if record:
+                key = (record.domain, user_agent, record.fetched_at)
+                if key not in self._rules_cache:
+                    self._rules_cache[key] = RobotRules.from_robots_txt(record.content, user_agent)
+                return self._rules_cache[key]
+        return None
+
+    def allowed_mask(self, urls: pd.Series, user_agent: str = "*", allow_unknown: bool = False) -> pd.Series:
+        """
+        Check a Series of URLs against the stored robots.txt of each of their domains.
+        Hosts and paths are extracted with vectorized string operations, and each unique path is only matched once.
+
+        Args:
+            urls (pd.Series): URLs to check.
+            user_agent (str): User agent to check the rules of. Defaults to "*".
+            allow_unknown (bool): Whether URLs on domains with no stored robots.txt are allowed. Defaults to False.
+
+        Returns:
+            pd.Series: A boolean Series with the same index as urls.
+        """
+        urls = urls.astype(str)
+        hosts = urls.str.extract(URL_HOST_PATTERN, expand=False).str.lower()
+        paths = urls.str.extract(URL_PATH_PATTERN, expand=False).fillna('')
+        paths = paths.where(paths.str.startswith('/'), '/' + paths)
+
+        mask = pd.Series(allow_unknown, index=urls.index, dtype=bool)
+        for host, host_paths in paths.groupby(hosts, sort=False):
+            rules = self.rules(host, user_agent)
+            if rules is None:
+                logger.warning(f"No stored robots.txt for '{host}'. Its URLs are {'allowed' if allow_unknown else 'disallowed'}.")
+                continue
+            codes, unique_paths = pd.factorize(host_paths)
+            unique_allowed = pd.Series([rules.can_fetch(path) for path in unique_paths], dtype=bool)
+            mask.loc[host_paths.index] = unique_allowed.to_numpy()[codes]
+        return mask
+
+    def filter_allowed(self, urls: pd.Series, user_agent: str = "*", allow_unknown: bool = False) -> pd.Series:
+        """
+        Get the URLs in a Series that robots.txt allows. See allowed_mask.
+        """
+        return urls[self.allowed_mask(urls, user_agent, allow_unknown)]